@@ -0,0 +1,57 @@
+import os
+import random
+from datetime import date, timedelta
+
+from src import config
+from src.migrations import migrate
+from src.sql import createDatabase, closeDatabase, cursor, executeSQL, transaction
+
+# Synthetic data for the benchmarks. Databases are made from scratch, with the same schema
+# (and so the same indexes and triggers) as the program's own, and never touch cafeDB.db.
+
+
+# Makes a new, fully migrated database at fileName, replacing any already there, and
+# points config.DBFile at it. It holds the admin user and the 'Anonymous' records.
+def newDatabase(fileName):
+    closeDatabase()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.isfile(fileName + suffix):
+            os.remove(fileName + suffix)
+    config.DBFile = fileName
+    createDatabase()
+    migrate()
+
+
+# Adds a supplier and count items, each with quantity in stock. Returns the items' IDs.
+def addItems(count, quantity, seed=1):
+    rng = random.Random(seed)
+    items = ['IT{:07d}'.format(number) for number in range(1, count + 1)]
+    with transaction(), cursor() as cur:
+        cur.execute('INSERT INTO supplierTbl VALUES (?,?,?)', ('SU0000001', 'Benchmark Supplier', ''))
+        for number, itemID in enumerate(items, start=1):
+            cost = round(rng.uniform(0.2, 3), 2)
+            cur.execute('INSERT INTO itemTbl VALUES (?,?,?,?,?,?)',
+                        (itemID, 'Item {}'.format(number), round(cost * 1.5, 2), quantity, cost, 'SU0000001'))
+    return items
+
+
+# Adds a year of orders from startDate: ordersPerDay orders a day by anonymous customers,
+# each of linesPerOrder different items. The same seed always adds the same orders.
+# Returns the number of orders and of order items added.
+def addYear(items, ordersPerDay=150, linesPerOrder=3, startDate=date(2019, 1, 1), seed=1):
+    rng = random.Random(seed)
+    prices = dict(executeSQL('SELECT itemID, salePrice FROM itemTbl', (), True))
+    orders, lines = [], []
+    for day in range(365):
+        orderDate = (startDate + timedelta(day)).strftime(config.dateFormat)
+        for _ in range(ordersPerDay):
+            orderNo = 'ON{:07d}'.format(len(orders) + 1)
+            basket = [(itemID, rng.randint(1, 3)) for itemID in rng.sample(items, linesPerOrder)]
+            total = sum(prices[itemID] * quantity for itemID, quantity in basket)
+            orders.append((orderNo, 'Anonymous', '{:.2f}'.format(total), orderDate, 'admin'))
+            lines.extend((orderNo, itemID, quantity) for itemID, quantity in basket)
+    with transaction(), cursor() as cur:
+        cur.executemany('INSERT INTO orderTbl VALUES (?,?,?,?,?)', orders)
+        cur.executemany('INSERT INTO orderItemTbl VALUES (?,?,?)', lines)
+    return len(orders), len(lines)
+
@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from itertools import islice
+
+from src import config
+from src.report import orderReport, revenueRows
+from src.sql import closeDatabase
+from .data import newDatabase, addItems, addYear
+
+# Times saving a revenue report of a synthetic year of orders as a PDF, and measures the most
+# memory Python held while saving it: as one file (as before reports were split into parts)
+# and split into files of config.reportRows rows. FPDF holds a file's pages until it is
+# written, so one file takes memory in proportion to its rows while parts take no more than
+# one part's worth. Tracing memory makes both several times slower than they are otherwise.
+#   python -m benchmarks.report
+#   python -m benchmarks.report --rows 100000 --part 10000
+
+_YEAR = (date(2019, 1, 1), date(2019, 12, 31))
+
+
+# Saves the first rows of the revenue report with partRows rows in each file. Returns the
+# seconds taken, the peak memory in bytes and the files written.
+def run(rows, partRows):
+    config.reportRows = partRows
+    tracemalloc.start()
+    start = time.perf_counter()
+    fileNames = orderReport(*_YEAR, 0, 0, 0).save(islice(revenueRows(*_YEAR), rows))
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    closeDatabase()
+    return seconds, peak, fileNames
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.report',
+                                     description='Time saving a long revenue report as a PDF.')
+    parser.add_argument('--rows', type=int, default=50000, help='rows in the report (default: %(default)s)')
+    parser.add_argument('--part', type=int, default=config.reportRows,
+                        help='rows in each part (default: %(default)s, from config.reportRows)')
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as folder:
+        newDatabase(os.path.join(folder, 'report.db'))
+        # Three items an order, and enough orders a day to fill the report
+        addYear(addItems(50, 1000), args.rows // (365 * 3) + 1)
+        closeDatabase()
+        config.reportFolder = folder
+
+        for name, partRows in (('one file', args.rows), ('parts', args.part)):
+            seconds, peak, fileNames = run(args.rows, partRows)
+            size = sum(os.path.getsize(fileName) for fileName in fileNames)
+            print('{}: {:.1f}s, peak {:.1f} MB, {} file(s) of {:.1f} MB in all'.format(
+                name, seconds, peak / 2 ** 20, len(fileNames), size / 2 ** 20))
+            for fileName in fileNames:
+                os.remove(fileName)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from src import config
+from src.orders import revenueLines
+from src.sql import closeDatabase
+from src.totals import revenueTotals
+from .data import newDatabase, addItems, addYear
+
+# Times the revenue report for a month of a synthetic year of orders, made as the report
+# window used to make it (one query per order and per item sold, each on a new connection)
+# and as it does now (the totals and one joined query). Both must give the same totals and
+# items, or it exits with status 1. The old way takes a while, as it opens a new connection
+# for every query.
+#   python -m benchmarks.revenue
+#   python -m benchmarks.revenue --orders 300 --from 2019-01-01 --to 2019-12-31
+
+
+# Runs a statement on a new connection, as executeSQL used to
+def _oldSQL(statement, parameters, fetchall):
+    connection = sqlite3.connect(config.DBFile)
+    cur = connection.cursor()
+    cur.execute(statement, parameters)
+    rows = cur.fetchall() if fetchall else cur.fetchone()
+    connection.commit()
+    connection.close()
+    return rows
+
+
+# The report as orderWindow.generateReport used to make it. Returns the total cost and
+# revenue and each item sold as (orderNo, itemID, quantity).
+def oldReport(startDate, endDate):
+    totalCost = totalRevenue = 0
+    lines = []
+    for order in _oldSQL('SELECT * FROM orderTbl', (), True):
+        orderItems = _oldSQL('SELECT * FROM orderItemTbl WHERE orderNo = ?', (order[0],), True)
+        if startDate <= datetime.strptime(order[3], config.dateFormat).date() <= endDate:
+            for orderItem in orderItems:
+                item = _oldSQL('SELECT * FROM itemTbl WHERE itemID = ?', (orderItem[1],), False)
+                totalCost += float(item[4]) * orderItem[2]
+                totalRevenue += float(item[2]) * orderItem[2]
+                lines.append((order[0], item[0], orderItem[2]))
+    return totalCost, totalRevenue, lines
+
+
+# The report as it is made now
+def newReport(startDate, endDate):
+    totalCost, totalRevenue, totalProfit = revenueTotals(startDate, endDate)
+    lines = [(line[0], line[3], line[5]) for line in revenueLines(startDate, endDate)]
+    return totalCost, totalRevenue, lines
+
+
+def _date(text):
+    try:
+        return datetime.strptime(text, config.dateFormat).date()
+    except ValueError:
+        raise argparse.ArgumentTypeError('dates must be ' + config.datePattern)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.revenue',
+                                     description='Time the revenue report against a synthetic year of orders.')
+    parser.add_argument('--orders', type=int, default=150, help='orders a day (default: %(default)s)')
+    parser.add_argument('--from', dest='start', type=_date, default=date(2019, 3, 1),
+                        help='first date of the report, ' + config.datePattern + ' (default: %(default)s)')
+    parser.add_argument('--to', dest='end', type=_date, default=date(2019, 3, 31),
+                        help='last date of the report (default: %(default)s)')
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as folder:
+        newDatabase(os.path.join(folder, 'revenue.db'))
+        orders, lines = addYear(addItems(50, 1000), args.orders)
+        print('{:,} orders and {:,} order items in 2019'.format(orders, lines))
+        # Closing the connections copies the new records out of the write-ahead log
+        closeDatabase()
+
+        results = {}
+        for name, report in (('new', newReport), ('old', oldReport)):
+            start = time.perf_counter()
+            results[name] = report(args.start, args.end)
+            print('{}: {:.2f}s for {:,} items'.format(name, time.perf_counter() - start, len(results[name][2])))
+        closeDatabase()
+
+    (oldCost, oldRevenue, oldLines), (newCost, newRevenue, newLines) = results['old'], results['new']
+    same = (round(oldCost, 2) == round(newCost, 2) and round(oldRevenue, 2) == round(newRevenue, 2)
+            and sorted(oldLines) == sorted(newLines))
+    print('Totals and items are the same' if same else 'Totals or items DIFFER')
+    return 0 if same else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from src import config
+from src.orders import saveOrder, OutOfStock
+from src.sql import executeSQL, closeDatabase
+from .data import newDatabase, addItems
+
+# Checks that tills sharing a database never lose each other's stock changes. Several
+# processes save random orders for a few items at once until the stock runs out. Afterwards
+# every item's stock plus the number of it sold must equal the stock it started with, and
+# stock must never go below zero. Exits with status 1 if not.
+#   python -m benchmarks.stock
+#   python -m benchmarks.stock --processes 16 --orders 500
+
+
+# Saves random orders of 1-4 units of the items, as one till would. Runs in its own process.
+# Returns the number of orders saved, refused as out of stock and refused as the database was busy.
+def _till(job):
+    fileName, till, orders, items = job
+    config.DBFile = fileName
+    rng = random.Random(till)
+    saved = short = busy = 0
+    try:
+        for number in range(orders):
+            basket = Counter(rng.choice(items) for _ in range(rng.randint(1, 4)))
+            try:
+                saveOrder('T{}-{}'.format(till, number), 'Anonymous', 1.0, '2021-01-01', 'admin', basket)
+                saved += 1
+            except OutOfStock:
+                short += 1
+            except sqlite3.OperationalError:
+                busy += 1
+    finally:
+        closeDatabase()
+    return saved, short, busy
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.stock',
+                                     description='Check that tills saving orders at once never lose stock.')
+    parser.add_argument('--processes', type=int, default=8, help='tills saving at once (default: %(default)s)')
+    parser.add_argument('--orders', type=int, default=200, help='orders each till saves (default: %(default)s)')
+    parser.add_argument('--items', type=int, default=5, help='items ordered (default: %(default)s)')
+    parser.add_argument('--stock', type=int, default=300, help='stock of each item (default: %(default)s)')
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as folder:
+        fileName = os.path.join(folder, 'stock.db')
+        newDatabase(fileName)
+        items = addItems(args.items, args.stock)
+        closeDatabase()
+
+        start = time.perf_counter()
+        # Processes are started fresh ('spawn'), as the report command's are
+        with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+            results = pool.map(_till, [(fileName, till, args.orders, items) for till in range(args.processes)])
+        saved, short, busy = (sum(counts) for counts in zip(*results))
+        print('{} orders saved, {} out of stock, {} busy in {:.1f}s'.format(
+            saved, short, busy, time.perf_counter() - start))
+
+        failed = False
+        for itemID in items:
+            stock = executeSQL('SELECT quantity FROM itemTbl WHERE itemID = ?', (itemID,), False)[0]
+            sold = executeSQL('SELECT COALESCE(SUM(quantity), 0) FROM orderItemTbl WHERE itemID = ?',
+                              (itemID,), False)[0]
+            ok = stock >= 0 and stock + sold == args.stock
+            failed = failed or not ok
+            print('{}  stock {:>5}  sold {:>5}  {}'.format(itemID, stock, sold, 'ok' if ok else 'LOST'))
+        closeDatabase()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
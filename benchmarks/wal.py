@@ -0,0 +1,121 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from src import config, sql
+from src.orders import saveOrder, revenueLines
+from .data import newDatabase, addItems, addYear
+
+# Compares the connection settings in config.databasePragmas with SQLite's defaults, which
+# the program used before (a rollback journal, synchronous FULL), on copies of a synthetic
+# year of orders. Times saving orders alone, reading the whole revenue report alone, then
+# a till saving an order every 5 ms while a report is read over and over.
+#   python -m benchmarks.wal
+#   python -m benchmarks.wal --seconds 10 --runs 3
+
+OLD = {'journal_mode': 'DELETE'}
+NEW = dict(config.databasePragmas)
+_WHOLE = (date(2000, 1, 1), date(2100, 1, 1))
+
+
+# Returns a basket of a few of the items, different for each order
+def _basket(items, number):
+    return Counter({items[number % len(items)]: 1, items[(number + 1) % len(items)]: 2,
+                    items[(number + 2) % len(items)]: 1})
+
+
+# Reads the revenue report over and over until stop is set. Runs on its own thread.
+def _reader(stop, counts):
+    try:
+        while not stop.is_set():
+            try:
+                for _ in revenueLines(*_WHOLE):
+                    counts['rows'] += 1
+                    if stop.is_set():
+                        break
+            except sqlite3.OperationalError:
+                counts['failed'] += 1
+    finally:
+        sql.closeDatabase()
+
+
+# Runs the benchmark on a copy of the database with the given settings and prints the results
+def run(name, pragmas, original, folder, orders, seconds):
+    fileName = os.path.join(folder, 'run.db')
+    shutil.copy(original, fileName)
+    config.DBFile = fileName
+    config.databasePragmas = pragmas
+    sql.closeDatabase()
+    items = [itemID for (itemID,) in sql.executeSQL('SELECT itemID FROM itemTbl', (), True)]
+
+    # Saving orders of three items, each in its own transaction
+    start = time.perf_counter()
+    for number in range(orders):
+        saveOrder('BW{:07d}'.format(number), 'Anonymous', 1.0, '2021-06-01', 'admin', _basket(items, number))
+    commits = orders / (time.perf_counter() - start)
+
+    # Reading the whole revenue report
+    start = time.perf_counter()
+    rows = sum(1 for _ in revenueLines(*_WHOLE))
+    reads = rows / (time.perf_counter() - start)
+
+    # Both at once
+    stop = threading.Event()
+    counts = Counter()
+    reader = threading.Thread(target=_reader, args=(stop, counts))
+    reader.start()
+    waits = []
+    failed = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        time.sleep(0.005)
+        began = time.perf_counter()
+        try:
+            saveOrder('BC{:07d}'.format(len(waits)), 'Anonymous', 1.0, '2021-06-01', 'admin',
+                      _basket(items, len(waits)))
+        except sqlite3.OperationalError:
+            failed += 1
+        waits.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reader.join()
+    sql.closeDatabase()
+
+    waits.sort()
+    print('{}: alone {:,.0f} commits/s, {:,.0f} rows/s read'.format(name, commits, reads))
+    print('{}  while reading: {} commits ({} failed), median {:.1f} ms, slowest {:.1f} ms'.format(
+        ' ' * len(name), len(waits), failed, waits[len(waits) // 2] * 1000, waits[-1] * 1000))
+    print('{}  while saving: {:,.0f} rows/s read ({} reads failed)'.format(
+        ' ' * len(name), counts['rows'] / elapsed, counts['failed']))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.wal',
+                                     description="Compare the database settings with SQLite's defaults.")
+    parser.add_argument('--orders', type=int, default=300, help='orders saved alone (default: %(default)s)')
+    parser.add_argument('--seconds', type=float, default=4, help='time spent saving while reading '
+                                                                  '(default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=2, help='times each is run (default: %(default)s)')
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as folder:
+        original = os.path.join(folder, 'year.db')
+        newDatabase(original)
+        addYear(addItems(50, 10000000))
+        # Closing the connections copies the new records out of the write-ahead log
+        sql.closeDatabase()
+        for _ in range(args.runs):
+            run('old', OLD, original, folder, args.orders, args.seconds)
+            run('new', NEW, original, folder, args.orders, args.seconds)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
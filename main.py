@@ -1,18 +1,35 @@
 # Python 3.8.1
-# Requires prettytable, fpdf, tkcalendar, bcrypt to be installed
+# Requires fpdf, tkcalendar, bcrypt to be installed
+# Run with --timing to print how long each import and step of starting up took
+
+import sys
+
+from src import timing
+
+# Timing starts before anything else is imported, so every import is timed
+if '--timing' in sys.argv:
+    timing.start()
 
 import tkinter as tk
+from tkinter import messagebox
 
 from src.windows.login import loginWin
 from src.windows.mainmenu import mainMenu
-from src.sql import createDatabase
+from src.sql import createDatabase, closeDatabase
+from src.migrations import migrate
 from src import config
 
+timing.step('imports')
+
 
 def main():
     while True:
         win = tk.Tk()
         login = loginWin(win)
+        if timing.running():
+            timing.step('login window created')
+            # Idle callbacks run once the window has been drawn
+            win.after_idle(lambda: (timing.step('login window shown'), timing.finish()))
         win.mainloop()
         if login.authenticated:
             root = tk.Tk()
@@ -23,9 +40,18 @@ def main():
 
 
 # First checks that the database file exists (function from SQL module)
-# Creates DB if necessary,
-# Then runs the main program
+# Creates DB if necessary, and brings its schema up to date,
+# Then runs the main program, closing the database connections on exit
 
 if __name__ == "__main__":
     createDatabase()
-    main()
+    timing.step('database created')
+    try:
+        migrate()
+        timing.step('database migrated')
+        main()
+    except RuntimeError as error:
+        # The database was upgraded by a newer version of the program
+        messagebox.showerror('Database Error', str(error))
+    finally:
+        closeDatabase()
@@ -0,0 +1,101 @@
+import sqlite3
+import weakref
+
+from . import config, sql
+
+# Shows changes made by other tills in the windows open on this one, without the ↺ button.
+# The main menu calls poll() every config.changePoll ms, which asks SQLite for the database's
+# data_version. That only changes when another connection commits, so most polls end there.
+# When it has changed, the number of changes to each table (kept in changeCountTbl by
+# triggers, see migrations.py) shows which tables changed, and changeLogTbl gives the
+# rowid of each record changed, which the treeviews showing that table then fetch and show.
+#
+# Polling uses a connection of its own, so changes made by this till's other connections
+# (e.g. saving on a worker thread) are picked up in the same way.
+
+# The treeviews showing each table (pagedTrees), forgotten once their window is closed
+_watching = weakref.WeakSet()
+_connection = None
+_path = None
+_version = None
+# The number of changes to each table, and the last change in changeLogTbl, when last polled
+_counts = {}
+_lastChange = 0
+
+
+# Shows the changes to a pagedTree's table as they are made
+def watch(pages):
+    _watching.add(pages)
+
+
+# Reads the counts of changes to each table and the last change logged, in the current snapshot
+def _read(connection):
+    counts = dict(connection.execute('SELECT tableName, changes FROM changeCountTbl').fetchall())
+    lastChange = connection.execute('SELECT MAX(changeID) FROM changeLogTbl').fetchone()[0] or 0
+    return counts, lastChange
+
+
+# Returns the rowids of the records changed in a table since the last poll, or None if
+# more have changed than were logged (i.e. the oldest have been pruned) or than are worth
+# showing one by one, in which case the treeviews are reloaded instead
+def _changedRows(connection, table, changes):
+    if changes > config.pageSize:
+        return None
+    rows = connection.execute('SELECT changedRow FROM changeLogTbl WHERE tableName = ? AND changeID > ?',
+                              (table, _lastChange)).fetchall()
+    if len(rows) < changes:
+        return None
+    return {row[0] for row in rows}
+
+
+# Checks whether the database has changed since the last poll, and if so shows the changes
+# to the records in every open treeview. Runs on the main thread.
+def poll():
+    global _connection, _path, _version, _counts, _lastChange
+    pages = [tree for tree in _watching if tree.tree.winfo_exists()]
+    try:
+        if _connection is None or _path != config.DBFile:
+            _connection = sql.openConnection()
+            _path = config.DBFile
+            _version = None
+        version = _connection.execute('PRAGMA data_version').fetchone()[0]
+        if version == _version:
+            return
+        # Reads everything from one snapshot, so a change committed part way through is not missed
+        _connection.execute('BEGIN')
+        try:
+            counts, lastChange = _read(_connection)
+            if _version is None:
+                # First poll: everything shown so far is up to date
+                changed = {}
+            else:
+                tables = {tree.table for tree in pages}
+                changed = {table: _changedRows(_connection, table, count - _counts.get(table, 0))
+                           for table, count in counts.items() if table in tables and count != _counts.get(table)}
+        finally:
+            _connection.execute('COMMIT')
+    except sqlite3.ProgrammingError:
+        # The connection was closed along with the others, so a new one is opened next time
+        _connection = None
+        return
+    except sqlite3.Error:
+        # e.g. the database is busy, or has not been migrated yet. Tries again next time.
+        return
+
+    _version, _counts, _lastChange = version, counts, lastChange
+    for tree in pages:
+        if tree.table not in changed or (tree.tree.get_children() and not tree.showing()):
+            # e.g. search results are shown, which are left as they are
+            continue
+        rowids = changed[tree.table]
+        if rowids is None:
+            tree.reload(False)
+        else:
+            tree.changed(set(rowids))
+
+
+# Deletes all but the latest config.changeLogRows changes from the change log. A till that
+# has missed changes that have been deleted reloads its treeviews instead.
+def prune():
+    sql.executeSQL('DELETE FROM changeLogTbl WHERE changeID <= (SELECT MAX(changeID) FROM changeLogTbl) - ?',
+                   (config.changeLogRows,), False)
@@ -1,7 +1,70 @@
-
 icon = "./static/logo.ico"
+logo = "./static/logo.jpg"
 font = "./static/ALGER.TTF"
+# Folder that reports are saved to as PDF files
+reportFolder = "./reports"
+# Number of rows an export writes at a time in its columnar format (the most it holds in memory)
+exportRows = 10000
+# Number of rows in each PDF file of a report. FPDF holds a file's pages in memory until it is
+# written, so longer reports are split into parts ("... part 1.pdf", "... part 2.pdf", ...)
+reportRows = 20000
 DBFile = './cafeDB.db'
+# Settings (PRAGMAs) applied to every connection to the database as it is opened:
+#   busy_timeout  ms to wait for another till to finish writing, rather than failing
+#   journal_mode  WAL lets reports read while tills write, and each commit appends to a log instead of
+#                 rewriting the database. WAL needs every program using the database to be on the same
+#                 computer, so use 'DELETE' if the database is shared over a network drive.
+#   synchronous   NORMAL only waits for the disk at checkpoints, not every commit. With WAL a power cut
+#                 can lose the last few commits, but never corrupts the database.
+#   cache_size    pages kept in memory by each connection, or KiB if negative
+#   mmap_size     bytes of the database read through memory mapping rather than read calls
+#   temp_store    keeps the temporary tables and indexes used for sorting in memory
+#   foreign_keys  refuses changes that would leave a record referring to one that does not exist
+databasePragmas = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16384,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+}
+# How often (in ms) the main menu copies the changes in the write-ahead log back into the database
+checkpointInterval = 300000
+# How often (in ms) open windows check whether another till has changed the records they show,
+# and the number of changes kept in the change log for them to catch up from
+changePoll = 1000
+changeLogRows = 10000
+# Number of prepared statements each database connection keeps cached
+cachedStatements = 128
+# Statements slower than this (in ms) are logged as warnings, with the plan SQLite used to run them
+slowQuery = 100
+# Number of recent statements kept in memory, and the log file slow statements are written to,
+# relative to the database's folder (rotated once it reaches queryLogBytes, keeping queryLogFiles
+# old logs). Set queryLogAll to True to log every statement, e.g. while tracking down a problem.
+queryHistory = 1000
+queryLogFile = 'logs/queries.log'
+queryLogBytes = 1048576
+queryLogFiles = 5
+queryLogAll = False
+# Number of statements listed in the diagnostics window
+diagnosticsRows = 20
+# Number of records fetched at a time to show in a treeview,
+# and the most records a treeview holds at once
+pageSize = 100
+treeRows = 500
+# Number of threads that run slow work in the background,
+# and how often (in ms) windows check whether it has finished
+workerThreads = 2
+pollInterval = 50
+# Number of digits in the IDs given to new records, after their two letter prefix
+idDigits = 7
+# bcrypt cost factor for staff passwords. Each extra round doubles the time taken to hash
+# a password; passwords stored at a lower cost are rehashed when their user logs in.
+passwordRounds = 12
+# Dates are entered, shown and stored as YYYY-MM-DD, so that they sort correctly as text
+datePattern = 'YYYY-MM-DD'
+dateFormat = '%Y-%m-%d'
 userID = ""
 fullName = ""
 accesslevel = ''
@@ -0,0 +1,135 @@
+import queue
+import threading
+from tkinter import messagebox
+
+from . import config, sql
+
+# Slow work (queries, password hashing, reports) is run by worker threads so that
+# the windows keep responding while it runs. Tkinter can only be used from the
+# main thread, so results are handed back through a queue that the window
+# checks every few milliseconds with after(), and callbacks run from there.
+#
+# e.g.  submit(self.root, lambda task: executeSQL(...), done=lambda records: ...)
+
+
+# Raised inside a task's function when the task has been cancelled
+class Cancelled(Exception):
+    pass
+
+
+class Task:
+    def __init__(self, widget, function, args, done, error, progress):
+        self.widget = widget
+        self.function = function
+        self.args = args
+        self.done = done
+        self.error = error
+        self.progress = progress
+        self.cancelled = False
+        self.running = False
+        self.finished = False
+        self.connection = None
+        self.lock = threading.Lock()
+        # Messages from the worker thread for the main thread: (kind, value)
+        self.messages = queue.Queue()
+
+    # Stops the task. A task that has not started yet never runs, and one that
+    # is running has its current query interrupted; its callbacks are not called.
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.connection is not None:
+                self.connection.interrupt()
+
+    # Called by the task's function (on the worker thread) to report how far it
+    # has got. The value is passed to the progress callback on the main thread.
+    # Raises Cancelled if the task has been cancelled, so the function stops there.
+    def report(self, value):
+        if self.cancelled:
+            raise Cancelled()
+        self.messages.put(('progress', value))
+
+    # Runs the task's function on the worker thread
+    def run(self):
+        with self.lock:
+            if self.cancelled:
+                return
+            self.running = True
+        try:
+            connection = sql.getConnection()
+            with self.lock:
+                self.connection = connection
+            result = self.function(self, *self.args)
+        except BaseException as exception:
+            self.messages.put(('error', exception))
+        else:
+            self.messages.put(('done', result))
+        finally:
+            with self.lock:
+                self.connection = None
+                self.running = False
+
+    # Handles any messages from the worker thread, then checks again shortly
+    # unless the task has finished. Runs on the main thread.
+    def poll(self):
+        try:
+            if not self.widget.winfo_exists():
+                # The window was closed, so nothing is left to show the result in
+                self.cancel()
+                return
+        except Exception:
+            self.cancel()
+            return
+
+        while not self.messages.empty():
+            kind, value = self.messages.get()
+            if self.cancelled:
+                continue
+            if kind == 'progress':
+                if self.progress:
+                    self.progress(value)
+            elif kind == 'done':
+                self.finished = True
+                if self.done:
+                    self.done(value)
+            else:
+                self.finished = True
+                self.failed(value)
+
+        if not self.finished and not (self.cancelled and not self.running):
+            self.widget.after(config.pollInterval, self.poll)
+
+    def failed(self, exception):
+        if self.error:
+            self.error(exception)
+        elif not isinstance(exception, Cancelled):
+            messagebox.showerror('Error', str(exception))
+
+
+# Jobs waiting for a worker thread
+_jobs = queue.Queue()
+_workers = []
+_workersLock = threading.Lock()
+
+
+def _work():
+    while True:
+        _jobs.get().run()
+
+
+# Runs function(task, *args) on a worker thread, where task is the Task returned
+# (used to report progress or check for cancellation). Once it returns, done is
+# called with the result on the main thread, or error with the exception raised.
+# progress is called with each value the function reports. Callbacks are run by
+# the given widget's event loop, and the task is cancelled if it is destroyed.
+def submit(widget, function, *args, done=None, error=None, progress=None):
+    with _workersLock:
+        while len(_workers) < config.workerThreads:
+            worker = threading.Thread(target=_work, name='database worker', daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+    task = Task(widget, function, args, done, error, progress)
+    _jobs.put(task)
+    widget.after(config.pollInterval, task.poll)
+    return task
@@ -0,0 +1,349 @@
+from tkinter import filedialog, messagebox, ttk
+import tkinter as tk
+from array import array
+from datetime import datetime
+from itertools import islice
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import struct
+import sys
+
+from . import config
+from .orders import revenueLines
+from .sql import cursor, closeDatabase
+from .executor import submit
+
+# Tables and reports are exported by reading rows from a cursor and writing them straight
+# to the file, so exports of any size use the same small amount of memory and never pass
+# through a treeview. Files can be written in two formats, each optionally gzip compressed:
+#
+#   CSV       (.csv, .csv.gz)  for spreadsheets; UTF-8 with a byte order mark so Excel shows '£'
+#   Columnar  (.col, .col.gz)  a compact binary format, read back with readColumnar
+#
+# The columnar format stores rows in groups of config.exportRows, and each group column by
+# column, so values of the same type sit together (and compress well):
+#
+#   b'KFCOL1\n', a uint32 length and that many bytes of JSON: {"columns": [names]}
+#   then for each group, a uint32 number of rows (0 ends the file), then for each column:
+#     1 byte type: i (int64), f (float64), s (UTF-8 text), b (bytes), j (JSON, for a column
+#                  holding mixed types) or n (every value is null)
+#     1 byte set to 1 if the column has nulls, followed by a bit for each row (1 = null)
+#     the values: i/f as 8 bytes each; s/b as a uint32 length for each value, then the values
+#                 joined; j as a uint32 length, then a JSON list of the values
+#   All numbers are little endian. Nulls are stored as 0 or empty, and masked on reading.
+#
+# e.g.  export('items.col.gz', *tableRows('orderItemTbl'))
+
+_MAGIC = b'KFCOL1\n'
+_GZIP_LEVEL = 6
+_LITTLE = sys.byteorder == 'little'
+
+# Columns that are never exported
+_HIDDEN = {'staffTbl': ('password', 'salt')}
+
+# File types offered when saving an export. The format is chosen by the file's extension.
+FILE_TYPES = [('CSV', '*.csv'), ('Compressed CSV', '*.csv.gz'), ('Columnar', '*.col'),
+              ('Compressed Columnar', '*.col.gz')]
+
+
+# Returns a table's column names and its rows, in the order they were added.
+# Raises ValueError if there is no such table.
+def tableRows(table):
+    with cursor() as cur:
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if cur.fetchone() is None:
+            raise ValueError('There is no table called ' + table)
+        columns = [info[1] for info in cur.execute('PRAGMA table_info("{}")'.format(table))
+                   if info[1] not in _HIDDEN.get(table, ())]
+    return columns, _select('SELECT {} FROM "{}" ORDER BY rowid'.format(
+        ', '.join('"{}"'.format(column) for column in columns), table))
+
+
+def _select(statement, parameters=()):
+    with cursor() as cur:
+        cur.execute(statement, parameters)
+        for row in cur:
+            yield row
+
+
+# Every item sold between the dates, with the details of its order on each row (unlike the
+# PDF, which only shows them once per order)
+def _revenueRows(startDate, endDate):
+    for line in revenueLines(startDate, endDate):
+        yield line[:-1]
+
+
+# The reports that can be exported
+REPORTS = ('donation', 'expenditure', 'revenue')
+
+
+# Returns a report's column names and its rows between the dates (inclusive), oldest first.
+# src.report is only imported once a report is exported, as it loads fpdf.
+def reportRows(kind, startDate, endDate):
+    from .report import orderReport, donationReport, expenditureReport, donationRows, expenditureRows
+    report, rows = {'revenue': (orderReport, _revenueRows), 'donation': (donationReport, donationRows),
+                    'expenditure': (expenditureReport, expenditureRows)}[kind]
+    return [heading for heading, formatter in report.columns], rows(startDate, endDate)
+
+
+# Opens a file to write to, compressing it if asked
+def _open(path, compress):
+    if compress:
+        return gzip.open(path, 'wb', compresslevel=_GZIP_LEVEL)
+    return open(path, 'wb')
+
+
+# Writes the rows to a file as CSV. Returns the number of rows written.
+def writeCSV(file, columns, rows, progress=None):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([value.hex() if isinstance(value, bytes) else value for value in row])
+        count += 1
+        if progress and count % config.exportRows == 0:
+            progress(count)
+    # Leaves the file open for the caller to close
+    text.detach()
+    return count
+
+
+# Writes the rows to a file in the columnar format. Only one group of rows is held in
+# memory at a time. Returns the number of rows written.
+def writeColumnar(file, columns, rows, progress=None):
+    header = json.dumps({'columns': columns}).encode('utf-8')
+    file.write(_MAGIC + struct.pack('<I', len(header)) + header)
+    rows = iter(rows)
+    count = 0
+    while True:
+        group = list(islice(rows, config.exportRows))
+        file.write(struct.pack('<I', len(group)))
+        if not group:
+            return count
+        for values in zip(*group):
+            _writeColumn(file, values)
+        count += len(group)
+        if progress:
+            progress(count)
+
+
+# Returns the type a column's values are stored as
+def _columnType(values):
+    types = {type(value) for value in values if value is not None}
+    if not types:
+        return b'n'
+    if types == {int}:
+        # Integers too big for 8 bytes are kept exactly as JSON
+        return b'i' if all(-2 ** 63 <= value < 2 ** 63 for value in values if value is not None) else b'j'
+    if len(types) == 1:
+        return {float: b'f', str: b's', bytes: b'b'}.get(types.pop(), b'j')
+    return b'j'
+
+
+def _pack(kind, values):
+    numbers = array(kind, values)
+    if not _LITTLE:
+        numbers.byteswap()
+    return numbers.tobytes()
+
+
+def _writeColumn(file, values):
+    kind = _columnType(values)
+    nulls = [value is None for value in values]
+    file.write(kind)
+    if any(nulls) and kind != b'n':
+        mask = bytearray((len(values) + 7) // 8)
+        for row, null in enumerate(nulls):
+            if null:
+                mask[row // 8] |= 1 << (row % 8)
+        file.write(b'\x01' + mask)
+    else:
+        file.write(b'\x00')
+
+    if kind == b'i':
+        file.write(_pack('q', [0 if value is None else value for value in values]))
+    elif kind == b'f':
+        file.write(_pack('d', [0.0 if value is None else value for value in values]))
+    elif kind in (b's', b'b'):
+        data = [b'' if value is None else value.encode('utf-8') if kind == b's' else value for value in values]
+        file.write(_pack('I', [len(value) for value in data]))
+        file.write(b''.join(data))
+    elif kind == b'j':
+        data = json.dumps(values, default=lambda value: value.hex()).encode('utf-8')
+        file.write(struct.pack('<I', len(data)) + data)
+
+
+def _read(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError('The file ends part way through')
+    return data
+
+
+def _unpack(kind, data):
+    numbers = array(kind)
+    numbers.frombytes(data)
+    if not _LITTLE:
+        numbers.byteswap()
+    return numbers
+
+
+def _readColumn(file, count):
+    kind = _read(file, 1)
+    mask = _read(file, (count + 7) // 8) if _read(file, 1) == b'\x01' else None
+    if kind == b'n':
+        return [None] * count
+    if kind == b'i':
+        values = _unpack('q', _read(file, 8 * count)).tolist()
+    elif kind == b'f':
+        values = _unpack('d', _read(file, 8 * count)).tolist()
+    elif kind in (b's', b'b'):
+        values = []
+        for length in _unpack('I', _read(file, 4 * count)):
+            values.append(_read(file, length))
+        if kind == b's':
+            values = [value.decode('utf-8') for value in values]
+    elif kind == b'j':
+        values = json.loads(_read(file, struct.unpack('<I', _read(file, 4))[0]).decode('utf-8'))
+    else:
+        raise ValueError('Unknown column type {!r}'.format(kind))
+    if mask:
+        values = [None if mask[row // 8] >> (row % 8) & 1 else value for row, value in enumerate(values)]
+    return values
+
+
+# Reads a file written in the columnar format (compressed or not).
+# Returns the column names, and an iterator of the rows, read a group at a time.
+def readColumnar(path):
+    with open(path, 'rb') as file:
+        compressed = file.read(2) == b'\x1f\x8b'
+    file = gzip.open(path, 'rb') if compressed else open(path, 'rb')
+    try:
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(path + ' is not a columnar export')
+        columns = json.loads(_read(file, struct.unpack('<I', _read(file, 4))[0]).decode('utf-8'))['columns']
+    except Exception:
+        file.close()
+        raise
+    return columns, _readGroups(file, len(columns))
+
+
+def _readGroups(file, width):
+    with file:
+        while True:
+            count = struct.unpack('<I', _read(file, 4))[0]
+            if not count:
+                return
+            for row in zip(*[_readColumn(file, count) for column in range(width)]):
+                yield row
+
+
+# Writes the rows to a file, as columnar if its name ends in .col (or .col.gz) and CSV
+# otherwise, compressed if it ends in .gz. form and compress override the file's name.
+# The file is written under a temporary name and only replaces any existing file once
+# it is complete. progress is called with the number of rows written so far.
+# Returns the number of rows written.
+def export(path, columns, rows, form=None, compress=None, progress=None):
+    name = path[:-3] if path.endswith('.gz') else path
+    if form is None:
+        form = 'columnar' if name.endswith('.col') else 'csv'
+    if compress is None:
+        compress = path.endswith('.gz')
+    part = path + '.part'
+    try:
+        with _open(part, compress) as file:
+            count = (writeColumnar if form == 'columnar' else writeCSV)(file, columns, rows, progress)
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    return count
+
+
+# Asks where to save an export, then writes it on a worker thread. source(*args) returns the
+# column names and rows to export, e.g. exportDialog(self.root, 'Orders', tableRows, 'orderTbl')
+def exportDialog(widget, name, source, *args):
+    path = filedialog.asksaveasfilename(parent=widget, title='Export ' + name, initialfile=name + '.csv',
+                                        defaultextension='.csv', filetypes=FILE_TYPES)
+    if not path:
+        return
+    submit(widget, lambda task: export(path, *source(*args), progress=task.report),
+           done=lambda count: messagebox.showinfo('Success', '{} records exported to\n{}'.format(count, path)),
+           error=lambda error: messagebox.showerror('Error', 'Unable to Export\n' + str(error)))
+
+
+# Asks where to save a report's rows between the dates, then writes them on a worker thread
+def exportReport(widget, kind, startDate, endDate):
+    exportDialog(widget, '{} {} to {}'.format(kind.capitalize(), startDate.strftime(config.dateFormat),
+                                              endDate.strftime(config.dateFormat)),
+                 reportRows, kind, startDate, endDate)
+
+
+# Creates an 'Export' button with a menu of the tables a window shows: [(name, table)]
+def exportMenu(parent, tables):
+    button = ttk.Menubutton(parent, text='Export')
+    menu = tk.Menu(button, tearoff=False)
+    for name, table in tables:
+        menu.add_command(label=name + '...',
+                         command=lambda name=name, table=table: exportDialog(parent, name, tableRows, table))
+    button['menu'] = menu
+    return button
+
+
+# Command line entry point, e.g. every item ever sold, compressed:
+#   python -m src.export --table orderItemTbl --out order-items.col.gz
+#   python -m src.export --report revenue --from 2021-01-01 --to 2021-12-31 --out revenue-2021.csv
+def main(args=None):
+    from .report import _date
+    parser = argparse.ArgumentParser(prog='python -m src.export', description='Export Kingfisher Trust tables and '
+                                                                              'reports as CSV or columnar files.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--table', help='table to export, e.g. orderItemTbl')
+    source.add_argument('--report', choices=REPORTS, help='report to export')
+    parser.add_argument('--from', dest='start', type=_date, help='first date of the report, ' + config.datePattern)
+    parser.add_argument('--to', dest='end', type=_date, help='last date of the report, ' + config.datePattern)
+    parser.add_argument('--format', choices=('csv', 'columnar'),
+                        help='file format (default: from the file name given to --out, otherwise csv)')
+    parser.add_argument('--gzip', action='store_true', help='compress the file (default: if --out ends in .gz)')
+    parser.add_argument('--db', default=config.DBFile, help='database file (default: %(default)s)')
+    parser.add_argument('--out', help='file to write (default: the table or report name, in {})'.format(
+        config.reportFolder))
+    args = parser.parse_args(args)
+    if args.report and not (args.start and args.end):
+        parser.error('--report needs --from and --to')
+    if args.report and args.start > args.end:
+        parser.error('--from is after --to')
+
+    if args.out is None:
+        name = args.table or '{} {} to {}'.format(args.report, args.start.strftime(config.dateFormat),
+                                                  args.end.strftime(config.dateFormat))
+        args.out = os.path.join(config.reportFolder, name + ('.col' if args.format == 'columnar' else '.csv')
+                                + ('.gz' if args.gzip else ''))
+        os.makedirs(config.reportFolder, exist_ok=True)
+
+    config.DBFile = args.db
+    if not os.path.isfile(config.DBFile):
+        print('Error: database {} does not exist'.format(config.DBFile), file=sys.stderr)
+        return 1
+    started = datetime.now()
+    try:
+        columns, rows = tableRows(args.table) if args.table else reportRows(args.report, args.start, args.end)
+        count = export(args.out, columns, rows, args.format, args.gzip or None)
+    except (ValueError, OSError, sqlite3.Error) as error:
+        print('Error: {}'.format(error), file=sys.stderr)
+        return 1
+    finally:
+        closeDatabase()
+    print('{} rows exported to {} in {:.1f}s'.format(count, args.out, (datetime.now() - started).total_seconds()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,19 @@
+from . import config
+from .sql import cursor, transaction
+
+# New records are given IDs made of a two letter prefix and a number, e.g. CU0100342.
+# The next number for each prefix is kept in idSequenceTbl (added in schema
+# version 5, starting after the highest ID already in use), so every ID handed
+# out is unique, even with several tills adding records at once.
+# Numbers are never handed out twice, even if the record is not saved in the end.
+
+
+# Returns a new, unused ID with the given prefix
+def nextID(prefix):
+    # The write lock taken by the transaction means no other till can take the same number
+    with transaction(), cursor() as cur:
+        cur.execute('INSERT OR IGNORE INTO idSequenceTbl VALUES (?, 1)', (prefix,))
+        cur.execute('UPDATE idSequenceTbl SET next = next + 1 WHERE prefix = ?', (prefix,))
+        number = cur.execute('SELECT next - 1 FROM idSequenceTbl WHERE prefix = ?', (prefix,)).fetchone()[0]
+
+    return '{}{:0{}d}'.format(prefix, number, config.idDigits)
@@ -0,0 +1,386 @@
+import os
+import sqlite3
+import sys
+
+from . import config
+from .sql import cursor, transaction, createDatabase, closeDatabase
+
+# Changes to the schema of an existing database are made by migrations.
+# The database's schema version is kept in PRAGMA user_version, and each
+# migration below upgrades it by one version. Migrations are applied in
+# order and must never be edited once released - add a new one instead.
+#
+# Migrations can also be run without opening the program, e.g.
+#   python -m src.migrations --status
+#   python -m src.migrations --db ./cafeDB.db
+
+
+# Rewrites a column of DD/MM/YYYY dates as YYYY-MM-DD.
+# Values already in the new format are left untouched.
+def _isoDates(cur, table, column):
+    cur.execute('''UPDATE {0} SET {1} = substr({1}, 7, 4) || '-' || substr({1}, 4, 2) || '-' || substr({1}, 1, 2)
+                   WHERE {1} LIKE '__/__/____' '''.format(table, column))
+
+
+# Version 1: stores dates as sortable YYYY-MM-DD text, and indexes them so that
+# reports only read the rows within their date range
+def _isoDateIndexes(cur):
+    for table, column in (('orderTbl', 'date'), ('donationsTbl', 'date'), ('expenditureTbl', 'date'),
+                          ('foodDonatTbl', 'donatDate'), ('foodDonatTbl', 'expiryDate')):
+        _isoDates(cur, table, column)
+        cur.execute('CREATE INDEX IF NOT EXISTS {0}_{1}_idx ON {0}({1})'.format(table, column))
+
+
+# Databases created by early versions of the program have no foreign keys on
+# orderItemTbl. SQLite cannot add a foreign key to an existing table, so the
+# table is rebuilt with them and the rows copied across.
+def _orderItemForeignKeys(cur):
+    if cur.execute('PRAGMA foreign_key_list(orderItemTbl)').fetchall():
+        return
+    cur.execute('''
+        CREATE TABLE orderItemTbl_new(
+            orderNo     TEXT NOT NULL,
+            itemID      TEXT NOT NULL,
+            quantity    INTEGER NOT NULL,
+            PRIMARY KEY (orderNo, itemID),
+            FOREIGN KEY(orderNo) REFERENCES orderTbl(orderNo),
+            FOREIGN KEY(itemID) REFERENCES itemTbl(itemID))
+        ''')
+    cur.execute('INSERT INTO orderItemTbl_new SELECT orderNo, itemID, quantity FROM orderItemTbl')
+    cur.execute('DROP TABLE orderItemTbl')
+    cur.execute('ALTER TABLE orderItemTbl_new RENAME TO orderItemTbl')
+
+
+# Version 2: indexes every foreign key column that is not already the first
+# column of an index, so that checking whether a record is referenced elsewhere
+# (e.g. before deleting it) is an index lookup rather than a table scan
+def _foreignKeyIndexes(cur):
+    _orderItemForeignKeys(cur)
+    tables = cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    for (table,) in tables:
+        indexed = set()
+        for index in cur.execute('PRAGMA index_list({})'.format(table)).fetchall():
+            # The first column of each index, i.e. the one it can be searched by
+            indexed.add(cur.execute('PRAGMA index_info({})'.format(index[1])).fetchone()[2])
+        for key in cur.execute('PRAGMA foreign_key_list({})'.format(table)).fetchall():
+            column = key[3]
+            if column not in indexed:
+                cur.execute('CREATE INDEX IF NOT EXISTS {0}_{1}_idx ON {0}({1})'.format(table, column))
+                indexed.add(column)
+
+
+# Version 3: adds a full-text index to every searchable table, so searches no
+# longer scan the whole table. Each index is an FTS5 table holding only the
+# search terms (the records stay in the original table), kept in step by triggers.
+# The trigram tokeniser matches text anywhere in a word, as the old LIKE '%x%'
+# searches did; older versions of SQLite without it index whole words instead.
+def _fullTextSearch(cur):
+    tables = {
+        'customerTbl': ('customerID', 'customerSurname', 'customerForename', 'customerContact'),
+        'donorTbl': ('donorID', 'donorSurname', 'donorForename', 'donorContact'),
+        'supplierTbl': ('supplierID', 'supplierName', 'supplierContact'),
+        'itemTbl': ('itemID', 'itemName', 'salePrice', 'quantity', 'supplierCost', 'supplierID'),
+        'staffTbl': ('staffID', 'staffSurname', 'staffForename', 'staffContact', 'accessLevel'),
+        'recipientTbl': ('recipientID', 'recipientSurname', 'recipientForename', 'recipientContact'),
+        'orderTbl': ('orderNo', 'customerID', 'orderTotal', 'date', 'staffID'),
+        'donationsTbl': ('donationID', 'amount', 'cashorbank', 'referenceNo', 'date', 'donorID', 'staffID'),
+        'foodDonatTbl': ('foodID', 'foodName', 'donatDate', 'expiryDate', 'givenAway', 'donorID', 'staffID'),
+        'expenditureTbl': ('expenditureID', 'amount', 'details', 'date', 'staffID'),
+    }
+    for table, columns in tables.items():
+        create = 'CREATE VIRTUAL TABLE {0}_fts USING fts5({1}, content={0}, content_rowid=rowid, {{}})'.format(
+            table, ', '.join(columns))
+        try:
+            cur.execute(create.format("tokenize='trigram'"))
+        except sqlite3.OperationalError as error:
+            if 'fts5' in str(error):
+                # SQLite was built without full-text search, so searches keep using LIKE
+                return
+            cur.execute(create.format("prefix='2 3'"))
+
+        new = ', '.join('new.' + column for column in columns)
+        old = ', '.join('old.' + column for column in columns)
+        cur.execute('''CREATE TRIGGER {0}_fts_insert AFTER INSERT ON {0} BEGIN
+                           INSERT INTO {0}_fts(rowid, {1}) VALUES (new.rowid, {2});
+                       END'''.format(table, ', '.join(columns), new))
+        cur.execute('''CREATE TRIGGER {0}_fts_delete AFTER DELETE ON {0} BEGIN
+                           INSERT INTO {0}_fts({0}_fts, rowid, {1}) VALUES ('delete', old.rowid, {2});
+                       END'''.format(table, ', '.join(columns), old))
+        cur.execute('''CREATE TRIGGER {0}_fts_update AFTER UPDATE ON {0} BEGIN
+                           INSERT INTO {0}_fts({0}_fts, rowid, {1}) VALUES ('delete', old.rowid, {2});
+                           INSERT INTO {0}_fts(rowid, {1}) VALUES (new.rowid, {3});
+                       END'''.format(table, ', '.join(columns), old, new))
+        # Indexes the records already in the table
+        cur.execute("INSERT INTO {0}_fts({0}_fts) VALUES ('rebuild')".format(table))
+
+
+# Version 4: adds tables holding each day's revenue, donation and expenditure totals,
+# so the totals of a report are summed from one row per day rather than every record.
+# Triggers add each change to the records onto the day it belongs to. Amounts being
+# taken away are added on as negatives, so every trigger is the same kind of upsert.
+def _dailyTotals(cur):
+    cur.execute('''
+        CREATE TABLE revenueDailyTbl(
+            date    TEXT NOT NULL,
+            cost    REAL NOT NULL,
+            revenue REAL NOT NULL,
+            profit  REAL NOT NULL,
+            PRIMARY KEY(date))
+        ''')
+    cur.execute('''
+        CREATE TABLE donationDailyTbl(
+            date    TEXT NOT NULL,
+            cash    REAL NOT NULL,
+            bank    REAL NOT NULL,
+            total   REAL NOT NULL,
+            PRIMARY KEY(date))
+        ''')
+    cur.execute('''
+        CREATE TABLE expenditureDailyTbl(
+            date    TEXT NOT NULL,
+            amount  REAL NOT NULL,
+            PRIMARY KEY(date))
+        ''')
+
+    # Adds the (date, cost, revenue, profit) rows selected onto revenueDailyTbl
+    def revenue(select):
+        return '''INSERT INTO revenueDailyTbl(date, cost, revenue, profit) {}
+                  ON CONFLICT(date) DO UPDATE SET cost = cost + excluded.cost, revenue = revenue + excluded.revenue,
+                                                  profit = profit + excluded.profit;'''.format(select)
+
+    # One item of an order, priced at the item's current price, as reports do
+    def orderItem(row, sign):
+        return revenue('''SELECT orderTbl.date, {1}itemTbl.supplierCost * {0}.quantity,
+                                 {1}itemTbl.salePrice * {0}.quantity,
+                                 {1}(itemTbl.salePrice - itemTbl.supplierCost) * {0}.quantity
+                          FROM orderTbl, itemTbl
+                          WHERE orderTbl.orderNo = {0}.orderNo AND itemTbl.itemID = {0}.itemID'''.format(row, sign))
+
+    # Every item in an order
+    def order(row, sign):
+        return revenue('''SELECT {0}.date, {1}SUM(itemTbl.supplierCost * orderItemTbl.quantity),
+                                 {1}SUM(itemTbl.salePrice * orderItemTbl.quantity),
+                                 {1}SUM((itemTbl.salePrice - itemTbl.supplierCost) * orderItemTbl.quantity)
+                          FROM orderItemTbl JOIN itemTbl ON itemTbl.itemID = orderItemTbl.itemID
+                          WHERE orderItemTbl.orderNo = {0}.orderNo
+                          GROUP BY orderItemTbl.orderNo'''.format(row, sign))
+
+    # Every sale of an item, at the item's price
+    def item(row, sign):
+        return revenue('''SELECT orderTbl.date, {1}SUM({0}.supplierCost * orderItemTbl.quantity),
+                                 {1}SUM({0}.salePrice * orderItemTbl.quantity),
+                                 {1}SUM(({0}.salePrice - {0}.supplierCost) * orderItemTbl.quantity)
+                          FROM orderItemTbl JOIN orderTbl ON orderTbl.orderNo = orderItemTbl.orderNo
+                          WHERE orderItemTbl.itemID = {0}.itemID
+                          GROUP BY orderTbl.date'''.format(row, sign))
+
+    def donation(row, sign):
+        return '''INSERT INTO donationDailyTbl(date, cash, bank, total)
+                  SELECT {0}.date, {1}({0}.cashorbank = 'Cash') * {0}.amount, {1}({0}.cashorbank = 'Bank') * {0}.amount,
+                         {1}{0}.amount WHERE 1
+                  ON CONFLICT(date) DO UPDATE SET cash = cash + excluded.cash, bank = bank + excluded.bank,
+                                                  total = total + excluded.total;'''.format(row, sign)
+
+    def expenditure(row, sign):
+        return '''INSERT INTO expenditureDailyTbl(date, amount) SELECT {0}.date, {1}{0}.amount WHERE 1
+                  ON CONFLICT(date) DO UPDATE SET amount = amount + excluded.amount;'''.format(row, sign)
+
+    for table, totals, columns in (('orderItemTbl', orderItem, 'orderNo, itemID, quantity'),
+                                   ('orderTbl', order, 'orderNo, date'),
+                                   ('itemTbl', item, 'itemID, salePrice, supplierCost'),
+                                   ('donationsTbl', donation, 'amount, cashorbank, date'),
+                                   ('expenditureTbl', expenditure, 'amount, date')):
+        for event, statements in (('INSERT', totals('new', '')),
+                                  ('DELETE', totals('old', '-')),
+                                  ('UPDATE OF ' + columns, totals('old', '-') + totals('new', ''))):
+            cur.execute('''CREATE TRIGGER {0}_totals_{1} AFTER {2} ON {0} BEGIN
+                               {3}
+                           END'''.format(table, event.split()[0].lower(), event, statements))
+
+    # Adds up the records already in the database
+    cur.execute('''INSERT INTO revenueDailyTbl(date, cost, revenue, profit)
+                   SELECT orderTbl.date, SUM(itemTbl.supplierCost * orderItemTbl.quantity),
+                          SUM(itemTbl.salePrice * orderItemTbl.quantity),
+                          SUM((itemTbl.salePrice - itemTbl.supplierCost) * orderItemTbl.quantity)
+                   FROM orderTbl
+                   JOIN orderItemTbl ON orderItemTbl.orderNo = orderTbl.orderNo
+                   JOIN itemTbl ON itemTbl.itemID = orderItemTbl.itemID
+                   GROUP BY orderTbl.date''')
+    cur.execute('''INSERT INTO donationDailyTbl(date, cash, bank, total)
+                   SELECT date, SUM((cashorbank = 'Cash') * amount), SUM((cashorbank = 'Bank') * amount), SUM(amount)
+                   FROM donationsTbl GROUP BY date''')
+    cur.execute('''INSERT INTO expenditureDailyTbl(date, amount)
+                   SELECT date, SUM(amount) FROM expenditureTbl GROUP BY date''')
+
+
+# Version 5: adds the table that new IDs are allocated from (see ids.py), with each
+# prefix starting after the highest ID already in use. Existing IDs are kept as they are.
+def _idSequences(cur):
+    cur.execute('''
+        CREATE TABLE idSequenceTbl(
+            prefix  TEXT NOT NULL,
+            next    INTEGER NOT NULL,
+            PRIMARY KEY(prefix))
+        ''')
+    for prefix, table, column in (('CU', 'customerTbl', 'customerID'), ('DO', 'donorTbl', 'donorID'),
+                                  ('SU', 'supplierTbl', 'supplierID'), ('IT', 'itemTbl', 'itemID'),
+                                  ('ST', 'staffTbl', 'staffID'), ('RE', 'recipientTbl', 'recipientID'),
+                                  ('ON', 'orderTbl', 'orderNo'), ('DN', 'donationsTbl', 'donationID'),
+                                  ('FD', 'foodDonatTbl', 'foodID'), ('EX', 'expenditureTbl', 'expenditureID')):
+        # IDs that are not the prefix followed by a number (e.g. 'admin') are ignored
+        cur.execute('''INSERT INTO idSequenceTbl
+                       SELECT ?, COALESCE(MAX(CAST(substr({1}, 3) AS INTEGER)), 0) + 1 FROM {0}
+                       WHERE {1} GLOB ? || '[0-9]*' AND substr({1}, 3) NOT GLOB '*[^0-9]*' '''.format(table, column),
+                    (prefix, prefix))
+
+
+# Version 6: orders, donations and food given away by or to someone without a record are
+# saved with the ID 'Anonymous'. Now that foreign keys are enforced, each of those IDs needs
+# a record to refer to, so one is added to customerTbl, donorTbl and recipientTbl.
+def _anonymousRecords(cur):
+    for table, prefix in (('customerTbl', 'customer'), ('donorTbl', 'donor'), ('recipientTbl', 'recipient')):
+        cur.execute('''INSERT OR IGNORE INTO {0}({1}ID, {1}Surname, {1}Forename, {1}Contact)
+                       VALUES ('Anonymous', '', 'Anonymous', '')'''.format(table, prefix))
+
+
+# Version 7: records which rows of each table shown in a window have changed, so that windows on
+# other tills can show the changes without reloading (see changes.py). changeCountTbl counts the
+# changes to each table, and changeLogTbl lists the rowid of each record changed, in order.
+def _changeLog(cur):
+    cur.execute('''
+        CREATE TABLE changeCountTbl(
+            tableName   TEXT NOT NULL,
+            changes     INTEGER NOT NULL,
+            PRIMARY KEY(tableName))
+        ''')
+    cur.execute('''
+        CREATE TABLE changeLogTbl(
+            changeID    INTEGER PRIMARY KEY AUTOINCREMENT,
+            tableName   TEXT NOT NULL,
+            changedRow  INTEGER NOT NULL)
+        ''')
+    cur.execute('CREATE INDEX changeLogTbl_tableName_idx ON changeLogTbl(tableName, changeID)')
+    for table in ('customerTbl', 'donorTbl', 'supplierTbl', 'itemTbl', 'staffTbl', 'recipientTbl', 'orderTbl',
+                  'donationsTbl', 'foodDonatTbl', 'expenditureTbl'):
+        cur.execute('INSERT INTO changeCountTbl VALUES (?, 0)', (table,))
+        for event, row in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+            cur.execute('''CREATE TRIGGER {0}_changes_{1} AFTER {2} ON {0} BEGIN
+                               INSERT INTO changeLogTbl(tableName, changedRow) VALUES ('{0}', {3}.rowid);
+                               UPDATE changeCountTbl SET changes = changes + 1 WHERE tableName = '{0}';
+                           END'''.format(table, event.lower(), event, row))
+
+
+# Version 8: indexes the amounts of the tables that keep growing, so that sorting them by
+# amount (clicking the column's heading) reads a page from the index rather than sorting
+# every record. Dates, IDs and foreign keys are already indexed.
+def _amountIndexes(cur):
+    for table, column in (('orderTbl', 'orderTotal'), ('donationsTbl', 'amount'), ('expenditureTbl', 'amount')):
+        cur.execute('CREATE INDEX IF NOT EXISTS {0}_{1}_idx ON {0}({1})'.format(table, column))
+
+
+# Every migration, in the order they are applied, with a short description.
+# Migration n (counting from 1) upgrades the database to version n.
+MIGRATIONS = [
+    ('Store dates as YYYY-MM-DD and index them', _isoDateIndexes),
+    ('Index foreign key columns', _foreignKeyIndexes),
+    ('Add full-text search indexes', _fullTextSearch),
+    ('Add daily report totals', _dailyTotals),
+    ('Allocate IDs from sequences', _idSequences),
+    ('Add records for anonymous customers, donors and recipients', _anonymousRecords),
+    ('Log changes to records for other tills to show', _changeLog),
+    ('Index amounts for sorting', _amountIndexes),
+]
+
+
+# Returns the schema version that the database is currently at
+def schemaVersion():
+    with cursor() as cur:
+        return cur.execute('PRAGMA user_version').fetchone()[0]
+
+
+# Returns the version that the database will be at once fully migrated
+def latestVersion():
+    return len(MIGRATIONS)
+
+
+# Applies every migration that the database has not had yet, up to the target
+# version (the latest, by default). Each migration runs in its own transaction
+# along with the change to the schema version, so a failed migration leaves the
+# database exactly as it was before that migration started.
+# report is called with the version number and description of each migration
+# just before it is applied.
+def migrate(target=None, report=None):
+    if target is None:
+        target = latestVersion()
+    current = schemaVersion()
+
+    # A database written by a newer copy of the program cannot be safely used
+    if current > latestVersion():
+        raise RuntimeError('Database schema version {} is newer than this program supports ({})'
+                           .format(current, latestVersion()))
+    if not 0 <= target <= latestVersion():
+        raise ValueError('Unknown schema version {}'.format(target))
+    if target < current:
+        raise ValueError('Cannot downgrade the database from version {} to {}'.format(current, target))
+
+    # Foreign keys are not checked while tables are rebuilt (as SQLite recommends), so records
+    # that refer to ones deleted before they were enforced can still be copied across.
+    # This can only be changed outside of a transaction.
+    with cursor() as cur:
+        cur.execute('PRAGMA foreign_keys = OFF')
+        try:
+            for version in range(current, target):
+                description, step = MIGRATIONS[version]
+                with transaction():
+                    # Checks the version again once the write lock is held, in case another
+                    # till migrated the database while this one was waiting for it
+                    if cur.execute('PRAGMA user_version').fetchone()[0] != version:
+                        continue
+                    if report:
+                        report(version + 1, description)
+                    step(cur)
+                    cur.execute('PRAGMA user_version = {}'.format(version + 1))
+        finally:
+            cur.execute('PRAGMA foreign_keys = {}'.format(config.databasePragmas.get('foreign_keys', 'OFF')))
+
+    return schemaVersion()
+
+
+# Command line entry point, so that migrations can be run on a database
+# (e.g. on the office PC) without a display
+def main(args=None):
+    # Only needed from the command line, so is not imported as the program starts
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m src.migrations',
+                                     description='Upgrade the schema of a Kingfisher Trust database.')
+    parser.add_argument('--db', default=config.DBFile, help='database file (default: %(default)s)')
+    parser.add_argument('--status', action='store_true', help='show the schema version and exit')
+    parser.add_argument('--target', type=int, help='version to migrate to (default: latest)')
+    args = parser.parse_args(args)
+
+    config.DBFile = args.db
+    try:
+        if args.status:
+            if not os.path.isfile(config.DBFile):
+                print('Database {} does not exist'.format(config.DBFile))
+                return 1
+            current = schemaVersion()
+            print('Schema version {} of {}'.format(current, latestVersion()))
+            for version, (description, _) in enumerate(MIGRATIONS, start=1):
+                print('  {} {:>3}  {}'.format('*' if version <= current else ' ', version, description))
+            return 0
+
+        createDatabase()
+        version = migrate(args.target, lambda number, description:
+                          print('Applying version {}: {}'.format(number, description)))
+        print('Database is at schema version {}'.format(version))
+        return 0
+    except (RuntimeError, ValueError) as error:
+        print('Error: {}'.format(error), file=sys.stderr)
+        return 1
+    finally:
+        closeDatabase()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+from collections import Counter
+
+from . import config
+from .sql import cursor, transaction
+
+
+# The items in an order being added or edited, keyed by itemID.
+# Each item is held once, with the quantity ordered, however many are ordered.
+class cart:
+    def __init__(self):
+        # itemID: [itemName, salePrice, quantity]
+        self.items = {}
+        self.total = 0
+
+    def __contains__(self, itemID):
+        return itemID in self.items
+
+    def __bool__(self):
+        return bool(self.items)
+
+    # Returns the number of an item in the cart
+    def quantity(self, itemID):
+        return self.items[itemID][2] if itemID in self.items else 0
+
+    # Sets the number of an item in the cart, adding or removing it as needed
+    def set(self, itemID, itemName, salePrice, quantity):
+        self.total += (quantity - self.quantity(itemID)) * salePrice
+        if quantity > 0:
+            self.items[itemID] = [itemName, salePrice, quantity]
+        else:
+            self.items.pop(itemID, None)
+        # Avoids e.g. -0.00 once every item has been removed
+        if not self.items:
+            self.total = 0
+
+    def remove(self, itemID):
+        itemName, salePrice, quantity = self.items[itemID]
+        self.set(itemID, itemName, salePrice, 0)
+
+    # Returns a Counter mapping each itemID to the number ordered
+    def quantities(self):
+        return Counter({itemID: item[2] for itemID, item in self.items.items()})
+
+    # Returns a line describing each item, e.g. 'IT0000012 Sandwich x 3'
+    def lines(self):
+        return ['{} {} x {}'.format(itemID, item[0], item[2]) for itemID, item in self.items.items()]
+
+
+# Raised when an order needs more of some items than there are in stock.
+# items is the list of itemIDs that there are not enough of.
+class OutOfStock(Exception):
+    def __init__(self, items):
+        super().__init__('Not enough stock of ' + ', '.join(items))
+        self.items = items
+
+
+# Takes items out of stock: quantities maps each itemID to the number taken.
+# Each item's stock is decremented by a single UPDATE that only matches while
+# there is enough stock left, so tills sharing the database cannot lose each
+# other's changes or sell stock that is not there. If any item is short, none
+# of the stock is taken and OutOfStock is raised.
+def takeStock(quantities):
+    with transaction(), cursor() as cur:
+        short = []
+        for itemID, quantity in quantities.items():
+            cur.execute('UPDATE itemTbl SET quantity = quantity - ? WHERE itemID = ? AND quantity >= ?',
+                        (quantity, itemID, quantity))
+            if cur.rowcount == 0:
+                short.append(itemID)
+        if short:
+            # Raising inside the transaction rolls back the items already taken
+            raise OutOfStock(short)
+
+
+# Puts items back into stock: quantities maps each itemID to the number returned
+def returnStock(quantities):
+    with transaction(), cursor() as cur:
+        cur.executemany('UPDATE itemTbl SET quantity = quantity + ? WHERE itemID = ?',
+                        [(quantity, itemID) for itemID, quantity in quantities.items()])
+
+
+# Saves a new order, taking its items out of stock, all in one transaction.
+# quantities maps each itemID in the order to the number sold.
+# Raises OutOfStock (saving nothing) if there is not enough of an item.
+def saveOrder(orderNo, customerID, total, date, staffID, quantities):
+    with transaction(), cursor() as cur:
+        cur.execute('INSERT INTO orderTbl VALUES (?,?,?,?,?)',
+                    (orderNo, customerID, '{:.2f}'.format(total), date, staffID))
+        takeStock(quantities)
+        cur.executemany('INSERT INTO orderItemTbl VALUES (?,?,?)',
+                        [(orderNo, itemID, quantity) for itemID, quantity in quantities.items()])
+
+
+# Updates an order, adjusting stock by how much the quantity of each item changed, all in
+# one transaction. original and quantities map each itemID to the number in the order
+# before and after the change. Only the items whose quantity changed are touched, with one
+# UPDATE each to stock and to the order's items, however many units changed.
+# Raises OutOfStock (saving nothing) if there is not enough of an item added.
+def updateOrder(orderNo, customerID, total, date, original, quantities):
+    with transaction(), cursor() as cur:
+        cur.execute('UPDATE orderTbl SET customerID = ?, orderTotal = ?, date = ? WHERE orderNo = ?',
+                    (customerID, '{:.2f}'.format(total), date, orderNo))
+        takeStock(quantities - original)
+        returnStock(original - quantities)
+        for itemID in original.keys() | quantities.keys():
+            if quantities[itemID] == original[itemID]:
+                continue
+            if not quantities[itemID]:
+                cur.execute('DELETE FROM orderItemTbl WHERE orderNo = ? AND itemID = ?', (orderNo, itemID))
+            elif not original[itemID]:
+                cur.execute('INSERT INTO orderItemTbl VALUES (?,?,?)', (orderNo, itemID, quantities[itemID]))
+            else:
+                cur.execute('UPDATE orderItemTbl SET quantity = ? WHERE orderNo = ? AND itemID = ?',
+                            (quantities[itemID], orderNo, itemID))
+
+
+# Deletes orders, putting their items back into stock, all in one transaction.
+# Orders are deleted in batches (sqlite limits the number of parameters in a statement),
+# with three statements per batch however many orders and items are in it: one UPDATE
+# restoring the stock of every item in the batch's orders, then one DELETE each for
+# their items and the orders themselves. Returns the number of orders deleted.
+def deleteOrders(orderNos, batch=500):
+    orderNos = list(orderNos)
+    deleted = 0
+    with transaction(), cursor() as cur:
+        for start in range(0, len(orderNos), batch):
+            chunk = orderNos[start:start + batch]
+            inChunk = 'orderNo IN ({})'.format(','.join('?' * len(chunk)))
+            cur.execute('''UPDATE itemTbl
+                           SET quantity = quantity + (SELECT SUM(quantity) FROM orderItemTbl
+                                                      WHERE itemID = itemTbl.itemID AND {0})
+                           WHERE itemID IN (SELECT itemID FROM orderItemTbl WHERE {0})'''.format(inChunk),
+                        chunk * 2)
+            cur.execute('DELETE FROM orderItemTbl WHERE ' + inChunk, chunk)
+            cur.execute('DELETE FROM orderTbl WHERE ' + inChunk, chunk)
+            deleted += cur.rowcount
+    return deleted
+
+
+# Yields one row for every item sold between the two dates (inclusive):
+# (orderNo, customerID, date, itemID, itemName, quantity, salePrice, supplierCost, supplierID, lastInOrder)
+# salePrice and supplierCost are already multiplied by the quantity.
+# lastInOrder is true for the final item of each order, which is the row the
+# report shows the order details on.
+# Rows are read from the cursor as they are needed, rather than all at once, oldest
+# first, or newest first (each order's items in reverse too) if newestFirst is set.
+def revenueLines(startDate, endDate, newestFirst=False):
+    with cursor() as cur:
+        cur.execute('''
+            SELECT orderTbl.orderNo, orderTbl.customerID, orderTbl.date,
+                   itemTbl.itemID, itemTbl.itemName, orderItemTbl.quantity,
+                   itemTbl.salePrice * orderItemTbl.quantity,
+                   itemTbl.supplierCost * orderItemTbl.quantity,
+                   itemTbl.supplierID,
+                   ROW_NUMBER() OVER (PARTITION BY orderTbl.orderNo ORDER BY orderItemTbl.itemID DESC) = 1
+            FROM orderTbl
+            JOIN orderItemTbl ON orderItemTbl.orderNo = orderTbl.orderNo
+            JOIN itemTbl ON itemTbl.itemID = orderItemTbl.itemID
+            WHERE orderTbl.date BETWEEN ? AND ?
+            ORDER BY orderTbl.rowid {0}, orderItemTbl.itemID {0}'''.format('DESC' if newestFirst else 'ASC'),
+                    (startDate.strftime(config.dateFormat), endDate.strftime(config.dateFormat)))
+
+        for row in cur:
+            yield row
@@ -0,0 +1,72 @@
+from . import config, sql
+
+# Passwords are stored in staffTbl as bcrypt hashes. Each hash holds its own salt
+# and cost factor, so any stored password can be checked whatever cost it was
+# hashed at. The salt column keeps a copy of the salt for older code.
+#
+# Hashing is deliberately slow (twice as slow for each round added to
+# config.passwordRounds), so windows should call these from a worker thread.
+# bcrypt is imported the first time a password is hashed or checked, not at startup.
+
+
+def _bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+# Hashes a password at the configured cost. Returns the hash and its salt.
+def hashPassword(password):
+    import bcrypt
+    salt = bcrypt.gensalt(config.passwordRounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt), salt
+
+
+# Returns whether the password matches the stored hash
+def checkPassword(password, hashed):
+    import bcrypt
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), _bytes(hashed))
+    except ValueError:
+        # The stored value is not a bcrypt hash, so nothing can match it
+        return False
+
+
+# Returns whether a stored hash was made at a lower cost than is now configured
+def needsRehash(hashed):
+    # Hashes are in the form $2b$12$..., where 12 is the cost
+    return int(_bytes(hashed).split(b'$')[2]) < config.passwordRounds
+
+
+# Fetches a member of staff's record and checks their password.
+# Returns the record (or None if there is no such user) and whether the password matched.
+# Staff with access level 'x' no longer have access to the system, so are never matched.
+# If the password matches but was hashed at a lower cost than configured, it is hashed
+# again at the configured cost, so raising config.passwordRounds takes effect as staff log in.
+def checkStaff(staffID, password):
+    user = sql.executeSQL('SELECT * FROM staffTbl WHERE staffID = ?', (staffID,), False)
+    if not user or user[4] == 'x' or not checkPassword(password, user[5]):
+        return user, False
+    if needsRehash(user[5]):
+        hashed, salt = hashPassword(password)
+        # Only replaces the password that was checked, in case it has been changed since
+        sql.executeSQL('UPDATE staffTbl SET password = ?, salt = ? WHERE staffID = ? AND password = ?',
+                       (hashed, salt, staffID, user[5]), False)
+    return user, True
+
+
+# Checks the password entered against a member of staff's stored hash (and its salt) before
+# their record is changed. Returns None if it doesn't match, else the hash and salt to store:
+# newPassword hashed, or the stored ones if newPassword is None.
+def checkNewPassword(password, hashed, salt, newPassword=None):
+    if not checkPassword(password, hashed):
+        return None
+    if newPassword is None:
+        return hashed, salt
+    return hashPassword(newPassword)
+
+
+# Sets a member of staff's password. Returns False if there is no such user.
+def setPassword(staffID, password):
+    hashed, salt = hashPassword(password)
+    with sql.cursor() as cur:
+        cur.execute('UPDATE staffTbl SET password = ?, salt = ? WHERE staffID = ?', (hashed, salt, staffID))
+        return cur.rowcount > 0
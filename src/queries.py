@@ -0,0 +1,174 @@
+import logging
+import logging.handlers
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+from . import config
+
+# Every statement run through sql.cursor() or sql.executeSQL is timed and recorded here:
+#   - the most recent config.queryHistory statements are kept in memory, in a ring buffer
+#   - totals for each distinct statement are kept, for the diagnostics window
+#   - each statement is written to a rotating log file, config.queryLogFile (in the database's
+#     folder), if config.queryLogAll is set
+#   - statements slower than config.slowQuery ms are logged as warnings, along with the
+#     plan SQLite used to run them (EXPLAIN QUERY PLAN), to show e.g. a missing index
+#
+# A statement's time is how long SQLite took to run it up to its first row, plus any time
+# fetching its rows with fetchone/fetchall. Rows read by looping over the cursor (e.g. by
+# the reports) are neither timed nor counted, as the caller does its own work in between.
+
+_lock = threading.Lock()
+# The most recent statements: [time run, seconds, statement, rows, call site]
+history = deque(maxlen=config.queryHistory)
+# For each distinct statement: [calls, total seconds, slowest seconds, rows, call site, query plan]
+_totals = {}
+_log = None
+
+
+# A rotating log file that is only created (along with its folder) once something is logged
+class _logFile(logging.handlers.RotatingFileHandler):
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+# Returns the log that statements are written to, setting it up the first time. A relative
+# config.queryLogFile is in the database's folder, not wherever the program was run from.
+def _logger():
+    global _log
+    if _log is None:
+        log = logging.getLogger('kingfisher.queries')
+        log.propagate = False
+        if config.queryLogFile:
+            fileName = os.path.join(os.path.dirname(os.path.abspath(config.DBFile)), config.queryLogFile)
+            handler = _logFile(fileName, maxBytes=config.queryLogBytes, backupCount=config.queryLogFiles,
+                               encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(threadName)s %(message)s'))
+            log.addHandler(handler)
+        log.setLevel(logging.INFO if config.queryLogAll else logging.WARNING)
+        _log = log
+    return _log
+
+
+# Returns where a statement was run from, e.g. 'orders.py:87 saveOrder', skipping the
+# database modules themselves
+def _callSite():
+    frame = sys._getframe(1)
+    while frame and os.path.basename(frame.f_code.co_filename) in ('sql.py', 'queries.py', 'contextlib.py'):
+        frame = frame.f_back
+    if frame is None:
+        return ''
+    return '{}:{} {}'.format(os.path.basename(frame.f_code.co_filename), frame.f_lineno, frame.f_code.co_name)
+
+
+# Returns the plan SQLite uses to run a statement, one step per line
+def explain(connection, statement, parameters=()):
+    try:
+        plan = connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        # e.g. the statement cannot be explained, or the connection is busy
+        return ''
+    return '\n'.join(step[-1] for step in plan)
+
+
+# Records a statement once it has finished: how long it took, and the number of rows it
+# returned or changed
+def record(connection, statement, parameters, seconds, rows, site):
+    entry = (time.time(), seconds, ' '.join(statement.split()), rows, site)
+    with _lock:
+        history.append(entry)
+        totals = _totals.get(entry[2])
+        if totals is None:
+            totals = _totals[entry[2]] = [0, 0.0, 0.0, 0, '', '']
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+        totals[3] += rows
+        totals[4] = site
+
+    log = _logger()
+    if seconds * 1000 >= config.slowQuery:
+        plan = explain(connection, statement, parameters)
+        with _lock:
+            totals[5] = plan
+        log.warning('SLOW %.1f ms, %d rows, %s: %s\n%s', seconds * 1000, rows, site, entry[2], plan)
+    elif log.isEnabledFor(logging.INFO):
+        log.info('%.1f ms, %d rows, %s: %s', seconds * 1000, rows, site, entry[2])
+
+
+# Returns the statements that have taken the most time in total, slowest first:
+# [(statement, calls, total seconds, slowest seconds, rows, last call site, query plan)]
+def slowest(count):
+    with _lock:
+        statements = [(statement,) + tuple(totals) for statement, totals in _totals.items()]
+    return sorted(statements, key=lambda statement: statement[2], reverse=True)[:count]
+
+
+# Forgets every statement recorded so far
+def clear():
+    with _lock:
+        history.clear()
+        _totals.clear()
+
+
+# A cursor that records each statement it runs. A statement is recorded once it has
+# finished, i.e. when the next one is run or the cursor is closed, so the time spent
+# fetching its rows is included.
+class timedCursor(sqlite3.Cursor):
+    # [statement, parameters, seconds, rows, call site] of the statement being run
+    running = None
+
+    def execute(self, statement, parameters=()):
+        self.finish()
+        began = time.perf_counter()
+        super().execute(statement, parameters)
+        self.running = [statement, parameters, time.perf_counter() - began, max(self.rowcount, 0), _callSite()]
+        return self
+
+    def executemany(self, statement, parameters):
+        self.finish()
+        parameters = list(parameters)
+        began = time.perf_counter()
+        super().executemany(statement, parameters)
+        # Only the first set of parameters is kept, to explain the statement with if it is slow
+        self.running = [statement, parameters[0] if parameters else (), time.perf_counter() - began,
+                        max(self.rowcount, 0), _callSite()]
+        return self
+
+    def fetchone(self):
+        began = time.perf_counter()
+        row = super().fetchone()
+        self.fetched(time.perf_counter() - began, row is not None)
+        return row
+
+    def fetchall(self):
+        began = time.perf_counter()
+        rows = super().fetchall()
+        self.fetched(time.perf_counter() - began, len(rows))
+        return rows
+
+    def fetchmany(self, size=None):
+        began = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.fetched(time.perf_counter() - began, len(rows))
+        return rows
+
+    def fetched(self, seconds, rows):
+        if self.running:
+            self.running[2] += seconds
+            self.running[3] += rows
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    # Records the statement that was last run, if it has not been already
+    def finish(self):
+        if self.running:
+            statement, parameters, seconds, rows, site = self.running
+            self.running = None
+            record(self.connection, statement, parameters, seconds, rows, site)
@@ -1,372 +1,385 @@
-from prettytable import PrettyTable
 from fpdf import FPDF
 from tkinter import messagebox
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import chain, islice
+import argparse
+import multiprocessing
+import os
+import sqlite3
 import subprocess
+import sys
 
 from . import config
+from .orders import revenueLines
+from .sql import cursor, closeDatabase
+from .totals import revenueTotals, donationTotals, expenditureTotal
 
+# Each report is written straight to a PDF from its rows, one row at a time, so rows can be
+# streamed from the database (or any iterable) without being held in memory. FPDF keeps every
+# page of a file in memory until the file is written, so a report of more than
+# config.reportRows rows is split into parts, each written to its own file once it is full.
+# Column widths are sized from the headings and the first rows, and the headings are repeated
+# at the top of every page. The process is identical for donation reports, order and expenditure reports.
+#
+# e.g.  orderReport(startDate, endDate, totalCost, totalRevenue, totalProfit).save(rows)
 
-# Using the records fetched from the previous report, which was output into a treeview,
-# this puts the same records (i.e. exact same report) into a table, which is then pasted into
-# a PDF document. The process is identical for donation reports, order and expenditure reports.
+# Number of rows read before the first is written, to size the columns from
+_SAMPLE_ROWS = 200
 
-class donationReport:
 
-    def __init__(self, startDate, endDate, records, totalDonat):
-        self.startDate = startDate
-        self.endDate = endDate
-        records.reverse()
-        self.records = records
-        self.totalDonat = totalDonat
-        self.createPDF()
-
-    def createPDF(self):
-        self.table = PrettyTable()
-        self.table.field_names = ['DonationID', 'Amount', 'Cash/Bank', 'Reference No', 'Date', 'DonorID', 'Donor Name',
-                                  'StaffID']
-
-        for record in self.records:
-            self.table.add_row(record)
-
-        header, data = self.get_data_from_prettytable(self.table)
-        self.export_to_pdf(header, data)
-
-    def get_data_from_prettytable(self, data):
-        """
-        Get a list of list from pretty_data table
-        Arguments:
-            :param data: data table to process
-            :type data: PrettyTable
-        """
-
-        def remove_space(liste):
-            """
-            Remove space for each word in a list
-            Arguments:
-                :param liste: list of strings
-            """
-            list_without_space = []
-            for mot in liste:  # For each word in list
-                list_without_space.append(mot)  # list of word without space
-            return list_without_space
-
-        # Get each row of the table
-        string_x = str(self.table).split('\n')  # Get a list of row
-        header = string_x[1].split('|')[1: -1]  # Columns names
-        rows = string_x[3:len(string_x) - 1]  # List of rows
-
-        list_word_per_row = []
-        for row in rows:  # For each word in a row
-            # Remove first and last arguments
-            row_resize = row.split('|')[1:-1]
-            list_word_per_row.append(remove_space(row_resize))  # Remove spaces
-
-        return header, list_word_per_row
-
-    def export_to_pdf(self, header, data):
-        """
-        Create a a table in PDF file from a list of row
-            :param header: columns name
-            :param data: List of row (a row = a list of cells)
-            :param spacing=1:
-        """
-        pdf = FPDF()  # New  pdf object
-
-        pdf.set_font('Arial', size=10)  # Font style
-        epw = pdf.w - 2 * pdf.l_margin  # Width of document
-        col_width = pdf.w / 9  # Column width in table
-        row_height = pdf.font_size * 1.5  # Row height in table
-        spacing = 1.3  # Space in each cell
-
-        pdf.add_page()  # add new page
-        pdf.image(config.logo, 20, 5, 12, 13)
-        pdf.image(config.logo, epw - 20, 5, 12, 13)
-        pdf.add_font('algerian', '', config.font, uni=True)
-        pdf.set_font('algerian', size=14)
-        pdf.set_text_color(35, 128, 183)  # Trust logo colour
-        pdf.cell(epw, 0, 'Kingfisher Trust', align='C')
-        pdf.ln(row_height * spacing)
-        pdf.set_font('Arial', size=10)
-        pdf.set_text_color(0, 0, 0)
-        pdf.cell(epw, 0, 'Donation Report', align='C')  # create title cell
-        pdf.ln(row_height * spacing)  # Define title line style
-        pdf.cell(epw, 0, 'From ' + str(datetime.isoformat(self.startDate)[:10]) + ' to '
-                 + str(datetime.isoformat(self.endDate)[:10]) + ':', align='L')
-        pdf.ln(row_height * spacing)
-        pdf.cell(10, 0, 'Total Donated = £{:.2f}'.format(
-            self.totalDonat), align='L')
-        pdf.cell(epw - 10, 0, 'Report Created: ' +
-                 str(datetime.isoformat(datetime.today())[:10]), align='R')
-        pdf.ln(row_height * spacing)
-
-        # Add header
-        for item in header:  # for each column
-            pdf.cell(col_width, row_height * spacing,  # Add a new cell
-                     txt=item, border='B', align='C')
-        pdf.ln(row_height * spacing)  # New line after header
-
-        for row in data:  # For each row of the table
-            for item in row:  # For each cell in row
-                pdf.cell(col_width, row_height * spacing,  # Add cell
-                         txt=item, border=0, align='C')
-            pdf.ln(row_height * spacing)  # Add line at the end of row
-
-        title = ('reports/DONATION ' + str(datetime.isoformat(self.startDate)[:10]) + ' to ' +
-                 str(datetime.isoformat(self.endDate)[:10]) + '.pdf')
-
-        try:
-            pdf.output(title)  # Create pdf file
-            pdf.close()
-            openFile = messagebox.askyesno('Success',
-                                           'PDF File Created\n' + title + '\n\nOpen File?')  # Outputs success dialogue
-        except OSError:
-            openFile = messagebox.askyesno(
-                'Error', 'Unable to Overwrite Existing File\n\nOpen File?', icon='error')
-
-        if openFile:
-            subprocess.Popen([title], shell=True)  # Opens file
-
-
-class orderReport:
-
-    def __init__(self, startDate, endDate, records, totalCost, totalRevenue, totalProfit):
-        self.startDate = startDate
-        self.endDate = endDate
-        records.reverse()
-        self.records = records
-        self.totalCost = totalCost
-        self.totalRevenue = totalRevenue
-        self.totalProfit = totalProfit
-        self.createPDF()
-
-    def createPDF(self):
-
-        self.table = PrettyTable()
-        self.table.field_names = ['OrderID', 'CustomerID', 'Date', 'ItemID', 'ItemName', 'Quantity', 'SalePrice',
-                                  'SupplierCost', 'SupplierID']
-
-        for record in self.records:
-            self.table.add_row(record)
-
-        header, data = self.get_data_from_prettytable(self.table)
-        self.export_to_pdf(header, data)
-
-    def get_data_from_prettytable(self, data):
-        """
-        Get a list of list from pretty_data table
-        Arguments:
-            :param data: data table to process
-            :type data: PrettyTable
-        """
-
-        def remove_space(liste):
-            """
-            Remove space for each word in a list
-            Arguments:
-                :param liste: list of strings
-            """
-            list_without_space = []
-            for mot in liste:  # For each word in list
-                list_without_space.append(mot)  # list of word without space
-            return list_without_space
-
-        # Get each row of the table
-        string_x = str(self.table).split('\n')  # Get a list of row
-        header = string_x[1].split('|')[1: -1]  # Columns names
-        rows = string_x[3:len(string_x) - 1]  # List of rows
-
-        list_word_per_row = []
-        for row in rows:  # For each word in a row
-            # Remove first and last arguments
-            row_resize = row.split('|')[1:-1]
-            list_word_per_row.append(remove_space(row_resize))  # Remove spaces
-
-        return header, list_word_per_row
-
-    def export_to_pdf(self, header, data):
-        """
-        Create a a table in PDF file from a list of row
-            :param header: columns name
-            :param data: List of row (a row = a list of cells)
-            :param spacing=1:
-        """
-        pdf = FPDF()  # New  pdf object
-
-        pdf.set_font('Arial', size=10)  # Font style
-        epw = pdf.w - 2 * pdf.l_margin  # Width of document
-        col_width = pdf.w / 10  # Column width in table
-        row_height = pdf.font_size * 1.5  # Row height in table
-        spacing = 1.3  # Space in each cell
-
-        pdf.add_page()  # add new page
-        pdf.image(config.logo, 20, 5, 12, 13)
-        pdf.image(config.logo, epw - 20, 5, 12, 13)
-        pdf.add_font('algerian', '', config.font,
-                     uni=True)  # Adds algerian font
-        pdf.set_font('algerian', size=14)
-        pdf.set_text_color(35, 128, 183)  # Trust logo colour
-        pdf.cell(epw, 0, 'Kingfisher Trust', align='C')
-        pdf.ln(row_height * spacing)
-        pdf.set_font('Arial', size=10)
-        pdf.set_text_color(0, 0, 0)
-        pdf.cell(epw, 0, 'Revenue Report', align='C')  # create title cell
-        pdf.ln(row_height * spacing)  # Define title line style
-        pdf.cell(epw, 0, 'From ' + str(datetime.isoformat(self.startDate)[:10]) + ' to '
-                 + str(datetime.isoformat(self.endDate)[:10]) + ':', align='L')
-        pdf.ln(row_height * spacing)
-        pdf.cell(10, 0, str('Total Cost = £{:.2f}'.format(
-            self.totalCost)), align='L')
-        pdf.cell(epw - 10, 0, 'Report Created: ' +
-                 str(datetime.isoformat(datetime.today())[:10]), align='R')
-        pdf.ln(row_height * spacing)
-        pdf.cell(10, 0, str('Total Revenue = £{:.2f}'.format(
-            self.totalRevenue)), align='L')
-        pdf.ln(row_height * spacing)
-        pdf.cell(10, 0, str('Total Profit = £{:.2f}'.format(
-            self.totalProfit)), align='L')
-        pdf.ln(row_height * spacing)
-
-        # Add header
-        for item in header:  # for each column
-            pdf.cell(col_width, row_height * spacing,  # Add a new cell
-                     txt=item, border='B', align='C')
-        pdf.ln(row_height * spacing)  # New line after header
-
-        for row in data:  # For each row of the table
-            for item in row:  # For each cell in row
-                pdf.cell(col_width, row_height * spacing,  # Add cell
-                         txt=item, border=0, align='C')
-            pdf.ln(row_height * spacing)  # Add line at the end of row
-        title = ('reports/REVENUE ' + str(datetime.isoformat(self.startDate)[:10]) + ' to ' +
-                 str(datetime.isoformat(self.endDate)[:10]) + '.pdf')
-
-        try:
-            # Will overwrite any existing file
-            pdf.output(title)  # Create pdf file
-            pdf.close()
-            openFile = messagebox.askyesno('Success',
-                                           'PDF File Created\n' + title + '\n\nOpen File?')  # Outputs success dialogue
-        except OSError:
-            openFile = messagebox.askyesno(
-                'Error', 'Unable to Overwrite Existing File\n\nOpen File?', icon='error')
-
-        if openFile:
-            subprocess.Popen([title], shell=True)  # Opens file
-
-
-class expenditureReport:
-
-    def __init__(self, startDate, endDate, records, totalSpent):
+# Formats a value from a report row as text for the PDF
+def _text(value):
+    if value is None:
+        return ''
+    # The built in fonts can only show latin-1 characters
+    return str(value).encode('latin-1', 'replace').decode('latin-1')
+
+
+def _money(value):
+    if isinstance(value, (int, float)):
+        return '£{:.2f}'.format(value)
+    return _text(value)
+
+
+class report(FPDF):
+    # The report's name, used in its title and file name, and its columns: (heading, format)
+    name = ''
+    columns = []
+
+    def __init__(self, startDate, endDate, totals):
+        super().__init__()
         self.startDate = startDate
         self.endDate = endDate
-        records.reverse()
-        self.records = records
-        self.totalSpent = totalSpent
-        self.createPDF()
-
-    def createPDF(self):
-        self.table = PrettyTable()
-        self.table.field_names = ['ExpenditureID',
-                                  'Amount', 'Details', 'Date', 'StaffID']
-
-        for record in self.records:
-            self.table.add_row(record)
-
-        header, data = self.get_data_from_prettytable(self.table)
-        self.export_to_pdf(header, data)
-
-    def get_data_from_prettytable(self, data):
-        """
-        Get a list of list from pretty_data table
-        Arguments:
-            :param data: data table to process
-            :type data: PrettyTable
-        """
-
-        def remove_space(liste):
-            """
-            Remove space for each word in a list
-            Arguments:
-                :param liste: list of strings
-            """
-            list_without_space = []
-            for mot in liste:  # For each word in list
-                list_without_space.append(mot)  # list of word without space
-            return list_without_space
-
-        # Get each row of the table
-        string_x = str(self.table).split('\n')  # Get a list of row
-        header = string_x[1].split('|')[1: -1]  # Columns names
-        rows = string_x[3:len(string_x) - 1]  # List of rows
-
-        list_word_per_row = []
-        for row in rows:  # For each word in a row
-            # Remove first and last arguments
-            row_resize = row.split('|')[1:-1]
-            list_word_per_row.append(remove_space(row_resize))  # Remove spaces
-
-        return header, list_word_per_row
-
-    def export_to_pdf(self, header, data):
-        """
-        Create a a table in PDF file from a list of row
-            :param header: columns name
-            :param data: List of row (a row = a list of cells)
-            :param spacing=1:
-        """
-        pdf = FPDF()  # New  pdf object
-
-        pdf.set_font('Arial', size=10)  # Font style
-        epw = pdf.w - 2 * pdf.l_margin  # Width of document
-        col_width = pdf.w / 5.5  # Column width in table
-        row_height = pdf.font_size * 1.5  # Row height in table
-        spacing = 1.3  # Space in each cell
-
-        pdf.add_page()  # add new page
-        pdf.image(config.logo, 20, 5, 12, 13)
-        pdf.image(config.logo, epw - 20, 5, 12, 13)
-        pdf.add_font('algerian', '', config.font, uni=True)
-        pdf.set_font('algerian', size=14)
-        pdf.set_text_color(35, 128, 183)  # Trust logo colour
-        pdf.cell(epw, 0, 'Kingfisher Trust', align='C')
-        pdf.ln(row_height * spacing)
-        pdf.set_font('Arial', size=10)
-        pdf.set_text_color(0, 0, 0)
-        pdf.cell(epw, 0, 'Expenditure Report', align='C')  # create title cell
-        pdf.ln(row_height * spacing)  # Define title line style
-        pdf.cell(epw, 0, 'From ' + str(datetime.isoformat(self.startDate)[:10]) + ' to '
-                 + str(datetime.isoformat(self.endDate)[:10]) + ':', align='L')
-        pdf.ln(row_height * spacing)
-        pdf.cell(10, 0, 'Total Spent = £{:.2f}'.format(
-            self.totalSpent), align='L')
-        pdf.cell(epw - 10, 0, 'Report Created: ' +
-                 str(datetime.isoformat(datetime.today())[:10]), align='R')
-        pdf.ln(row_height * spacing)
-
-        # Add header
-        for item in header:  # for each column
-            pdf.cell(col_width, row_height * spacing,  # Add a new cell
-                     txt=item, border='B', align='C')
-        pdf.ln(row_height * spacing)  # New line after header
-
-        for row in data:  # For each row of the table
-            for item in row:  # For each cell in row
-                pdf.cell(col_width, row_height * spacing,  # Add cell
-                         txt=item, border=0, align='C')
-            pdf.ln(row_height * spacing)  # Add line at the end of row
-
-        title = ('reports/EXPENDITURE ' + str(datetime.isoformat(self.startDate)[:10]) + ' to ' +
-                 str(datetime.isoformat(self.endDate)[:10]) + '.pdf')
-
-        try:
-            pdf.output(title)  # Create pdf file
-            pdf.close()
-            openFile = messagebox.askyesno('Success',
-                                           'PDF File Created\n' + title + '\n\nOpen File?')  # Outputs success dialogue
-        except OSError:
-            openFile = messagebox.askyesno(
-                'Error', 'Unable to Overwrite Existing File\n\nOpen File?', icon='error')
-
-        if openFile:
-            subprocess.Popen([title], shell=True)  # Opens file
+        # Lines of text shown above the table on the first page, e.g. 'Total Spent = £10.00'
+        self.totals = totals
+        # The report's file, less '.pdf'. A report split into parts adds each part's number.
+        self.baseName = os.path.join(config.reportFolder, '{} {} to {}'.format(
+            self.name.upper(), startDate.strftime(config.dateFormat), endDate.strftime(config.dateFormat)))
+        self.fileName = self.baseName + '.pdf'
+        self.widths = []
+        self.set_title(self.name + ' Report')
+        self.set_font('Arial', size=10)
+        self.rowHeight = self.font_size * 1.5 * 1.3
+        self.alias_nb_pages()
+        self.add_font('algerian', '', config.font, uni=True)
+        # The font's cached metrics (static/ALGER.pkl) hold its path relative to where they
+        # were made, so the font is pointed back at the file it was loaded from
+        self.fonts['algerian']['ttffile'] = config.font
+
+    # Writes the rows to the report's file in config.reportFolder, or to one file for each
+    # config.reportRows rows if there are more. Returns the files' names. fileName is the file
+    # being written. Raises OSError if a file cannot be written (e.g. it is open elsewhere).
+    def save(self, rows):
+        rows = iter(rows)
+        sample = list(islice(rows, _SAMPLE_ROWS))
+        self.sizeColumns(sample)
+        rows = chain(sample, rows)
+        fileNames = []
+        while True:
+            # Each part is a document of its own, so its pages are let go once it is written
+            part = self.newPart()
+            part.addRows(islice(rows, config.reportRows))
+            following = list(islice(rows, 1))
+            if following or fileNames:
+                self.fileName = '{} part {}.pdf'.format(self.baseName, len(fileNames) + 1)
+            part.output(self.fileName)
+            fileNames.append(self.fileName)
+            if not following:
+                return fileNames
+            rows = chain(following, rows)
+
+    # Returns a new, empty document for a part of the report, with the same columns
+    def newPart(self):
+        part = type(self).__new__(type(self))
+        report.__init__(part, self.startDate, self.endDate, self.totals)
+        part.widths = self.widths
+        return part
+
+    # Adds the rows to the table, starting on a new page. Pages are broken automatically when full.
+    def addRows(self, rows):
+        # The width of the widest character in the table's font
+        self.charWidth = self.font_size * max(self.current_font['cw'].values()) / 1000
+        self.add_page()
+        for row in rows:
+            self.addRow(row)
+
+    # Sizes each column to fit its heading and the widest of the sample rows (up to a third
+    # of the page, so one long value cannot squeeze the others), then scales them all to
+    # fill the width of the page
+    def sizeColumns(self, sample):
+        pageWidth = self.w - self.l_margin - self.r_margin
+        headings = [self.get_string_width(heading) for heading, formatter in self.columns]
+        widths = list(headings)
+        for row in sample:
+            for column, value in enumerate(row):
+                widths[column] = max(widths[column], self.get_string_width(self.columns[column][1](value)))
+        # Leaves a small gap between columns
+        widths = [max(min(width, pageWidth / 3), heading) + 4 for width, heading in zip(widths, headings)]
+        self.widths = [width * pageWidth / sum(widths) for width in widths]
+
+    # Adds a row to the table. The page is broken automatically when it is full.
+    def addRow(self, row):
+        for column, value in enumerate(row):
+            self.cell(self.widths[column], self.rowHeight, self.fit(self.columns[column][1](value), column),
+                      border=0, align='C')
+        self.ln(self.rowHeight)
+
+    # Shortens text that is too wide for its column
+    def fit(self, text, column):
+        width = self.widths[column] - 2
+        # Most text is short enough to fit even if every character were the widest one,
+        # which saves measuring it
+        if len(text) * self.charWidth <= width or self.get_string_width(text) <= width:
+            return text
+        while text and self.get_string_width(text + '...') > width:
+            text = text[:-1]
+        return text + '...'
+
+    # Called by FPDF at the start of each page
+    def header(self):
+        pageWidth = self.w - self.l_margin - self.r_margin
+        if self.page_no() == 1:
+            self.image(config.logo, 20, 5, 12, 13)
+            self.image(config.logo, pageWidth - 20, 5, 12, 13)
+            self.set_font('algerian', size=14)
+            self.set_text_color(35, 128, 183)  # Trust logo colour
+            self.cell(pageWidth, 0, 'Kingfisher Trust', align='C')
+            self.ln(self.rowHeight)
+            self.set_font('Arial', size=10)
+            self.set_text_color(0, 0, 0)
+            self.cell(pageWidth, 0, self.name + ' Report', align='C')
+            self.ln(self.rowHeight)
+            self.cell(pageWidth, 0, 'From ' + self.startDate.strftime(config.dateFormat) + ' to '
+                      + self.endDate.strftime(config.dateFormat) + ':', align='L')
+            self.ln(self.rowHeight)
+            for line, total in enumerate(self.totals):
+                self.cell(10, 0, total, align='L')
+                if line == 0:
+                    self.cell(pageWidth - 10, 0, 'Report Created: ' + datetime.today().strftime(config.dateFormat),
+                              align='R')
+                self.ln(self.rowHeight)
+        # The column headings are repeated on every page
+        for column, (heading, formatter) in enumerate(self.columns):
+            self.cell(self.widths[column], self.rowHeight, heading, border='B', align='C')
+        self.ln(self.rowHeight)
+
+    # Called by FPDF at the end of each page
+    def footer(self):
+        self.set_y(-15)
+        self.cell(0, 10, 'Page {} of {{nb}}'.format(self.page_no()), align='C')
+
+
+class donationReport(report):
+    name = 'Donation'
+    columns = [('DonationID', _text), ('Amount', _money), ('Cash/Bank', _text), ('Reference No', _text),
+               ('Date', _text), ('DonorID', _text), ('Donor Name', _text), ('StaffID', _text)]
+
+    def __init__(self, startDate, endDate, totalDonat):
+        super().__init__(startDate, endDate, ['Total Donated = £{:.2f}'.format(totalDonat)])
+
+
+class orderReport(report):
+    name = 'Revenue'
+    columns = [('OrderID', _text), ('CustomerID', _text), ('Date', _text), ('ItemID', _text), ('ItemName', _text),
+               ('Quantity', _text), ('SalePrice', _money), ('SupplierCost', _money), ('SupplierID', _text)]
+
+    def __init__(self, startDate, endDate, totalCost, totalRevenue, totalProfit):
+        super().__init__(startDate, endDate, ['Total Cost = £{:.2f}'.format(totalCost),
+                                              'Total Revenue = £{:.2f}'.format(totalRevenue),
+                                              'Total Profit = £{:.2f}'.format(totalProfit)])
+
+
+class expenditureReport(report):
+    name = 'Expenditure'
+    columns = [('ExpenditureID', _text), ('Amount', _money), ('Details', _text), ('Date', _text),
+               ('StaffID', _text)]
+
+    def __init__(self, startDate, endDate, totalSpent):
+        super().__init__(startDate, endDate, ['Total Spent = £{:.2f}'.format(totalSpent)])
+
+
+# Tells the user that a report has been saved, offering to open it (its first file, if it
+# was split into parts)
+def reportSaved(fileNames):
+    if messagebox.askyesno('Success', ('PDF File Created\n' if len(fileNames) == 1 else 'PDF Files Created\n') +
+                           '\n'.join(fileNames) + '\n\nOpen File?'):
+        subprocess.Popen([fileNames[0]], shell=True)  # Opens file
+
+
+# Tells the user that a report could not be saved, offering to open the existing file
+def reportFailed(fileName, error):
+    if not isinstance(error, OSError):
+        messagebox.showerror('Error', 'Unable to Save Report\n' + str(error))
+    elif messagebox.askyesno('Error', 'Unable to Overwrite Existing File\n\nOpen File?', icon='error'):
+        subprocess.Popen([fileName], shell=True)  # Opens file
+
+
+# Yields the rows of a revenue report between the two dates (inclusive). Only the
+# last item of each order (the first shown) has the order's number, customer and date.
+def revenueRows(startDate, endDate, newestFirst=False):
+    for orderNo, customerID, date, itemID, itemName, quantity, salePrice, supplierCost, supplierID, \
+            lastInOrder in revenueLines(startDate, endDate, newestFirst):
+        if not lastInOrder:
+            orderNo, customerID, date = '', '', ''
+        yield orderNo, customerID, date, itemID, itemName, quantity, salePrice, supplierCost, supplierID
+
+
+# Yields the rows of a donation report between the two dates (inclusive), using the index
+# on donationsTbl.date. Donations without a donor record (i.e. anonymous ones) are included too.
+def donationRows(startDate, endDate, newestFirst=False):
+    with cursor() as cur:
+        cur.execute('''SELECT donationsTbl.*, donorTbl.donorForename, donorTbl.donorSurname
+                       FROM donationsTbl LEFT JOIN donorTbl ON donationsTbl.donorID = donorTbl.donorID
+                       WHERE donationsTbl.date BETWEEN ? AND ?
+                       ORDER BY donationsTbl.rowid {}'''.format('DESC' if newestFirst else 'ASC'),
+                    (startDate.strftime(config.dateFormat), endDate.strftime(config.dateFormat)))
+        for i in cur:
+            donorName = (i[7] + ' ' + i[8]).strip() if i[7] is not None else 'Anonymous'
+            yield i[0], i[1], i[2], i[3], i[4], i[5], donorName, i[6]
+
+
+# Yields the rows of an expenditure report between the two dates (inclusive), using the
+# index on expenditureTbl.date
+def expenditureRows(startDate, endDate, newestFirst=False):
+    with cursor() as cur:
+        cur.execute('SELECT * FROM expenditureTbl WHERE date BETWEEN ? AND ? ORDER BY rowid {}'.format(
+            'DESC' if newestFirst else 'ASC'), (startDate.strftime(config.dateFormat),
+                                                endDate.strftime(config.dateFormat)))
+        for row in cur:
+            yield row
+
+
+# The reports that can be made from the command line, and how to make each one
+# for a date range: (a function returning the report with its totals, the rows function)
+REPORTS = {
+    'revenue': (lambda startDate, endDate: orderReport(startDate, endDate, *revenueTotals(startDate, endDate)),
+                revenueRows),
+    'donation': (lambda startDate, endDate: donationReport(startDate, endDate,
+                                                           donationTotals(startDate, endDate)[2]),
+                 donationRows),
+    'expenditure': (lambda startDate, endDate: expenditureReport(startDate, endDate,
+                                                                 expenditureTotal(startDate, endDate)),
+                    expenditureRows),
+}
+
+
+# Makes a report for the dates and saves it as a PDF, newest records first, as the windows do.
+# Returns the names of its files.
+def makeReport(kind, startDate, endDate):
+    newReport, rows = REPORTS[kind]
+    return newReport(startDate, endDate).save(rows(startDate, endDate, newestFirst=True))
+
+
+# Splits the dates into periods: 'whole' (one period), 'daily', 'weekly' (Monday to Sunday),
+# 'monthly' or 'yearly'. The first and last periods are cut short to fit the dates.
+# Yields each period's (startDate, endDate), both inclusive.
+def periods(startDate, endDate, period):
+    start = startDate
+    while start <= endDate:
+        if period == 'whole':
+            end = endDate
+        elif period == 'daily':
+            end = start
+        elif period == 'weekly':
+            end = start + timedelta(days=6 - start.weekday())
+        elif period == 'monthly':
+            nextMonth = start.replace(day=28) + timedelta(days=4)
+            end = nextMonth - timedelta(days=nextMonth.day)
+        elif period == 'yearly':
+            end = start.replace(month=12, day=31)
+        else:
+            raise ValueError('Unknown period ' + period)
+        end = min(end, endDate)
+        yield start, end
+        start = end + timedelta(days=1)
+
+
+# Each process in the pool opens the same database and saves to the same folder
+def _startWorker(database, folder):
+    config.DBFile = database
+    config.reportFolder = folder
+
+
+# Makes one report in a worker process.
+# Returns (kind, startDate, endDate, file names or None, error or None)
+def _work(job):
+    kind, startDate, endDate = job
+    try:
+        return kind, startDate, endDate, makeReport(kind, startDate, endDate), None
+    except Exception as error:
+        return kind, startDate, endDate, None, '{}: {}'.format(type(error).__name__, error)
+
+
+def _date(text):
+    try:
+        return datetime.strptime(text, config.dateFormat)
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid date {!r}, expected {}'.format(text, config.datePattern))
+
+
+# Command line entry point. Makes reports without a display, e.g. a month-end job:
+#   python -m src.report --type all --from 2021-01-01 --to 2021-12-31 --period monthly
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m src.report',
+                                     description='Save Kingfisher Trust reports as PDF files.')
+    parser.add_argument('--type', choices=sorted(REPORTS) + ['all'], default='all',
+                        help='report to make (default: %(default)s)')
+    parser.add_argument('--from', dest='start', type=_date, required=True, help='first date, ' + config.datePattern)
+    parser.add_argument('--to', dest='end', type=_date, required=True, help='last date, ' + config.datePattern)
+    parser.add_argument('--period', choices=('whole', 'daily', 'weekly', 'monthly', 'yearly'), default='whole',
+                        help='make one report for each period between the dates (default: %(default)s)')
+    parser.add_argument('--db', default=config.DBFile, help='database file (default: %(default)s)')
+    parser.add_argument('--out', default=config.reportFolder, help='folder to save to (default: %(default)s)')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='reports made at once (default: %(default)s)')
+    args = parser.parse_args(args)
+    if args.start > args.end:
+        parser.error('--from is after --to')
+
+    kinds = sorted(REPORTS) if args.type == 'all' else [args.type]
+    jobs = [(kind, start, end) for kind in kinds for start, end in periods(args.start, args.end, args.period)]
+
+    _startWorker(args.db, args.out)
+    if not os.path.isfile(config.DBFile):
+        print('Error: database {} does not exist'.format(config.DBFile), file=sys.stderr)
+        return 1
+    try:
+        # Checks the database can be read before starting any workers
+        expenditureTotal(args.start, args.end)
+    except sqlite3.OperationalError as error:
+        # e.g. the database has not been upgraded to hold daily totals yet
+        print('Error: {} (run python -m src.migrations first)'.format(error), file=sys.stderr)
+        return 1
+    finally:
+        closeDatabase()
+    os.makedirs(config.reportFolder, exist_ok=True)
+
+    processes = max(1, min(args.processes, len(jobs)))
+    if processes == 1:
+        results = map(_work, jobs)
+    else:
+        # Each process has its own connection to the database. Processes are started fresh
+        # ('spawn') rather than forked, so none inherit another thread's open connection.
+        pool = multiprocessing.get_context('spawn').Pool(processes, _startWorker, (args.db, args.out))
+        results = pool.imap_unordered(_work, jobs)
+
+    failed = 0
+    try:
+        for kind, startDate, endDate, fileNames, error in results:
+            if error:
+                failed += 1
+                print('Failed {} {} to {}: {}'.format(kind, startDate.strftime(config.dateFormat),
+                                                      endDate.strftime(config.dateFormat), error), file=sys.stderr)
+            else:
+                print('\n'.join(fileNames))
+    finally:
+        if processes > 1:
+            pool.close()
+            pool.join()
+        closeDatabase()
+    print('{} of {} reports saved'.format(len(jobs) - failed, len(jobs)))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+from .sql import executeSQL
+
+# Each searchable table has a full-text index called {table}_fts, created by
+# migration 3 and kept up to date by triggers on the table. Searches use the
+# index where they can, and otherwise fall back to scanning the table with LIKE.
+
+# The columns that can be searched in each table
+SEARCH_COLUMNS = {
+    'customerTbl': ('customerID', 'customerSurname', 'customerForename', 'customerContact'),
+    'donorTbl': ('donorID', 'donorSurname', 'donorForename', 'donorContact'),
+    'supplierTbl': ('supplierID', 'supplierName', 'supplierContact'),
+    'itemTbl': ('itemID', 'itemName', 'salePrice', 'quantity', 'supplierCost', 'supplierID'),
+    'staffTbl': ('staffID', 'staffSurname', 'staffForename', 'staffContact', 'accessLevel'),
+    'recipientTbl': ('recipientID', 'recipientSurname', 'recipientForename', 'recipientContact'),
+    'orderTbl': ('orderNo', 'customerID', 'orderTotal', 'date', 'staffID'),
+    'donationsTbl': ('donationID', 'amount', 'cashorbank', 'referenceNo', 'date', 'donorID', 'staffID'),
+    'foodDonatTbl': ('foodID', 'foodName', 'donatDate', 'expiryDate', 'givenAway', 'donorID', 'staffID'),
+    'expenditureTbl': ('expenditureID', 'amount', 'details', 'date', 'staffID'),
+}
+
+# The trigram tokeniser can only find text at least this long
+_TRIGRAM = 3
+
+
+# Returns the columns in a table's full-text index and whether it uses the
+# trigram tokeniser, which matches text anywhere within a word (like LIKE '%x%').
+# Without it, the index can only match the start of each word.
+# Returns None if the table has no full-text index.
+def _fullTextIndex(table):
+    index = executeSQL('SELECT sql FROM sqlite_master WHERE name = ?', (table + '_fts',), False)
+    if not index:
+        return None
+    columns = [column[1] for column in executeSQL('PRAGMA table_info({}_fts)'.format(table), (), True)]
+    return columns, 'trigram' in index[0]
+
+
+# Returns the records of a table containing the search text (ignoring case) in the
+# given column, or in any searchable column if no column is given.
+# Records found through the full-text index are ranked, best match first.
+def searchTable(table, text, column=None):
+    text = text.strip()
+    if not text:
+        # The windows load their tables a page at a time instead of searching for nothing
+        return executeSQL('SELECT * FROM {}'.format(table), (), True)
+
+    index = _fullTextIndex(table)
+    if index and (column is None or column in index[0]):
+        trigram = index[1]
+        # Quotes the text as a phrase, so that it is matched exactly as typed
+        phrase = '"{}"'.format(text.replace('"', '""'))
+        if not trigram:
+            # Prefix search: matches words starting with the text
+            phrase += '*'
+        if not trigram or len(text) >= _TRIGRAM:
+            if column:
+                phrase = '{} : {}'.format(column, phrase)
+            return executeSQL('''SELECT {0}.* FROM {0}_fts
+                                 JOIN {0} ON {0}.rowid = {0}_fts.rowid
+                                 WHERE {0}_fts MATCH ?
+                                 ORDER BY {0}_fts.rank'''.format(table), (phrase,), True)
+
+    # Text too short for the index, or the table has no index
+    columns = [column] if column else SEARCH_COLUMNS[table]
+    search = '%' + text.upper() + '%'
+    condition = ' OR '.join('upper({}) LIKE ?'.format(name) for name in columns)
+    return executeSQL('SELECT * FROM {} WHERE {}'.format(table, condition), (search,) * len(columns), True)
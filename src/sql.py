@@ -1,180 +1,632 @@
-import bcrypt
 import os
 import sqlite3
-from tkinter import messagebox
+import threading
+from contextlib import contextmanager
+from tkinter import messagebox, ttk
 
-from . import config
+from . import changes, config, executor, passwords, queries
 
+# Each thread keeps one long-lived connection to the database, stored here.
+# All connections that have been opened are also tracked so that they can be
+# closed together when the program shuts down.
+_local = threading.local()
+_connections = []
+_connectionsLock = threading.Lock()
+_generation = 0
 
-# Establishes a connection with the database, and executes the
-# SQL statement, with the given parameters passed.
-def executeSQL(sqlStatement, parameters, fetchall):
-    connection = sqlite3.connect(config.DBFile)
-    cursor = connection.cursor()
-    cursor.execute(sqlStatement, parameters)
 
-    if fetchall:
-        # returns array
-        result = cursor.fetchall()
-    else:
-        # returns tuple
-        result = cursor.fetchone()
+# Returns the connection for the calling thread, opening it on first use.
+# The connection is reopened if the database file has changed, or if
+# closeDatabase has been called since it was opened.
+def getConnection():
+    connection = getattr(_local, 'connection', None)
+    if connection is not None and (_local.path != config.DBFile or _local.generation != _generation):
+        _forget(connection)
+        connection = None
+
+    if connection is None:
+        connection = openConnection()
+        _local.connection = connection
+        _local.path = config.DBFile
+        _local.generation = _generation
+        _local.depth = 0
+
+    return connection
+
 
-    connection.commit()
+# Opens a new connection to the database with the settings in config.databasePragmas.
+# It is closed along with the others when the program shuts down.
+def openConnection():
+    # isolation_level=None stops sqlite3 from opening transactions by itself,
+    # so statements autocommit unless they are run inside transaction()
+    connection = sqlite3.connect(config.DBFile, cached_statements=config.cachedStatements,
+                                 check_same_thread=False, isolation_level=None)
+    for name, value in config.databasePragmas.items():
+        connection.execute('PRAGMA {} = {}'.format(name, value))
+    with _connectionsLock:
+        _connections.append(connection)
+    return connection
+
+
+# Closes a connection and stops tracking it
+def _forget(connection):
+    with _connectionsLock:
+        if connection in _connections:
+            _connections.remove(connection)
     connection.close()
 
+
+# Yields a cursor on the thread's connection. Outside of a transaction each
+# statement is committed as soon as it runs; inside one, it is committed or
+# rolled back along with the rest of the transaction.
+@contextmanager
+def cursor():
+    # Each statement run on the cursor is timed and recorded (see queries.py)
+    cur = getConnection().cursor(queries.timedCursor)
+    try:
+        yield cur
+    finally:
+        cur.close()
+
+
+# Starts a transaction on the thread's connection. If one is already open,
+# a savepoint is created instead, so transactions can be nested.
+# The outermost transaction takes the write lock straight away (IMMEDIATE),
+# so two tills saving at once wait for each other rather than failing part way.
+def begin():
+    connection = getConnection()
+    if _local.depth == 0:
+        connection.execute('BEGIN IMMEDIATE')
+    else:
+        connection.execute('SAVEPOINT sp{}'.format(_local.depth))
+    _local.depth += 1
+
+
+# Commits the innermost open transaction or savepoint. The depth only goes down once it has
+# been committed, so if COMMIT fails (e.g. the database is busy) it can still be rolled back.
+def commit():
+    connection = getConnection()
+    if _local.depth == 1:
+        connection.execute('COMMIT')
+    else:
+        connection.execute('RELEASE sp{}'.format(_local.depth - 1))
+    _local.depth -= 1
+
+
+# Undoes everything since the innermost open transaction or savepoint began. The depth goes
+# down even if that fails, e.g. when SQLite has already rolled the whole transaction back.
+def rollback():
+    connection = getConnection()
+    try:
+        if _local.depth == 1:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+        else:
+            connection.execute('ROLLBACK TO sp{}'.format(_local.depth - 1))
+            connection.execute('RELEASE sp{}'.format(_local.depth - 1))
+    finally:
+        _local.depth -= 1
+
+
+# Runs the statements inside the block as a single transaction, committed
+# once at the end, or rolled back entirely if an error is raised inside it
+# (or the commit itself fails).
+# e.g.  with transaction():
+#           executeSQL(...)
+#           executeSQL(...)
+@contextmanager
+def transaction():
+    begin()
+    try:
+        yield
+    except BaseException:
+        rollback()
+        raise
+    try:
+        commit()
+    except BaseException:
+        rollback()
+        raise
+
+
+# Copies the changes in the write-ahead log back into the database file, so that the log
+# does not keep growing. PASSIVE never waits for tills that are reading or writing, and
+# anything it cannot copy yet is left for the next checkpoint. Returns the number of pages
+# in the log and the number copied, both -1 if the database is not in WAL mode.
+def checkpoint():
+    busy, logged, copied = executeSQL('PRAGMA wal_checkpoint(PASSIVE)', (), False)
+    return logged, copied
+
+
+# Closes every open connection. Called once when the program exits;
+# any thread that uses the database afterwards will open a new connection.
+def closeDatabase():
+    global _generation
+    with _connectionsLock:
+        _generation += 1
+        connections = list(_connections)
+        _connections.clear()
+    for connection in connections:
+        connection.close()
+    _local.__dict__.clear()
+
+
+# Executes the SQL statement, with the given parameters passed,
+# on the thread's open connection to the database.
+def executeSQL(sqlStatement, parameters, fetchall):
+    with cursor() as cur:
+        cur.execute(sqlStatement, parameters)
+
+        if fetchall:
+            # returns array
+            result = cur.fetchall()
+        else:
+            # returns tuple
+            result = cur.fetchone()
+
     # Returns an array or tuple with any fetched records
     return result
 
 
-# This function fetches all the records from a specified table
-# From the database, and inserts them into a specified treeview
-def loadDatabase(tree, table, refresh):
-    tree.delete(*tree.get_children())
-    records = executeSQL('SELECT * FROM {}'.format(table), (), True)
-    for i in records:
-        tree.insert('', 0, values=i)
+# Returns every foreign key in the database, as a dictionary that maps each table
+# to a list of the (table, column) pairs that refer to it.
+# This is read from the schema the first time it is needed, then cached until
+# the schema changes.
+def foreignKeys():
+    key = (config.DBFile, executeSQL('PRAGMA schema_version', (), False)[0])
+    if key not in _foreignKeys:
+        references = {}
+        # The full-text indexes (and the tables SQLite keeps them in) have no foreign keys
+        tables = executeSQL(r"SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE ? ESCAPE '\'",
+                            (r'%\_fts%',), True)
+        for (table,) in tables:
+            for fk in executeSQL('PRAGMA foreign_key_list({})'.format(table), (), True):
+                # Each foreign key is (id, seq, parent table, column, parent column, ...)
+                references.setdefault(fk[2], []).append((table, fk[3]))
+        _foreignKeys.clear()
+        _foreignKeys[key] = references
+
+    return _foreignKeys[key]
+
+
+_foreignKeys = {}
+
+
+# Checks whether any record in another table refers to the given key of a table.
+# Each referencing table is checked in turn with an EXISTS query on its
+# (indexed) foreign key column, stopping as soon as one reference is found.
+def isReferenced(table, key):
+    for referencingTable, column in foreignKeys().get(table, []):
+        exists = executeSQL('SELECT EXISTS(SELECT 1 FROM {} WHERE {} = ? LIMIT 1)'.format(referencingTable, column),
+                            (key,), False)[0]
+        if exists:
+            return True
+
+    return False
 
-    # Shows messagebox to confirm only when the refresh button was pressed
-    if refresh:
-        messagebox.showinfo('Loaded', 'Data Refreshed!')
+
+# Shows the records of a table in a treeview a page at a time, newest first, or sorted by a
+# column once its heading is clicked. Pages are fetched by position in that order
+# (WHERE (column, rowid) < (?, ?) LIMIT n) as the user scrolls to the bottom of the
+# treeview, and once it holds more than config.treeRows records the ones furthest
+# from view are removed, to be fetched again if scrolled back to.
+# Each record's primary key is used as its iid in the treeview.
+# Pages are fetched in the background, so the window stays responsive meanwhile.
+# Records changed by other tills are shown as they change (see changes.py).
+class pagedTree:
+    def __init__(self, tree, table, values=None):
+        self.tree = tree
+        self.table = table
+        # Returns the values shown for a record (its columns, by default), e.g. the stock of
+        # an item left once the order being made is saved
+        self.values = values or (lambda record: record)
+        self.rowids = {}
+        self.task = None
+        self.columns = None
+        self.total = 0
+        # The records are shown in order of this column (or expression), then rowid
+        self.column = 'rowid'
+        self.descending = True
+        self.moreAbove = self.moreBelow = False
+        # Passes scroll positions on to the scrollbar as before, checking them on the way
+        self.scrollbar = tree.cget('yscrollcommand')
+        tree.configure(yscrollcommand=self.scrolled)
+        changes.watch(self)
+
+    # Clears the treeview and shows the first page of records, along with the total
+    # number of records, then calls done (if given)
+    def reload(self, refresh, done=None):
+        if self.task:
+            self.task.cancel()
+        self.task = executor.submit(self.tree, lambda task: (self.fetch(), self.count()),
+                                    done=lambda result: self.reloaded(*result, refresh, done))
+
+    def reloaded(self, records, total, refresh, done):
+        self.task = None
+        self.tree.delete(*self.tree.get_children())
+        self.rowids.clear()
+        self.moreAbove = False
+        self.moreBelow = self.insert(records, 'end')
+        self.total = total
+        showTotal(self.tree, total)
+        # Shows messagebox to confirm only when the refresh button was pressed
+        if refresh:
+            messagebox.showinfo('Loaded', 'Data Refreshed!')
+        if done:
+            done()
+
+    # Returns up to a page of records in the order shown, plus one more if there are any, to show
+    # that there are more to fetch: from the top, or from below (or above, nearest first) the
+    # record with the given rowid. Records are found by their position in the order, i.e.
+    # WHERE (column, rowid) < (?, ?), so an index on the column is used to find and sort them.
+    def fetch(self, rowid=None, below=True):
+        direction, comparison = ('DESC', '<') if self.descending == below else ('ASC', '>')
+        if self.column == 'rowid':
+            position, start, parameters = 'rowid', '?', (rowid,)
+            order = 'rowid ' + direction
+        else:
+            position = '({}, rowid)'.format(self.column)
+            start = '((SELECT {} FROM {} WHERE rowid = ?), ?)'.format(self.column, self.table)
+            parameters = (rowid, rowid)
+            order = '{0} {1}, rowid {1}'.format(self.column, direction)
+        if rowid is None:
+            condition, parameters = '1', ()
+        else:
+            condition = '{} {} {}'.format(position, comparison, start)
+        return executeSQL('SELECT rowid, * FROM {} WHERE {} ORDER BY {} LIMIT ?'.format(
+            self.table, condition, order), parameters + (config.pageSize + 1,), True)
+
+    # Shows the records sorted by one of the treeview's columns, starting again from the top.
+    # The whole table is sorted by SQLite, not only the records fetched so far.
+    def sort(self, heading, descending):
+        name, notnull, key = self.tableColumns()[self.tree['columns'].index(heading)]
+        # Rows whose value is NULL would never compare as before or after another
+        self.column = name if notnull else "IFNULL({}, '')".format(name)
+        self.descending = descending
+        self.reload(False)
+
+    # Returns the number of records in the table, which SQLite counts from the
+    # table's smallest index without reading the records themselves
+    def count(self):
+        return executeSQL('SELECT count(*) FROM {}'.format(self.table), (), False)[0]
+
+    # Inserts a page of fetched records into the treeview at the given index.
+    # Returns whether there were more records to fetch.
+    def insert(self, records, index):
+        for record in records[:config.pageSize]:
+            self.rowids[str(record[1])] = record[0]
+            self.tree.insert('', index, iid=record[1], values=self.values(record[1:]))
+        return len(records) > config.pageSize
+
+    # Checks whether the treeview still shows this table's records, rather than
+    # e.g. search results, which are not paged
+    def showing(self):
+        children = self.tree.get_children()
+        return bool(children) and (children[-1] in self.rowids or children[0] in self.rowids)
+
+    def scrolled(self, first, last):
+        if self.scrollbar:
+            self.tree.tk.call(*self.tree.tk.splitlist(self.scrollbar), first, last)
+        if self.task or not self.showing():
+            return
+        children = self.tree.get_children()
+        if float(last) >= 1 and self.moreBelow:
+            self.task = executor.submit(self.tree, lambda task, rowid: self.fetch(rowid, True),
+                                        self.rowids[children[-1]], done=self.nextPage)
+        elif float(first) <= 0 and self.moreAbove:
+            self.task = executor.submit(self.tree, lambda task, rowid: self.fetch(rowid, False),
+                                        self.rowids[children[0]], done=self.previousPage)
+
+    # Shows the page of records below the last one shown,
+    # removing records from the top if there are too many
+    def nextPage(self, records):
+        self.task = None
+        if not self.showing():
+            return
+        self.moreBelow = self.insert(records, 'end')
+        children = self.tree.get_children()
+        extra = len(children) - config.treeRows
+        if extra > 0:
+            self.remove(children[:extra])
+            self.moreAbove = True
+            # Keeps the same records in view now those above them have gone
+            self.tree.yview_scroll(-extra, 'units')
+
+    # Shows the page of records above the first one shown,
+    # removing records from the bottom if there are too many
+    def previousPage(self, records):
+        self.task = None
+        if not self.showing():
+            return
+        before = len(self.tree.get_children())
+        self.moreAbove = self.insert(records, 0)
+        children = self.tree.get_children()
+        self.tree.yview_scroll(len(children) - before, 'units')
+        extra = len(children) - config.treeRows
+        if extra > 0:
+            self.remove(children[-extra:])
+            self.moreBelow = True
+
+    def remove(self, items):
+        self.tree.delete(*items)
+        for item in items:
+            self.rowids.pop(item, None)
+
+    # Fetches the records with the given rowids, which have been inserted, updated or deleted,
+    # along with the new total, then shows the changes
+    def changed(self, rowids):
+        def fetchChanged(task):
+            records = executeSQL('SELECT rowid, * FROM {} WHERE rowid IN ({}) ORDER BY rowid'.format(
+                self.table, ', '.join('?' * len(rowids))), tuple(rowids), True)
+            return records, self.count()
+
+        executor.submit(self.tree, fetchChanged, done=lambda result: self.applyChanges(rowids, *result))
+
+    # Updates the records shown that have changed, removes those that have been deleted, and
+    # shows new records at the top if the newest records are in view. Records that belong
+    # further down are left to be fetched when scrolled to.
+    def applyChanges(self, rowids, records, total):
+        if self.tree.get_children() and not self.showing():
+            return
+        shown = {rowid: item for item, rowid in self.rowids.items()}
+        for record in records:
+            rowids.discard(record[0])
+            self.show(record, shown.get(record[0]))
+        # Any left were not found, so have been deleted
+        self.remove([shown[rowid] for rowid in rowids if rowid in shown])
+        self.trim()
+        self.total = total
+        showTotal(self.tree, total)
+
+    # Shows a record that has been inserted or updated, in place of the item that showed it
+    # before (if any), or at the top if it is newer than every record shown and the newest
+    # records are in view. Returns whether it was added to the treeview. While the records
+    # are sorted by a column, new ones are left to be fetched in their place.
+    def show(self, record, previous=None):
+        rowid, item = record[0], str(record[1])
+        if previous is not None and previous != item:
+            # The record's primary key has changed, so it is shown again in the same place
+            index = self.tree.index(previous)
+            self.remove([previous])
+            self.insert([record], index)
+        elif self.tree.exists(item):
+            self.tree.item(item, values=self.values(record[1:]))
+            self.rowids[item] = rowid
+        elif self.column == 'rowid' and rowid > max(self.rowids.values(), default=0) and not self.moreAbove:
+            self.insert([record], 0)
+            return True
+        return False
+
+    # Removes records from the bottom of the treeview once it holds too many
+    def trim(self):
+        children = self.tree.get_children()
+        extra = len(children) - config.treeRows
+        if extra > 0:
+            self.remove(children[-extra:])
+            self.moreBelow = True
+
+    # Returns the (name, whether it is NOT NULL, whether it is the primary key) of each of
+    # the table's columns, in the order they are shown in the treeview
+    def tableColumns(self):
+        if self.columns is None:
+            # Each column is (cid, name, type, notnull, default, pk)
+            self.columns = [(column[1], column[3], column[5] == 1)
+                            for column in executeSQL('PRAGMA table_info({})'.format(self.table), (), True)]
+        return self.columns
+
+    # Returns the name of the table's primary key column, which the treeview's iids are
+    def keyColumn(self):
+        return next(name for name, notnull, key in self.tableColumns() if key)
+
+    # Shows the record with the given primary key, which has just been inserted or updated.
+    # A new record is added to the total straight away; the total is counted again when the
+    # change is next polled for (see changes.py).
+    def upsert(self, key):
+        record = executeSQL('SELECT rowid, * FROM {} WHERE {} = ?'.format(self.table, self.keyColumn()),
+                            (key,), False)
+        if record is None:
+            self.removeKey(key)
+            return
+        previous = next((item for item, rowid in self.rowids.items() if rowid == record[0]), None)
+        if self.show(record, previous):
+            self.total += 1
+            showTotal(self.tree, self.total)
+            self.trim()
+        elif previous is None and not self.tree.exists(str(record[1])) and self.column != 'rowid':
+            # A new record, while the records are sorted by a column: shows it by fetching
+            # the first page again, sorted as before
+            self.reload(False)
+        if self.tree.exists(str(record[1])):
+            self.tree.see(str(record[1]))
+
+    # Removes the record with the given primary key, which has just been deleted
+    def removeKey(self, key):
+        if str(key) in self.rowids:
+            self.remove([str(key)])
+            self.total -= 1
+            showTotal(self.tree, self.total)
+
+
+# Shows the total number of records in a treeview on its tab if it is in a
+# notebook, or otherwise in the window's title
+def showTotal(tree, total):
+    widget = tree
+    while widget.master is not None and not isinstance(widget.master, ttk.Notebook):
+        widget = widget.master
+    if widget.master is not None:
+        tabs = widget.master
+        if not hasattr(widget, 'baseTitle'):
+            widget.baseTitle = tabs.tab(widget, 'text')
+        tabs.tab(widget, text='{} ({:,})'.format(widget.baseTitle, total))
+    else:
+        window = tree.winfo_toplevel()
+        if not hasattr(window, 'baseTitle'):
+            window.baseTitle = window.title()
+        window.title('{} ({:,} records)'.format(window.baseTitle, total))
+
+
+# Shows the records of a table in a treeview, loading them in the background.
+# done (if given) is called once the first page of records is shown. values (if given)
+# returns the values to show for each record, in place of its columns.
+def loadDatabase(tree, table, refresh, done=None, values=None):
+    pages = getattr(tree, 'pages', None)
+    if pages is None or pages.table != table:
+        pages = tree.pages = pagedTree(tree, table, values)
+    pages.reload(refresh, done)
+
+
+# Shows a record that has just been inserted or updated in a treeview showing its table,
+# by primary key, rather than reloading every record. If the treeview is showing search
+# results instead, the table's records are reloaded, as they were before.
+def upsertRow(tree, table, key):
+    pages = getattr(tree, 'pages', None)
+    if pages is None or pages.table != table or (tree.get_children() and not pages.showing()):
+        loadDatabase(tree, table, False)
+    else:
+        pages.upsert(key)
+
+
+# Removes a record that has just been deleted from a treeview, by primary key,
+# whether the treeview shows its table's records or search results
+def removeRow(tree, key):
+    pages = getattr(tree, 'pages', None)
+    if pages is not None and str(key) in pages.rowids and tree.exists(str(key)):
+        pages.removeKey(key)
+    else:
+        # Search results are inserted without their primary key as their iid
+        tree.delete(*[item for item in tree.get_children() if tree.set(item, '#1') == str(key)])
 
 
 # Creates the database tables, unless they already exist
 # And adds an admin user.
 def createDatabase():
     if not os.path.isfile(config.DBFile):
-        connection = sqlite3.connect(config.DBFile)
-        cursor = connection.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS staffTbl(
-                staffID         TEXT NOT NULL,
-                staffSurname    TEXT NOT NULL,
-                staffForename   TEXT NOT NULL,
-                staffContact    TEXT NOT NULL,
-                accessLevel     INTEGER NOT NULL,
-                password        TEXT NOT NULL,
-                salt            TEXT NOT NULL,
-                PRIMARY KEY(staffID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS donationsTbl(
-                donationID  TEXT NOT NULL,
-                amount      REAL NOT NULL,
-                cashorbank  TEXT NOT NULL,
-                referenceNo TEXT,
-                date        TEXT NOT NULL,
-                donorID     TEXT NOT NULL,
-                staffID     TEXT NOT NULL,
-                PRIMARY KEY(donationID),
-                FOREIGN KEY(donorID) REFERENCES donorTbl(donorID),
-                FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS donorTbl(
-                donorID         TEXT NOT NULL,
-                donorSurname    REAL NOT NULL,
-                donorForename   TEXT NOT NULL,
-                donorContact    TEXT NOT NULL,
-                PRIMARY KEY(donorID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customerTbl(
-                customerID          TEXT NOT NULL,
-                customerSurname     TEXT NOT NULL,
-                customerForename    TEXT NOT NULL,
-                customerContact     TEXT NOT NULL,
-                PRIMARY KEY(customerID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orderTbl(
-                orderNo     TEXT NOT NULL,
-                customerID  TEXT NOT NULL,
-                orderTotal  REAL NOT NULL,
-                date        TEXT NOT NULL,
-                staffID     TEXT NOT NULL,
-                PRIMARY KEY(orderNO)
-                FOREIGN KEY(customerID) REFERENCES customerTbl(customerID),
-                FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orderItemTbl(
-                orderNo     TEXT NOT NULL,
-                itemID      TEXT NOT NULL,
-                quantity    INTEGER NOT NULL,
-                PRIMARY KEY (orderNo, itemID),
-                FOREIGN KEY(orderNo) REFERENCES orderTbl(orderNo),
-                FOREIGN KEY(itemID) REFERENCES itemTbl(itemID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS itemTbl(
-                itemID          TEXT NOT NULL,
-                itemName        TEXT NOT NULL,
-                salePrice       REAL NOT NULL,
-                quantity        INTEGER NOT NULL,
-                supplierCost    REAL NOT NULL,
-                supplierID      TEXT NOT NULL,
-                PRIMARY KEY(itemID),
-                FOREIGN KEY(supplierID) REFERENCES supplierTbl(supplierID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS supplierTbl(
-                supplierID      TEXT NOT NULL,
-                supplierName    TEXT NOT NULL,
-                supplierContact TEXT NOT NULL,
-                PRIMARY KEY(supplierID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS foodDonatTbl(
-                foodID          TEXT NOT NULL,
-                foodName        TEXT NOT NULL,
-                donatDate       TEXT NOT NULL,
-                expiryDate      TEXT NOT NULL,
-                givenAway       INTEGER NOT NULL,
-                donorID         TEXT NOT NULL,
-                staffID         TEXT NOT NULL,
-                PRIMARY KEY(foodID),
-                FOREIGN KEY(donorID) REFERENCES donorTbl(donorID),
-                FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS giveFoodTbl(
-                foodID          TEXT NOT NULL,
-                recipientID     TEXT NOT NULL,
-                staffID         TEXT NOT NULL,
-                PRIMARY KEY(foodID,recipientID),
-                FOREIGN KEY(foodID) REFERENCES foodDonatTbl(foodID),
-                FOREIGN KEY(recipientID) REFERENCES recipientTbl(recipientID),
-                FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS recipientTbl(
-                recipientID         TEXT NOT NULL,
-                recipientSurname    TEXT NOT NULL,
-                recipientForename   TEXT NOT NULL,
-                recipientContact    TEXT,
-                PRIMARY KEY(recipientID))
-            ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS expenditureTbl(
-                expenditureID   TEXT NOT NULL,
-                amount          REAL NOT NULL,
-                details         TEXT NOT NULL,
-                date            TEXT NOT NULL,
-                staffID         TEXT NOT NULL,
-                PRIMARY KEY(expenditureID),
-                FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
-            ''')
-
-        connection.commit()
-        connection.close()
+        with transaction(), cursor() as cur:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS staffTbl(
+                    staffID         TEXT NOT NULL,
+                    staffSurname    TEXT NOT NULL,
+                    staffForename   TEXT NOT NULL,
+                    staffContact    TEXT NOT NULL,
+                    accessLevel     INTEGER NOT NULL,
+                    password        TEXT NOT NULL,
+                    salt            TEXT NOT NULL,
+                    PRIMARY KEY(staffID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS donationsTbl(
+                    donationID  TEXT NOT NULL,
+                    amount      REAL NOT NULL,
+                    cashorbank  TEXT NOT NULL,
+                    referenceNo TEXT,
+                    date        TEXT NOT NULL,
+                    donorID     TEXT NOT NULL,
+                    staffID     TEXT NOT NULL,
+                    PRIMARY KEY(donationID),
+                    FOREIGN KEY(donorID) REFERENCES donorTbl(donorID),
+                    FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS donorTbl(
+                    donorID         TEXT NOT NULL,
+                    donorSurname    REAL NOT NULL,
+                    donorForename   TEXT NOT NULL,
+                    donorContact    TEXT NOT NULL,
+                    PRIMARY KEY(donorID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS customerTbl(
+                    customerID          TEXT NOT NULL,
+                    customerSurname     TEXT NOT NULL,
+                    customerForename    TEXT NOT NULL,
+                    customerContact     TEXT NOT NULL,
+                    PRIMARY KEY(customerID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS orderTbl(
+                    orderNo     TEXT NOT NULL,
+                    customerID  TEXT NOT NULL,
+                    orderTotal  REAL NOT NULL,
+                    date        TEXT NOT NULL,
+                    staffID     TEXT NOT NULL,
+                    PRIMARY KEY(orderNO)
+                    FOREIGN KEY(customerID) REFERENCES customerTbl(customerID),
+                    FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS orderItemTbl(
+                    orderNo     TEXT NOT NULL,
+                    itemID      TEXT NOT NULL,
+                    quantity    INTEGER NOT NULL,
+                    PRIMARY KEY (orderNo, itemID),
+                    FOREIGN KEY(orderNo) REFERENCES orderTbl(orderNo),
+                    FOREIGN KEY(itemID) REFERENCES itemTbl(itemID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS itemTbl(
+                    itemID          TEXT NOT NULL,
+                    itemName        TEXT NOT NULL,
+                    salePrice       REAL NOT NULL,
+                    quantity        INTEGER NOT NULL,
+                    supplierCost    REAL NOT NULL,
+                    supplierID      TEXT NOT NULL,
+                    PRIMARY KEY(itemID),
+                    FOREIGN KEY(supplierID) REFERENCES supplierTbl(supplierID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS supplierTbl(
+                    supplierID      TEXT NOT NULL,
+                    supplierName    TEXT NOT NULL,
+                    supplierContact TEXT NOT NULL,
+                    PRIMARY KEY(supplierID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS foodDonatTbl(
+                    foodID          TEXT NOT NULL,
+                    foodName        TEXT NOT NULL,
+                    donatDate       TEXT NOT NULL,
+                    expiryDate      TEXT NOT NULL,
+                    givenAway       INTEGER NOT NULL,
+                    donorID         TEXT NOT NULL,
+                    staffID         TEXT NOT NULL,
+                    PRIMARY KEY(foodID),
+                    FOREIGN KEY(donorID) REFERENCES donorTbl(donorID),
+                    FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS giveFoodTbl(
+                    foodID          TEXT NOT NULL,
+                    recipientID     TEXT NOT NULL,
+                    staffID         TEXT NOT NULL,
+                    PRIMARY KEY(foodID,recipientID),
+                    FOREIGN KEY(foodID) REFERENCES foodDonatTbl(foodID),
+                    FOREIGN KEY(recipientID) REFERENCES recipientTbl(recipientID),
+                    FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS recipientTbl(
+                    recipientID         TEXT NOT NULL,
+                    recipientSurname    TEXT NOT NULL,
+                    recipientForename   TEXT NOT NULL,
+                    recipientContact    TEXT,
+                    PRIMARY KEY(recipientID))
+                ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS expenditureTbl(
+                    expenditureID   TEXT NOT NULL,
+                    amount          REAL NOT NULL,
+                    details         TEXT NOT NULL,
+                    date            TEXT NOT NULL,
+                    staffID         TEXT NOT NULL,
+                    PRIMARY KEY(expenditureID),
+                    FOREIGN KEY(staffID) REFERENCES staffTbl(staffID))
+                ''')
 
-        # Checks whether there is an 'admin' user in the database
-        exists = executeSQL(
-            'SELECT staffID FROM staffTBL WHERE staffID = ?', ('admin',), False)
-        if not exists:
-            # Creates hashed/salted password
-            salt = bcrypt.gensalt()
-            hashedPass = bcrypt.hashpw('admin'.encode('utf-8'), salt)
-            executeSQL('INSERT INTO staffTbl VALUES (?,?,?,?,?,?,?)', ('admin', '', 'Admin', '', 3, hashedPass, salt),
-                       False)
+            # Checks whether there is an 'admin' user in the database
+            exists = executeSQL(
+                'SELECT staffID FROM staffTBL WHERE staffID = ?', ('admin',), False)
+            if not exists:
+                # Creates hashed/salted password
+                hashedPass, salt = passwords.hashPassword('admin')
+                executeSQL('INSERT INTO staffTbl VALUES (?,?,?,?,?,?,?)',
+                           ('admin', '', 'Admin', '', 3, hashedPass, salt), False)
@@ -0,0 +1,96 @@
+import sys
+import time
+
+# Measures how long the program takes to start: how long each module takes to import, in
+# the same form as python -X importtime, and how long each step of starting up takes.
+# It is turned on with  python main.py --timing  and the breakdown is printed to stderr
+# once the login window has been shown.
+#
+# e.g.  timing.start()  ...  timing.step('database migrated')  ...  timing.finish()
+
+_started = None
+# (name, seconds since starting) for each step of starting up
+_steps = []
+# (depth, module, self seconds, cumulative seconds) for each module, in the order they finish
+_imports = []
+# For each import in progress, the time spent importing the modules it imports
+_nested = []
+
+
+# Runs a module's code, timing it along with any modules it imports
+class _timedLoader:
+    def __init__(self, loader):
+        self.loader = loader
+
+    # Anything else (e.g. get_resource_reader) is handled by the module's own loader
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        depth = len(_nested)
+        _nested.append(0)
+        began = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            cumulative = time.perf_counter() - began
+            nested = _nested.pop()
+            if _nested:
+                _nested[-1] += cumulative
+            _imports.append((depth, module.__name__, cumulative - nested, cumulative))
+
+
+# Finds modules with the other finders, then times them as they load
+class _importTimer:
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _timedLoader(spec.loader)
+                return spec
+        return None
+
+
+# Starts timing. Only modules imported after this are timed, so it should be called first.
+def start():
+    global _started
+    _started = time.perf_counter()
+    sys.meta_path.insert(0, _importTimer())
+
+
+def running():
+    return _started is not None
+
+
+# Records that a step of starting up has finished
+def step(name):
+    if running():
+        _steps.append((name, time.perf_counter() - _started))
+
+
+# Stops timing, and prints how long each import and each step took
+def finish(file=None):
+    global _started
+    if not running():
+        return
+    sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, _importTimer)]
+    file = file or sys.stderr
+    print('import time: self [us] | cumulative | imported package', file=file)
+    for depth, name, own, cumulative in _imports:
+        print('import time: {:>9.0f} | {:>10.0f} | {}{}'.format(own * 1e6, cumulative * 1e6, '  ' * depth, name),
+              file=file)
+    print('\nSlowest imports:', file=file)
+    for depth, name, own, cumulative in sorted(_imports, key=lambda i: i[3], reverse=True)[:10]:
+        print('  {:>8.1f} ms  {}'.format(cumulative * 1e3, name), file=file)
+    print('\nStarting up:', file=file)
+    last = 0
+    for name, seconds in _steps:
+        print('  {:>8.1f} ms  {:<30} (at {:.1f} ms)'.format((seconds - last) * 1e3, name, seconds * 1e3), file=file)
+        last = seconds
+    _started = None
@@ -0,0 +1,89 @@
+import argparse
+import sqlite3
+import sys
+
+from . import config
+from .sql import executeSQL, cursor, transaction, closeDatabase
+
+# Each day's revenue, donation and expenditure totals are kept in revenueDailyTbl,
+# donationDailyTbl and expenditureDailyTbl (added in schema version 4), and kept
+# up to date by triggers whenever the records they are added up from change.
+# A report's totals are then summed from one row per day in its date range.
+#
+# If the totals are ever wrong (e.g. the database was edited by hand with the
+# triggers dropped), they can be added up again from the records:
+#   python -m src.totals --rebuild
+
+
+# Returns the dates as the parameters of a BETWEEN query
+def _dates(startDate, endDate):
+    return startDate.strftime(config.dateFormat), endDate.strftime(config.dateFormat)
+
+
+# Returns the total supplier cost, revenue and profit of every item sold
+# between the two dates (inclusive)
+def revenueTotals(startDate, endDate):
+    return executeSQL('''SELECT COALESCE(SUM(cost), 0), COALESCE(SUM(revenue), 0), COALESCE(SUM(profit), 0)
+                         FROM revenueDailyTbl WHERE date BETWEEN ? AND ?''', _dates(startDate, endDate), False)
+
+
+# Returns the total donated in cash, by bank, and altogether between the two dates (inclusive)
+def donationTotals(startDate, endDate):
+    return executeSQL('''SELECT COALESCE(SUM(cash), 0), COALESCE(SUM(bank), 0), COALESCE(SUM(total), 0)
+                         FROM donationDailyTbl WHERE date BETWEEN ? AND ?''', _dates(startDate, endDate), False)
+
+
+# Returns the total spent between the two dates (inclusive)
+def expenditureTotal(startDate, endDate):
+    return executeSQL('SELECT COALESCE(SUM(amount), 0) FROM expenditureDailyTbl WHERE date BETWEEN ? AND ?',
+                      _dates(startDate, endDate), False)[0]
+
+
+# Adds up every day's totals again from the records, replacing the stored totals
+def rebuildTotals():
+    with transaction(), cursor() as cur:
+        cur.execute('DELETE FROM revenueDailyTbl')
+        cur.execute('''INSERT INTO revenueDailyTbl(date, cost, revenue, profit)
+                       SELECT orderTbl.date, SUM(itemTbl.supplierCost * orderItemTbl.quantity),
+                              SUM(itemTbl.salePrice * orderItemTbl.quantity),
+                              SUM((itemTbl.salePrice - itemTbl.supplierCost) * orderItemTbl.quantity)
+                       FROM orderTbl
+                       JOIN orderItemTbl ON orderItemTbl.orderNo = orderTbl.orderNo
+                       JOIN itemTbl ON itemTbl.itemID = orderItemTbl.itemID
+                       GROUP BY orderTbl.date''')
+        cur.execute('DELETE FROM donationDailyTbl')
+        cur.execute('''INSERT INTO donationDailyTbl(date, cash, bank, total)
+                       SELECT date, SUM((cashorbank = 'Cash') * amount), SUM((cashorbank = 'Bank') * amount),
+                              SUM(amount)
+                       FROM donationsTbl GROUP BY date''')
+        cur.execute('DELETE FROM expenditureDailyTbl')
+        cur.execute('''INSERT INTO expenditureDailyTbl(date, amount)
+                       SELECT date, SUM(amount) FROM expenditureTbl GROUP BY date''')
+
+
+# Command line entry point
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m src.totals',
+                                     description='Maintain the daily report totals of a Kingfisher Trust database.')
+    parser.add_argument('--db', default=config.DBFile, help='database file (default: %(default)s)')
+    parser.add_argument('--rebuild', action='store_true', help='add up the daily totals again from the records')
+    args = parser.parse_args(args)
+
+    config.DBFile = args.db
+    try:
+        if args.rebuild:
+            rebuildTotals()
+            print('Daily totals rebuilt')
+        else:
+            parser.print_help()
+        return 0
+    except sqlite3.OperationalError as error:
+        # e.g. the database has not been upgraded to hold daily totals yet
+        print('Error: {} (run python -m src.migrations first)'.format(error), file=sys.stderr)
+        return 1
+    finally:
+        closeDatabase()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
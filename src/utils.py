@@ -1,5 +1,5 @@
+import ast
 import tkinter as tk
-import datetime
 from . import config
 
 
@@ -74,38 +74,67 @@ def enableWindow(win, *args):
         i['state'] = 'normal'
 
 
-# Sorts the specified treeview by the selected column,
-# Ensuring each item is sorted as the correct data type.
-def treeview_sort_column(tv, col, reverse):
-    l = []
-    for k in tv.get_children(''):
+# Option menus list records as tuples, e.g. ('CU0000012', 'John', 'Smith'), shown as text.
+# Returns the ID at the start of the chosen record, whatever its length.
+def recordID(text):
+    return ast.literal_eval(text)[0]
 
-        try:
-            elem = (datetime.strptime(tv.set(k, col), '%d/%m/%Y').timestamp(), k)
-        except ValueError:
-            try:
-                elem = (float(tv.set(k, col)), k)
-            except:
-                elem = (tv.set(k, col), k)
 
-        l.append(elem)
+# Inserts rows into a treeview a batch at a time, letting the window
+# redraw and respond between batches rather than freezing until all are in
+def insertRows(tree, rows, batch=1000):
+    rows = iter(rows)
+
+    def insertBatch():
+        if not tree.winfo_exists():
+            return
+        for count, row in enumerate(rows):
+            tree.insert('', 'end', values=row)
+            if count == batch - 1:
+                tree.after(1, insertBatch)
+                break
 
-    # Tries to sort the list, reversed if the second time
-    try:
-        l.sort(reverse=reverse)
-    # Converts to strings and sorts alphanumerically if error is raised
-    except:
-        j = []
-        for i in l:
-            elem = (str(i[0]), i[1])
-            j.append(elem)
+    insertBatch()
 
-        l = j
-        l.sort(reverse=reverse)
 
-    # Rearrange items in sorted positions
-    for index, (_, k) in enumerate(l):
-        tv.move(k, '', index)
+# Sorts the specified treeview by the selected column.
+# A treeview showing a table's records a page at a time (see sql.pagedTree) is sorted by
+# SQLite, so that every record is in order rather than only those fetched so far. Others
+# (e.g. search results) are sorted here, as the type given for the column in the
+# treeview's columnTypes (e.g. {'Amount': float}), or as text by default.
+def treeview_sort_column(tv, col, reverse):
+    pages = getattr(tv, 'pages', None)
+    if pages is not None and (pages.showing() or not tv.get_children()):
+        pages.sort(col, reverse)
+    else:
+        items = list(tv.get_children(''))
+        items.sort(key=sortKeys(tv, col, items).get, reverse=reverse)
+        # Rearranges the items in their sorted positions
+        tv.set_children('', *items)
 
     # Sets the command for the column to reverse the sort when clicked
     tv.heading(col, command=lambda: treeview_sort_column(tv, col, not reverse))
+
+
+# Returns the key each item of a treeview is sorted by for a column. The values are read
+# every time, as rows may have been edited in place, but each is converted to the column's
+# type once and the conversion kept (for the values still shown) for the next sort.
+# Values that cannot be converted (e.g. a blank amount) are sorted after the rest as text.
+def sortKeys(tv, col, items):
+    cache = getattr(tv, 'sortKeys', None)
+    if cache is None:
+        cache = tv.sortKeys = {}
+    converted = cache.get(col, {})
+    convert = getattr(tv, 'columnTypes', {}).get(col, str)
+    keys, kept = {}, {}
+    for item in items:
+        value = tv.set(item, col)
+        key = kept.get(value) or converted.get(value)
+        if key is None:
+            try:
+                key = (0, convert(value))
+            except ValueError:
+                key = (1, value)
+        keys[item] = kept[value] = key
+    cache[col] = kept
+    return keys
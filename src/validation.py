@@ -1,6 +1,8 @@
 import re
 from datetime import datetime
 
+from . import config
+
 
 # Performs validation on an input phone number, using
 # Regular Expression criteria to check that the input follows a specific
@@ -55,8 +57,8 @@ def validateInt(value):
 def validateDate(value, errorLabel):
     try:
         # Trues to convert value into a datetime object, following the
-        # format DD/MM/YYYY
-        datetime.strptime(value, '%d/%m/%Y')
+        # format YYYY-MM-DD
+        datetime.strptime(value, config.dateFormat)
         valid = True
     except ValueError:
         valid = False
@@ -65,7 +67,7 @@ def validateDate(value, errorLabel):
         # Outputs error message if not valid. Since the GUI now uses
         # A calendar datepicker, this should never occur, however the message
         # is kept just in case
-        errorLabel.set('Error: Invalid Input\nDD/MM/YYYY')
+        errorLabel.set('Error: Invalid Input\nYYYY-MM-DD')
 
     # Returns only the boolean value, which is true when the input date
     # is of the correct format
@@ -1,10 +1,12 @@
 import tkinter as tk
 from tkinter import ttk
-import random
 import sqlite3
 
 from .. import config
-from ..sql import loadDatabase, executeSQL
+from ..sql import loadDatabase, executeSQL, transaction, isReferenced, upsertRow, removeRow
+from ..export import exportMenu
+from ..ids import nextID
+from ..search import searchTable
 from ..utils import treeview_sort_column, center, accesslevel, enableWindow, disableWindow
 from ..validation import validateEmail, validatePhone
 
@@ -33,7 +35,7 @@ class customerWindow:
         # Creates a dropdown menu, with all the fields listed, set to customerID by default
         self.searchFieldVar = tk.StringVar()
         self.searchField = ttk.OptionMenu(self.frame, self.searchFieldVar, 'CustomerID', 'CustomerID', 'Surname',
-                                          'Forename', 'Contact')
+                                          'Forename', 'Contact', 'All Fields')
         # Creates a 'Search' button, which calls the search function when pressed
         self.searchButton = ttk.Button(
             self.frame, text='Search', command=lambda: self.search())
@@ -67,6 +69,9 @@ class customerWindow:
             self.frame, orient='horizontal', command=self.tree.xview)
         self.xscrollbar.grid(row=5, column=0, sticky='ew',
                              columnspan=4, pady=(0, 10))
+        # Creates an 'Export' button, to save the whole table to a file without loading it here
+        self.exportButton = exportMenu(self.frame, [('Customers', 'customerTbl')])
+        self.exportButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.tree.configure(
             xscrollcommand=self.xscrollbar.set, selectmode='browse')
         # Creates the add, edit and delete customer buttons, which calls their respective functions when clicked
@@ -99,9 +104,7 @@ class customerWindow:
         parent.deiconify()
 
     def search(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol, %, to the end of the search value
-        search = '%' + str(self.searchVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFieldVar.get()
         if searchFieldVar == 'CustomerID':
             searchField = 'customerID'
@@ -111,14 +114,20 @@ class customerWindow:
             searchField = 'customerForename'
         elif searchFieldVar == 'Contact':
             searchField = 'customerContact'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchVar.get().strip():
+            loadDatabase(self.tree, 'customerTbl', False)
+            return
         # Clears the treeview of all other records
         self.tree.delete(*self.tree.get_children())
-        # Selects records from customerTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM customerTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from customerTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('customerTbl', self.searchVar.get(), searchField)
         for i in records:
             # Inserts all the records found into the treeview
-            self.tree.insert('', 0, values=(i[0], i[1], i[2], i[3]))
+            self.tree.insert('', 'end', values=(i[0], i[1], i[2], i[3]))
 
     def addCustomer(self):
         disableWindow(self.returnButton, self.addCustomerButton,
@@ -183,20 +192,21 @@ class customerWindow:
         if forename and surname and contact:
             # Checks that contact is valid phoneNo OR email
             if validatePhone(contact) or validateEmail(contact):
-                # Generates a random customerID, using the random module
-                customerID = 'CU' + \
-                    str(''.join(['%s' % random.randint(0, 9)
-                        for num in range(0, 5)]))
                 # Asks for user confimation of the input details
-                if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nCustomerID:\t' + customerID +
+                if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                          'CustomerID:\tAssigned on save' +
                                           '\nName:\t\t' + forename + ' ' + surname +
                                           '\nContact:\t\t' + contact):
                     try:
-                        # Inserts record into customerTbl
-                        executeSQL('INSERT INTO customerTbl VALUES (?,?,?,?)', (customerID, surname, forename, contact),
-                                   False)
-                        # Reloads records into treeview
-                        loadDatabase(self.tree, 'customerTbl', False)
+                        # Allocates a new, unique customerID in the same transaction as the insert, so that
+                        # cancelling or a failed insert does not use one up
+                        with transaction():
+                            customerID = nextID('CU')
+                            # Inserts record into customerTbl
+                            executeSQL('INSERT INTO customerTbl VALUES (?,?,?,?)',
+                                       (customerID, surname, forename, contact), False)
+                        # Shows the new record in the treeview
+                        upsertRow(self.tree, 'customerTbl', customerID)
                         # Destroys add customer toplevel and returns to view customers window
                         enableWindow(self.customerWin, self.returnButton, self.addCustomerButton,
                                      self.editCustomerButton, self.delCustomerButton)
@@ -308,8 +318,8 @@ class customerWindow:
                     # Updates record where the customerID matches the record selected
                     executeSQL('''UPDATE customerTbl SET customerForename=?, customerSurname = ?, customerContact=?
                                    WHERE customerID=?''', (newForename, newSurname, newContact, customerID), False)
-                    # Reloads the records into the treeview, with the updated details
-                    loadDatabase(self.tree, 'customerTbl', False)
+                    # Shows the updated record in the treeview
+                    upsertRow(self.tree, 'customerTbl', customerID)
                     # Destroys edit customer window and returns to view customers window
                     enableWindow(self.customerWin, self.returnButton, self.addCustomerButton, self.editCustomerButton,
                                  self.delCustomerButton)
@@ -329,18 +339,22 @@ class customerWindow:
                 customerID = self.tree.set(selected_item, '#1')
             # Searches through the table where the
             # customerID might be stored as a foreign key
-            existsForeign = executeSQL(
-                'SELECT * FROM orderTbl WHERE customerID = ?', (customerID,), False)
+            # The Anonymous record is always kept, for records saved without a customer
+            existsForeign = customerID == 'Anonymous' or isReferenced('customerTbl', customerID)
             # If customerID is not stored in any other tables
             if not existsForeign:
                 # Confirms that the user wants to permanently delete the record
                 if tk.messagebox.askokcancel('Delete', 'Are you sure you want to permanently delete this record?'):
                     for selected_item in self.tree.selection():
-                        # Deletes the record from customerTbl
-                        executeSQL(
-                            'DELETE FROM customerTbl WHERE customerID=?', (customerID,), False)
-                        # Removes the record from the treeview
-                        self.tree.delete(selected_item)
+                        try:
+                            # Deletes the record from customerTbl
+                            executeSQL(
+                                'DELETE FROM customerTbl WHERE customerID=?', (customerID,), False)
+                            # Removes the record from the treeview
+                            removeRow(self.tree, customerID)
+                        except sqlite3.IntegrityError:  # Used on another till since it was checked
+                            tk.messagebox.showerror(
+                                'Error', 'Error: Record in use by other tables')
             else:
                 # If customerID is a foreign key in other tables, output error as the record cannot be deleted
                 tk.messagebox.showerror(
@@ -0,0 +1,93 @@
+import tkinter as tk
+from tkinter import ttk
+
+from .. import config, queries
+from ..utils import center
+
+
+class diagnosticsWindow:
+    # Creates the diagnostics window, listing the database statements that have taken the most time
+    # since the program started (or the list was cleared). Only admins (access level 3) can open it.
+    def __init__(self, root):
+        self.root = root
+        self.root.title('Diagnostics')
+        self.root.iconbitmap(config.icon)
+        self.frame = tk.Frame(self.root)
+        self.frame.pack(fill='both', expand=True)
+        self.root.protocol('WM_DELETE_WINDOW', lambda: self.closeWindow())
+        # Creates title label, refresh button to list the latest totals, and the return button
+        self.titleLabel = tk.Label(
+            self.frame, text='Slowest Database Statements', font='none 11')
+        self.refreshButton = ttk.Button(
+            self.frame, text='↺', command=lambda: self.refresh())
+        self.returnButton = ttk.Button(
+            self.frame, text='Main Menu', command=lambda: self.closeWindow())
+        self.titleLabel.grid(row=0, column=1, sticky='ns')
+        self.refreshButton.grid(row=0, column=4, pady=10)
+        self.returnButton.grid(row=0, column=0, pady=10,
+                               padx=10, ipadx=10, ipady=2, sticky='w')
+        # Creates the treeview, with a row for each statement
+        columns = ('Statement', 'Calls', 'Total ms', 'Average ms', 'Slowest ms', 'Rows', 'Last Called From')
+        self.tree = ttk.Treeview(self.frame, columns=columns, show='headings', selectmode='browse')
+        for col in columns:
+            self.tree.column(col, width=80, minwidth=80, anchor='e')
+            self.tree.heading(col, text=col)
+        self.tree.column('Statement', width=400, anchor='w')
+        self.tree.column('Last Called From', width=200, anchor='w')
+        self.tree.grid(row=1, column=0, sticky='nesw', rowspan=3,
+                       columnspan=3, padx=(10, 0), pady=(10, 0))
+        self.frame.columnconfigure(1, weight=1)  # column with treeview
+        self.frame.rowconfigure([1, 2, 3], weight=1)  # row with treeview
+        self.scrollbar = ttk.Scrollbar(
+            self.frame, orient='vertical', command=self.tree.yview)
+        self.scrollbar.grid(row=1, column=3, sticky='ns', rowspan=3, pady=10)
+        self.xscrollbar = ttk.Scrollbar(
+            self.frame, orient='horizontal', command=self.tree.xview)
+        self.xscrollbar.grid(row=4, column=0, sticky='ew',
+                             columnspan=4, pady=(0, 10))
+        self.tree.configure(yscrollcommand=self.scrollbar.set, xscrollcommand=self.xscrollbar.set)
+        # Creates a button to start the totals again, e.g. before timing a particular task
+        self.clearButton = ttk.Button(
+            self.frame, text='Clear', command=lambda: self.clear())
+        self.clearButton.grid(row=1, column=4, padx=10, ipadx=10, ipady=2, sticky='ew')
+        # Shows the whole of the selected statement, and the plan SQLite used to run it if it was slow
+        self.detailText = tk.Text(self.frame, height=8, wrap='word', font='none 9')
+        self.detailText.grid(row=5, column=0, columnspan=5, padx=10, pady=(0, 10), sticky='ew')
+        self.detailText.configure(state='disabled')
+        self.tree.bind('<<TreeviewSelect>>', lambda event: self.showDetails())
+
+        self.refresh()
+        center(self.root)
+
+    # Lists the config.diagnosticsRows statements that have taken the most time in total
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        self.statements = {}
+        for statement in queries.slowest(config.diagnosticsRows):
+            text, calls, total, slowest, rows, site, plan = statement
+            row = self.tree.insert('', 'end', values=(text, calls, '{:.1f}'.format(total * 1000),
+                                                      '{:.2f}'.format(total * 1000 / max(calls, 1)),
+                                                      '{:.1f}'.format(slowest * 1000), rows, site))
+            self.statements[row] = statement
+        self.showDetails()
+
+    def showDetails(self):
+        selection = self.tree.selection()
+        details = ''
+        if selection:
+            text, calls, total, slowest, rows, site, plan = self.statements[selection[0]]
+            details = text + '\n\nLast called from ' + site
+            if plan:
+                details += '\n\nQuery plan (when slower than {} ms):\n{}'.format(config.slowQuery, plan)
+        self.detailText.configure(state='normal')
+        self.detailText.delete('1.0', 'end')
+        self.detailText.insert('1.0', details)
+        self.detailText.configure(state='disabled')
+
+    def clear(self):
+        queries.clear()
+        self.refresh()
+
+    def closeWindow(self):
+        self.root.destroy()
+        config.app.enableMenu()
@@ -3,13 +3,17 @@ from tkinter import ttk
 from tkcalendar import DateEntry
 from datetime import datetime
 import sqlite3
-import random
 
 from .. import config
-from ..sql import loadDatabase, executeSQL
-from ..utils import enableWindow, disableWindow, accesslevel, treeview_sort_column, center
+from ..sql import loadDatabase, executeSQL, transaction, isReferenced, upsertRow, removeRow
+from ..export import exportMenu, exportReport
+from ..ids import nextID
+from ..search import searchTable
+from ..utils import enableWindow, disableWindow, accesslevel, treeview_sort_column, center, insertRows, recordID
 from ..validation import validateFloat, validateDate
-from ..report import donationReport
+from ..report import donationReport, donationRows, reportSaved, reportFailed
+from ..executor import submit
+from ..totals import donationTotals
 
 
 class donationWindow:
@@ -55,7 +59,7 @@ class donationWindow:
         # Creates a dropdown menu, with all the fields listed to search, set to donationID by default
         self.searchFieldVar = tk.StringVar()
         self.searchField = ttk.OptionMenu(self.moneyTab, self.searchFieldVar, 'DonationID', 'DonationID', 'Amount',
-                                          'Cash/Bank', 'Reference No', 'Date', 'DonorID', 'StaffID')
+                                          'Cash/Bank', 'Reference No', 'Date', 'DonorID', 'StaffID', 'All Fields')
         # Creates a 'search' button, which calls the search function when pressed
         self.searchButton = ttk.Button(
             self.moneyTab, text='Search', command=lambda: self.search())
@@ -79,6 +83,8 @@ class donationWindow:
             self.tree.column(col, width=100, minwidth=100)
             self.tree.heading(col, text=col, command=lambda _col=col: treeview_sort_column(
                 self.tree, _col, False))
+        # Amounts are sorted as numbers when search results are sorted
+        self.tree.columnTypes = {'Amount': float}
         self.tree.grid(row=2, column=0, sticky='ewns', rowspan=3,
                        columnspan=3, padx=(10, 0), pady=(10, 0))
 
@@ -94,6 +100,9 @@ class donationWindow:
             self.moneyTab, orient='horizontal', command=self.tree.xview)
         self.xscrollbar.grid(row=5, column=0, sticky='ew',
                              columnspan=4, pady=(0, 10))
+        # Creates an 'Export' button, to save the whole table to a file without loading it here
+        self.exportButton = exportMenu(self.moneyTab, [('Donations', 'donationsTbl')])
+        self.exportButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.tree.configure(
             xscrollcommand=self.xscrollbar.set, selectmode='browse')
         # Creates the add, edit and delete donation buttons, which call their respective functions when clicked
@@ -127,7 +136,8 @@ class donationWindow:
         # Creates a dropdown menu, with all the fields listed to search, set to FoodID by default
         self.searchFoodFieldVar = tk.StringVar()
         self.searchFoodField = ttk.OptionMenu(self.foodTab, self.searchFoodFieldVar, 'FoodID', 'FoodID', 'Name',
-                                              'DonationDate', 'ExpiryDate', 'GivenAway', 'DonorID', 'StaffID')
+                                              'DonationDate', 'ExpiryDate', 'GivenAway', 'DonorID', 'StaffID',
+                                              'All Fields')
         # Creates a 'search' button, which calls the search function when pressed
         self.searchFoodButton = ttk.Button(
             self.foodTab, text='Search', command=lambda: self.foodSearch())
@@ -147,6 +157,7 @@ class donationWindow:
             self.foodTree.column(col, width=100, minwidth=100)
             self.foodTree.heading(col, text=col,
                                   command=lambda _col=col: treeview_sort_column(self.foodTree, _col, False))
+        self.foodTree.columnTypes = {'GivenAway': int}
         self.foodTree.grid(row=2, column=0, sticky='ewns',
                            rowspan=3, columnspan=3, padx=(10, 0), pady=(10, 0))
 
@@ -163,6 +174,9 @@ class donationWindow:
             self.foodTab, orient='horizontal', command=self.foodTree.xview)
         self.xscrollbarFood.grid(
             row=5, column=0, sticky='ew', columnspan=4, pady=(0, 10))
+        self.exportFoodButton = exportMenu(self.foodTab, [('Food Donations', 'foodDonatTbl'),
+                                                          ('Food Given Away', 'giveFoodTbl')])
+        self.exportFoodButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.foodTree.configure(
             xscrollcommand=self.xscrollbarFood.set, selectmode='browse')
         # Creates the add, edit and delete donation buttons, which call their respective functions when clicked
@@ -194,7 +208,7 @@ class donationWindow:
         center(self.root)
 
     def checkTab(self):
-        if self.notebook.tab(self.notebook.select(), 'text') == 'Money':
+        if self.notebook.select() == str(self.moneyTab):
             currentTree = self.tree
             table = 'donationsTbl'
         else:
@@ -207,9 +221,7 @@ class donationWindow:
         config.app.enableMenu()
 
     def foodSearch(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol, %, to the end of the search value
-        search = '%' + str(self.searchFoodVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFoodFieldVar.get()
         if searchFieldVar == 'FoodID':
             searchField = 'foodID'
@@ -225,14 +237,20 @@ class donationWindow:
             searchField = 'donorID'
         elif searchFieldVar == 'StaffID':
             searchField = 'staffID'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchFoodVar.get().strip():
+            loadDatabase(self.foodTree, 'foodDonatTbl', False)
+            return
         # Clears the treeview of all other records
         self.foodTree.delete(*self.foodTree.get_children())
-        # Selects records from donationsTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM foodDonatTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from donationsTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('foodDonatTbl', self.searchFoodVar.get(), searchField)
         for i in records:
             # Inserts all the records found into the treeview
-            self.foodTree.insert('', 0, values=(
+            self.foodTree.insert('', 'end', values=(
                 i[0], i[1], i[2], i[3], i[4], i[5], i[6]))
 
     def giveFood(self):
@@ -249,8 +267,8 @@ class donationWindow:
                 disableWindow(self.returnButton, self.giveFoodButton, self.addFoodButton, self.editFoodButton,
                               self.delFoodButton)
                 # Selects all recipientIDs, forenames and surnames, and saves them to a list
-                recipients = executeSQL('SELECT recipientID,recipientForename,recipientSurname FROM recipientTbl', (),
-                                        True)
+                recipients = executeSQL('SELECT recipientID,recipientForename,recipientSurname FROM recipientTbl '
+                                        'WHERE recipientID != ?', ('Anonymous',), True)
                 recipientIDs = [(item[0:3]) for item in recipients]
                 self.donationWin = tk.Toplevel(self.root)
                 self.donationWin.lift(self.root)
@@ -289,7 +307,7 @@ class donationWindow:
                     self.recipientIDDropdown = ttk.OptionMenu(self.giveFoodFrame, self.recipientIDVar, 'Anonymous',
                                                               *recipientIDs,
                                                               command=lambda x: (self.recipientIDVar.set(
-                                                                  self.recipientIDVar.get()[2:9])))
+                                                                  recordID(self.recipientIDVar.get()))))
                 else:
                     self.recipientIDDropdown = tk.Label(self.giveFoodFrame, textvariable=self.recipientIDVar,
                                                         font='none 11')
@@ -342,13 +360,14 @@ class donationWindow:
                                   foodID + '\nName:\t\t' + name + '\nRecipientID:\t' + recipientID +
                                   '\nStaffID:\t\t' + staffID):
             try:
-                # Insert record into donationsTbl
-                executeSQL('INSERT INTO giveFoodTbl VALUES (?,?,?)',
-                           (foodID, recipientID, staffID), False)
-                executeSQL(
-                    'UPDATE foodDonatTbl SET givenAway=? WHERE foodID = ?', (1, foodID), False)
-                # Reloads records into treeview
-                loadDatabase(self.foodTree, 'foodDonatTbl', False)
+                # Records who the food was given to and marks it as given away, together
+                with transaction():
+                    executeSQL('INSERT INTO giveFoodTbl VALUES (?,?,?)',
+                               (foodID, recipientID, staffID), False)
+                    executeSQL(
+                        'UPDATE foodDonatTbl SET givenAway=? WHERE foodID = ?', (1, foodID), False)
+                # Shows the updated record in the treeview
+                upsertRow(self.foodTree, 'foodDonatTbl', foodID)
                 # Destroys add donation window and returns to view donations window
                 self.notebook.tab(0, state='normal')
                 enableWindow(self.donationWin, self.giveFoodButton, self.returnButton, self.addFoodButton,
@@ -368,7 +387,7 @@ class donationWindow:
                       self.delFoodButton)
         # Selects all donorIDs, forenames and surnames, and saves them to a list
         donors = executeSQL(
-            'SELECT donorID,donorForename,donorSurname FROM donorTbl', (), True)
+            'SELECT donorID,donorForename,donorSurname FROM donorTbl WHERE donorID != ?', ('Anonymous',), True)
         donorIDs = [(item[0:3]) for item in donors]
         self.donationWin = tk.Toplevel(self.root)
         self.donationWin.lift(self.root)
@@ -397,14 +416,14 @@ class donationWindow:
         self.dateVar = tk.StringVar()
         # Creates a calendar widget to pick the date from
         self.calendar = DateEntry(self.addDonationFrame, state='readonly',
-                                  date_pattern='DD/MM/YYYY', textvariable=self.dateVar,
+                                  date_pattern=config.datePattern, textvariable=self.dateVar,
                                   showweeknumbers=False, maxdate=datetime.today())
         self.expiryDateLabel = tk.Label(
             self.addDonationFrame, text='Expiry Date:', font='none 11')
         self.expiryDateVar = tk.StringVar()
         # Creates a calendar widget to pick the date from
         self.expiryCalendar = DateEntry(self.addDonationFrame, state='readonly',
-                                        date_pattern='DD/MM/YYYY', textvariable=self.expiryDateVar,
+                                        date_pattern=config.datePattern, textvariable=self.expiryDateVar,
                                         showweeknumbers=False, mindate=datetime.today())
         self.donorIDLabel = tk.Label(
             self.addDonationFrame, text='DonorID:', font='none 11')
@@ -413,7 +432,8 @@ class donationWindow:
         # self.donorIDVar.set('Anonymous')
         if donorIDs:
             self.donorIDDropdown = ttk.OptionMenu(self.addDonationFrame, self.donorIDVar, 'Anonymous', *donorIDs,
-                                                  command=lambda x: (self.donorIDVar.set(self.donorIDVar.get()[2:9])))
+                                                  command=lambda x: (
+                                                      self.donorIDVar.set(recordID(self.donorIDVar.get()))))
         else:
             self.donorIDDropdown = tk.Label(
                 self.addDonationFrame, textvariable=self.donorIDVar, font='none 11')
@@ -451,20 +471,22 @@ class donationWindow:
         # Checks that all fields have been entered
         if name:
             staffID = config.userID
-            foodID = 'FD' + \
-                str(''.join(['%s' % random.randint(0, 9)
-                    for num in range(0, 5)]))
             # Comfirmation box asks user to confirm that inputs are all correct
-            if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nFoodID:\t\t' +
-                                      foodID + '\nName:\t\t' + name + '\nDate Donated:\t' +
+            if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                      'FoodID:\t\tAssigned on save' +
+                                      '\nName:\t\t' + name + '\nDate Donated:\t' +
                                       date + '\nExpiry Date:\t' + expiryDate + '\nDonorID:\t\t' +
                                       donorID + '\nStaffID:\t\t' + staffID):
                 try:
-                    # Insert record into donationsTbl
-                    executeSQL('INSERT INTO foodDonatTbl VALUES (?,?,?,?,?,?,?)',
-                               (foodID, name, date, expiryDate, False, donorID, staffID), False)
-                    # Reloads records into treeview
-                    loadDatabase(self.foodTree, 'foodDonatTbl', False)
+                    # Allocates a new, unique foodID in the same transaction as the insert, so that
+                    # cancelling or a failed insert does not use one up
+                    with transaction():
+                        foodID = nextID('FD')
+                        # Insert record into donationsTbl
+                        executeSQL('INSERT INTO foodDonatTbl VALUES (?,?,?,?,?,?,?)',
+                                   (foodID, name, date, expiryDate, False, donorID, staffID), False)
+                    # Shows the new record in the treeview
+                    upsertRow(self.foodTree, 'foodDonatTbl', foodID)
                     # Destroys add donation window and returns to view donations window
                     self.notebook.tab(0, state='normal')
                     enableWindow(self.donationWin, self.giveFoodButton, self.returnButton, self.addFoodButton,
@@ -499,7 +521,7 @@ class donationWindow:
 
             # Selects all donorIDs, forenames and surnames, and saves them to a list
             donors = executeSQL(
-                'SELECT donorID,donorForename,donorSurname FROM donorTbl', (), True)
+                'SELECT donorID,donorForename,donorSurname FROM donorTbl WHERE donorID != ?', ('Anonymous',), True)
             donorIDs = [(item[0:3]) for item in donors]
             self.donationWin = tk.Toplevel(self.root)
             self.donationWin.lift(self.root)
@@ -533,14 +555,14 @@ class donationWindow:
             self.dateVar = tk.StringVar()
             # Creates a calendar widget to pick the date from
             self.calendar = DateEntry(self.editDonationFrame, state='readonly',
-                                      date_pattern='DD/MM/YYYY', textvariable=self.dateVar,
+                                      date_pattern=config.datePattern, textvariable=self.dateVar,
                                       showweeknumbers=False, maxdate=datetime.today())
             self.expiryDateLabel = tk.Label(
                 self.editDonationFrame, text='Expiry Date:', font='none 11')
             self.expiryDateVar = tk.StringVar()
             # Creates a calendar widget to pick the date from
             self.expiryCalendar = DateEntry(self.editDonationFrame, state='readonly',
-                                            date_pattern='DD/MM/YYYY', textvariable=self.expiryDateVar,
+                                            date_pattern=config.datePattern, textvariable=self.expiryDateVar,
                                             showweeknumbers=False, mindate=datetime.today())
             self.donorIDLabel = tk.Label(
                 self.editDonationFrame, text='DonorID:', font='none 11')
@@ -549,7 +571,7 @@ class donationWindow:
             if donorIDs:
                 self.donorIDDropdown = ttk.OptionMenu(self.editDonationFrame, self.donorIDVar, 'Anonymous', *donorIDs,
                                                       command=lambda x: (
-                                                          self.donorIDVar.set(self.donorIDVar.get()[2:9])))
+                                                          self.donorIDVar.set(recordID(self.donorIDVar.get()))))
             else:
                 self.donorIDDropdown = tk.Label(
                     self.editDonationFrame, textvariable=self.donorIDVar, font='none 11')
@@ -616,8 +638,8 @@ class donationWindow:
                     executeSQL('''UPDATE foodDonatTbl SET foodName = ?, donatDate = ?,
                                     expiryDate = ?, donorID = ? WHERE foodID = ?''',
                                (name, date, expiryDate, donorID, foodID), False)
-                    # Reloads records into treeview
-                    loadDatabase(self.foodTree, 'foodDonatTbl', False)
+                    # Shows the updated record in the treeview
+                    upsertRow(self.foodTree, 'foodDonatTbl', foodID)
                     # Destroys add donation window and returns to view donations window
                     self.notebook.tab(0, state='normal')
                     enableWindow(self.donationWin, self.giveFoodButton, self.returnButton, self.addFoodButton,
@@ -639,16 +661,19 @@ class donationWindow:
             # Retreives the donationID from the record selected in the treeview
             for selected_item in self.foodTree.selection():
                 foodID = self.foodTree.set(selected_item, '#1')
-            existsForeign = executeSQL(
-                'SELECT * FROM giveFoodTbl WHERE foodID = ?', (foodID,), False)
+            existsForeign = isReferenced('foodDonatTbl', foodID)
             if not existsForeign:
                 # Asks the user for confimation that they want to permanently delete this record
                 if tk.messagebox.askokcancel('Delete', 'Are you sure you want to permanently delete this record?'):
-                    # Removes the recird from foodDonatTbl
-                    executeSQL(
-                        'DELETE FROM foodDonatTbl WHERE foodID=?', (foodID,), False)
-                    # Removes the record from the treeview
-                    self.foodTree.delete(selected_item)
+                    try:
+                        # Removes the recird from foodDonatTbl
+                        executeSQL(
+                            'DELETE FROM foodDonatTbl WHERE foodID=?', (foodID,), False)
+                        # Removes the record from the treeview
+                        removeRow(self.foodTree, foodID)
+                    except sqlite3.IntegrityError:  # Given away on another till since it was checked
+                        tk.messagebox.showerror(
+                            'Error', 'Food Item Already Given Away')
             else:
                 tk.messagebox.showerror(
                     'Error', 'Food Item Already Given Away')
@@ -657,9 +682,7 @@ class donationWindow:
             tk.messagebox.showerror('Error', 'No Record Selected')
 
     def search(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol, %, to the end of the search value
-        search = '%' + str(self.searchVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFieldVar.get()
         if searchFieldVar == 'DonationID':
             searchField = 'donationID'
@@ -675,14 +698,20 @@ class donationWindow:
             searchField = 'donorID'
         elif searchFieldVar == 'StaffID':
             searchField = 'staffID'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchVar.get().strip():
+            loadDatabase(self.tree, 'donationsTbl', False)
+            return
         # Clears the treeview of all other records
         self.tree.delete(*self.tree.get_children())
-        # Selects records from donationsTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM donationsTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from donationsTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('donationsTbl', self.searchVar.get(), searchField)
         for i in records:
             # Inserts all the records found into the treeview
-            self.tree.insert('', 0, values=(
+            self.tree.insert('', 'end', values=(
                 i[0], i[1], i[2], i[3], i[4], i[5], i[6]))
 
     def addDonation(self):
@@ -691,7 +720,7 @@ class donationWindow:
                       self.delDonationButton)
         # Selects all donorIDs, forenames and surnames, and saves them to a list
         donors = executeSQL(
-            'SELECT donorID,donorForename,donorSurname FROM donorTbl', (), True)
+            'SELECT donorID,donorForename,donorSurname FROM donorTbl WHERE donorID != ?', ('Anonymous',), True)
         donorIDs = [(item[0:3]) for item in donors]
         if donorIDs:
             self.donationWin = tk.Toplevel(self.root)
@@ -736,14 +765,15 @@ class donationWindow:
             self.dateVar = tk.StringVar()
             # Creates a calendar widget to pick the date from
             self.calendar = DateEntry(self.addDonationFrame, state='readonly',
-                                      date_pattern='DD/MM/YYYY', textvariable=self.dateVar,
+                                      date_pattern=config.datePattern, textvariable=self.dateVar,
                                       showweeknumbers=False, maxdate=datetime.today())
             self.donorIDLabel = tk.Label(
                 self.addDonationFrame, text='DonorID:', font='none 11')
             # Creates a dropdown menu populated with all the donorIDs that we retrieved earlier
             self.donorIDVar = tk.StringVar()
             self.donorIDDropdown = ttk.OptionMenu(self.addDonationFrame, self.donorIDVar, 'Select...', *donorIDs,
-                                                  command=lambda x: (self.donorIDVar.set(self.donorIDVar.get()[2:9])))
+                                                  command=lambda x: (
+                                                      self.donorIDVar.set(recordID(self.donorIDVar.get()))))
             # self.donorIDVar.set('Select...')
             self.staffIDLabel = tk.Label(
                 self.addDonationFrame, text='staffID:', font='none 11')
@@ -812,22 +842,24 @@ class donationWindow:
             refgood = True if (refneeded and referenceNo) or (
                 not refneeded) else False
             if refgood and cashorbank and donorID != 'Select...':
-                # Generates a random donationID, using the random module
-                donationID = 'DN' + \
-                    str(''.join(['%s' % random.randint(0, 9)
-                        for num in range(0, 5)]))
                 # Comfirmation box asks user to confirm that inputs are all correct
-                if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nDonationID:\t' +
-                                          donationID + '\nAmount:\t\t' + str(amount) +
+                if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                          'DonationID:\tAssigned on save' +
+                                          '\nAmount:\t\t' + str(amount) +
                                           '\nCash or Bank?\t' + cashorbank + '\nReference No:\t' +
                                           referenceNo + '\nDate:\t\t' + date +
                                           '\nDonorID:\t\t' + donorID + '\nStaffID:\t\t' + staffID):
                     try:
-                        # Insert record into donationsTbl
-                        executeSQL('INSERT INTO donationsTbl VALUES (?,?,?,?,?,?,?)',
-                                   (donationID, float(amount), cashorbank, referenceNo, date, donorID, staffID), False)
-                        # Reloads records into treeview
-                        loadDatabase(self.tree, 'donationsTbl', False)
+                        # Allocates a new, unique donationID in the same transaction as the insert, so that
+                        # cancelling or a failed insert does not use one up
+                        with transaction():
+                            donationID = nextID('DN')
+                            # Insert record into donationsTbl
+                            executeSQL('INSERT INTO donationsTbl VALUES (?,?,?,?,?,?,?)',
+                                       (donationID, float(amount), cashorbank, referenceNo, date, donorID, staffID),
+                                       False)
+                        # Shows the new record in the treeview
+                        upsertRow(self.tree, 'donationsTbl', donationID)
                         # Destroys add donation window and returns to view donations window
                         self.notebook.tab(1, state='normal')
                         enableWindow(self.donationWin, self.reportButton, self.returnButton, self.addDonationButton,
@@ -863,7 +895,7 @@ class donationWindow:
                 staffID = donations[6]
             # Selects all donorIDs and saves them to a list
             donors = executeSQL(
-                'SELECT donorID,donorForename,donorSurname FROM donorTbl', (), True)
+                'SELECT donorID,donorForename,donorSurname FROM donorTbl WHERE donorID != ?', ('Anonymous',), True)
             donorIDs = [(item[0:3]) for item in donors]
             cashorbank = 0 if cashorbank == 'Cash' else 1
             self.donationWin = tk.Toplevel(self.root)
@@ -912,14 +944,15 @@ class donationWindow:
             self.dateVar = tk.StringVar()
             # Creates a calendar widget to pick the date from
             self.calendar = DateEntry(self.editDonationFrame, state='readonly',
-                                      date_pattern='DD/MM/YYYY', textvariable=self.dateVar,
+                                      date_pattern=config.datePattern, textvariable=self.dateVar,
                                       showweeknumbers=False, maxdate=datetime.today())
             self.donorIDLabel = tk.Label(
                 self.editDonationFrame, text='DonorID:', font='none 11')
             # Creates a dropdown menu populated with all the donorIDs that we retrieved earlier
             self.donorIDVar = tk.StringVar()
             self.donorIDDropdown = ttk.OptionMenu(self.editDonationFrame, self.donorIDVar, 'Select...', *donorIDs,
-                                                  command=lambda x: (self.donorIDVar.set(self.donorIDVar.get()[2:9])))
+                                                  command=lambda x: (
+                                                      self.donorIDVar.set(recordID(self.donorIDVar.get()))))
             # self.donorIDVar.set('Select...')
             self.staffIDLabel = tk.Label(
                 self.editDonationFrame, text='StaffID:', font='none 11')
@@ -1009,8 +1042,8 @@ class donationWindow:
                     executeSQL('''UPDATE donationsTbl SET amount=?, cashorbank=?, referenceNo=?, date=?, donorID=?
                                    WHERE donationID=?''',
                                (float(amount), cashorbank, referenceNo, date, donorID, donationID), False)
-                    # Reloads records into treeview, with updated values
-                    loadDatabase(self.tree, 'donationsTbl', False)
+                    # Shows the updated record in the treeview
+                    upsertRow(self.tree, 'donationsTbl', donationID)
                     # Destroys edit donation window and returns to view donations window
                     self.notebook.tab(1, state='normal')
                     enableWindow(self.donationWin, self.reportButton, self.returnButton, self.addDonationButton,
@@ -1036,7 +1069,7 @@ class donationWindow:
                     executeSQL(
                         'DELETE FROM donationsTbl WHERE donationID=?', (donationID,), False)
                     # Removes the record from the treeview
-                    self.tree.delete(selected_item)
+                    removeRow(self.tree, donationID)
         else:
             # Outputs error message is no record has been selected
             tk.messagebox.showerror('Error', 'No Record Selected')
@@ -1066,13 +1099,13 @@ class donationWindow:
             self.donationReportFrame, text='Start Date:', font='none 11')
         self.startDateVar = tk.StringVar()
         self.startCalendar = DateEntry(self.donationReportFrame, state='readonly',
-                                       date_pattern='DD/MM/YYYY', textvariable=self.startDateVar,
+                                       date_pattern=config.datePattern, textvariable=self.startDateVar,
                                        showweeknumbers=False, maxdate=datetime.today())
         self.endDateLabel = tk.Label(
             self.donationReportFrame, text='End Date:', font='none 11')
         self.endDateVar = tk.StringVar()
         self.endCalendar = DateEntry(self.donationReportFrame, state='readonly',
-                                     date_pattern='DD/MM/YYYY', textvariable=self.endDateVar,
+                                     date_pattern=config.datePattern, textvariable=self.endDateVar,
                                      showweeknumbers=False, maxdate=datetime.today())
         # Creates a text variable and error label to output any errors to
         self.errorVar = tk.StringVar()
@@ -1098,9 +1131,9 @@ class donationWindow:
         try:
             # Retrieves the start and end dates entered from the form
             self.startDate = datetime.strptime(
-                self.startDateVar.get().strip(), '%d/%m/%Y')
+                self.startDateVar.get().strip(), config.dateFormat)
             self.endDate = datetime.strptime(
-                self.endDateVar.get().strip(), '%d/%m/%Y')
+                self.endDateVar.get().strip(), config.dateFormat)
             # Clears any error messages
             self.errorVar.set('')
             disableWindow(self.enterButton)
@@ -1110,8 +1143,6 @@ class donationWindow:
             self.donationReportWin.iconbitmap(config.icon)
             self.donationReportFrame = tk.Frame(self.donationReportWin)
             self.donationReportFrame.pack(fill='both', expand=True)
-            self.donationReportWin.protocol('WM_DELETE_WINDOW',
-                                            lambda: enableWindow(self.donationReportWin, self.enterButton))
             self.titleLabel = tk.Label(self.donationReportFrame, text='Kingfisher Trust', font='algerian 14 bold',
                                        fg='#2380b7')
             self.detailLabel = tk.Label(
@@ -1124,14 +1155,17 @@ class donationWindow:
                                        + ' to ' + str(datetime.isoformat(self.endDate)[:10]) + ':')
             # Creates a button allowing the user to save the report as a PDF file
             self.pdfButton = ttk.Button(self.donationReportFrame, text='Save to PDF',
-                                        command=lambda: (disableWindow(self.pdfButton),
-                                                         donationReport(self.startDate, self.endDate,
-                                                                        records, self.totalDonat)))
+                                        command=lambda: self.savePDF())
+            # Creates a button allowing the user to save the report's records as a CSV or columnar file
+            self.exportReportButton = ttk.Button(self.donationReportFrame, text='Export Data',
+                                                 command=lambda: exportReport(
+                                                     self.donationReportWin, 'donation', self.startDate, self.endDate))
             # Grids the above labels and buttons
             self.titleLabel.grid(row=0, column=0, columnspan=3, pady=10)
             self.detailLabel.grid(row=1, column=0, columnspan=3)
             self.datesLabel.grid(row=2, column=0, padx=10, sticky='w')
             self.pdfButton.grid(row=2, column=2, padx=10, sticky='E')
+            self.exportReportButton.grid(row=2, column=1, padx=10, sticky='E')
             # Creates a treeview to insert all the relevant donation records
             columns = ('DonationID', 'Amount', 'Cash/Bank',
                        'Reference No', 'Date', 'DonorID', 'Donor Name', 'StaffID')
@@ -1146,26 +1180,8 @@ class donationWindow:
                 [0, 1, 2], weight=1)  # column with treeview
             self.donationReportFrame.rowconfigure(
                 4, weight=1)  # row with treeview
-            # Connects to database and selects all records from donationsTbl
-            self.records = executeSQL('''SELECT donationsTbl.*,donorTbl.donorForename,donorTbl.donorSurname
-                            FROM donationsTbl,donorTbl
-                            WHERE donationsTbl.donorID = donorTbl.donorID''', (), True)
-            self.totalDonat = 0
-            records = []
-            # Finds records which fall within the given dates
-            for i in self.records:
-                date = datetime.strptime(i[4], '%d/%m/%Y')
-                if self.startDate <= date <= self.endDate:
-                    # Tallys the total amount donated within the time period
-                    self.totalDonat += float(i[1])
-                    # Inserts the record into the treeview
-                    record = i[0], i[1], i[2], i[3], i[4], i[5], (
-                        i[7] + ' ' + i[8]), i[6]
-                    records.append(record)
-                    self.reporttree.insert('', 0, values=record)
-            # Creates a label with the total amount donated
-            self.donatedLabel = tk.Label(self.donationReportFrame,
-                                         text=str('Total Donated = £{:.2f}'.format(self.totalDonat)))
+            # Creates a label for the total amount donated, shown once the report has loaded
+            self.donatedLabel = tk.Label(self.donationReportFrame, text='Loading...')
             self.donatedLabel.grid(row=3, column=0, padx=10, sticky='w')
 
             self.scrollbar = ttk.Scrollbar(
@@ -1175,8 +1191,41 @@ class donationWindow:
             self.reporttree.configure(
                 yscrollcommand=self.scrollbar.set, selectmode='browse')
 
+            # The report is read from the database in the background. Closing the window stops it.
+            disableWindow(self.pdfButton)
+            task = submit(self.donationReportWin, self.readReport, self.startDate, self.endDate,
+                          done=lambda result: self.showReport(*result))
+            self.donationReportWin.protocol('WM_DELETE_WINDOW',
+                                            lambda: (task.cancel(),
+                                                     enableWindow(self.donationReportWin, self.enterButton)))
+
             center(self.donationReportWin)
 
         except ValueError:
             # Outputs an error if the dates input are invalid
-            self.errorVar.set('Error: Invalid Input\nDD/MM/YYYY')
+            self.errorVar.set('Error: Invalid Input\nYYYY-MM-DD')
+
+    # Reads the donation report for the given dates. Runs in the background.
+    def readReport(self, task, startDate, endDate):
+        # The totals are summed from the daily totals
+        totals = donationTotals(startDate, endDate)
+        # Selects only the donations made within the given dates, including anonymous ones, newest first
+        return totals, list(donationRows(startDate, endDate, newestFirst=True))
+
+    # Shows the report once it has been read
+    def showReport(self, totals, records):
+        cash, bank, self.totalDonat = totals
+        # Inserts the records into the treeview, newest first
+        insertRows(self.reporttree, records)
+        self.donatedLabel.config(text=str('Total Donated = £{:.2f} (Cash £{:.2f}, Bank £{:.2f})'.format(
+            self.totalDonat, cash, bank)))
+        self.pdfButton['state'] = 'normal'
+
+    # Saves the report as a PDF in the background, newest records first. The rows are read from
+    # the database as they are written, rather than kept in memory.
+    def savePDF(self):
+        disableWindow(self.pdfButton)
+        pdf = donationReport(self.startDate, self.endDate, self.totalDonat)
+        rows = donationRows(self.startDate, self.endDate, newestFirst=True)
+        submit(self.donationReportWin, lambda task: pdf.save(rows), done=reportSaved,
+               error=lambda error: reportFailed(pdf.fileName, error))
@@ -1,11 +1,13 @@
 import tkinter as tk
 from tkinter import ttk
-import random
 import sqlite3
 
 from .. import config
 from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center
-from ..sql import loadDatabase, executeSQL
+from ..sql import loadDatabase, executeSQL, transaction, isReferenced, upsertRow, removeRow
+from ..export import exportMenu
+from ..ids import nextID
+from ..search import searchTable
 from ..validation import validateEmail, validatePhone
 
 
@@ -33,7 +35,7 @@ class donorWindow:
         # Creates a dropdown menu, with all the fields listed, set to donorID by default
         self.searchFieldVar = tk.StringVar()
         self.searchField = ttk.OptionMenu(self.frame, self.searchFieldVar, 'DonorID', 'DonorID', 'Surname', 'Forename',
-                                          'Contact')
+                                          'Contact', 'All Fields')
         # Creates a 'Search' button, which calls the search function when pressed
         self.searchButton = ttk.Button(
             self.frame, text='Search', command=lambda: self.search())
@@ -67,6 +69,9 @@ class donorWindow:
             self.frame, orient='horizontal', command=self.tree.xview)
         self.xscrollbar.grid(row=5, column=0, sticky='ew',
                              columnspan=4, pady=(0, 10))
+        # Creates an 'Export' button, to save the whole table to a file without loading it here
+        self.exportButton = exportMenu(self.frame, [('Donors', 'donorTbl')])
+        self.exportButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.tree.configure(
             xscrollcommand=self.xscrollbar.set, selectmode='browse')
         # Creates the add/edit/delete donor buttons, which calls their respective functions when clicked
@@ -100,9 +105,7 @@ class donorWindow:
         config.app.enableMenu()
 
     def search(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol, %, to the end of the search value
-        search = '%' + str(self.searchVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFieldVar.get()
         if searchFieldVar == 'DonorID':
             searchField = 'donorID'
@@ -112,14 +115,20 @@ class donorWindow:
             searchField = 'donorForename'
         elif searchFieldVar == 'Contact':
             searchField = 'donorContact'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchVar.get().strip():
+            loadDatabase(self.tree, 'donorTbl', False)
+            return
         # Clears the treeview of all other records
         self.tree.delete(*self.tree.get_children())
-        # Selects records from donorTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM donorTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from donorTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('donorTbl', self.searchVar.get(), searchField)
         for i in records:
             # Inserts all the records found into the treeview
-            self.tree.insert('', 0, values=(i[0], i[1], i[2], i[3]))
+            self.tree.insert('', 'end', values=(i[0], i[1], i[2], i[3]))
 
     # Creates add donor window
     def addDonor(self):
@@ -187,20 +196,21 @@ class donorWindow:
         if forename and surname and contact:
             # Checks that contact is valid phoneNo OR email
             if validatePhone(contact) or validateEmail(contact):
-                # Generates a random donorID, using the random module
-                donorID = 'DO' + \
-                    str(''.join(['%s' % random.randint(0, 9)
-                        for num in range(0, 5)]))
                 # Asks for user confirmation of the input details
-                if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nDonorID:\t\t' + donorID +
+                if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                          'DonorID:\t\tAssigned on save' +
                                           '\nName:\t\t' + forename + ' ' + surname +
                                           '\nContact:\t\t' + contact):
                     try:
-                        # Inserts record into donorTbl
-                        executeSQL('INSERT INTO donorTbl VALUES (?,?,?,?)', (donorID, surname, forename, contact),
-                                   False)
-                        # Reloads records into treeview
-                        loadDatabase(self.tree, 'donorTbl', False)
+                        # Allocates a new, unique donorID in the same transaction as the insert, so that
+                        # cancelling or a failed insert does not use one up
+                        with transaction():
+                            donorID = nextID('DO')
+                            # Inserts record into donorTbl
+                            executeSQL('INSERT INTO donorTbl VALUES (?,?,?,?)', (donorID, surname, forename, contact),
+                                       False)
+                        # Shows the new record in the treeview
+                        upsertRow(self.tree, 'donorTbl', donorID)
                         # Destroys add donor toplevel and returns to view donors window
                         enableWindow(self.donorWin, self.returnButton, self.addDonorButton, self.editDonorButton,
                                      self.delDonorButton)
@@ -314,8 +324,8 @@ class donorWindow:
                     # Updates record where the donorID matches the record selected
                     executeSQL('''UPDATE donorTbl SET donorSurname=?, donorForename=?, donorContact=?
                                    WHERE donorID=?''', (newSurname, newForename, newContact, donorID), False)
-                    # Reloads the records into the treeview, with the updated details
-                    loadDatabase(self.tree, 'donorTbl', False)
+                    # Shows the updated record in the treeview
+                    upsertRow(self.tree, 'donorTbl', donorID)
                     # Destroys edit donor window and returns to view donors window
                     enableWindow(self.donorWin, self.returnButton, self.addDonorButton, self.editDonorButton,
                                  self.delDonorButton)
@@ -336,20 +346,22 @@ class donorWindow:
                 donorID = self.tree.set(selected_item, '#1')
             # Searches through the table where the
             # donorID might be stored as a foreign key
-            existsForeign = executeSQL(
-                'SELECT * FROM donationsTbl WHERE donorID = ?', (donorID,), True)
-            existsForeign += executeSQL(
-                'SELECT * FROM foodDonatTbl WHERE donorID = ?', (donorID,), True)
+            # The Anonymous record is always kept, for records saved without a donor
+            existsForeign = donorID == 'Anonymous' or isReferenced('donorTbl', donorID)
             # If donorID is not stored in any other tables
             if not existsForeign:
                 # Confirms that the user wants to permanently delete the record
                 if tk.messagebox.askokcancel('Delete', 'Are you sure you want to permanently delete this record?'):
                     for selected_item in self.tree.selection():
-                        # Deletes the record from donorTbl
-                        executeSQL(
-                            'DELETE FROM donorTbl WHERE donorID=?', (donorID,), False)
-                        # Removes the record from the treeview
-                        self.tree.delete(selected_item)
+                        try:
+                            # Deletes the record from donorTbl
+                            executeSQL(
+                                'DELETE FROM donorTbl WHERE donorID=?', (donorID,), False)
+                            # Removes the record from the treeview
+                            removeRow(self.tree, donorID)
+                        except sqlite3.IntegrityError:  # Used on another till since it was checked
+                            tk.messagebox.showerror(
+                                'Error', 'Error: Record in use by other tables')
             else:
                 # If donorID is a foreign key in other tables, output error as the record cannot be deleted
                 tk.messagebox.showerror(
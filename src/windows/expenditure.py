@@ -2,14 +2,18 @@ import tkinter as tk
 from tkinter import ttk
 from tkcalendar import DateEntry
 from datetime import datetime
-import random
 import sqlite3
 
 from .. import config
-from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center
-from ..sql import loadDatabase, executeSQL
+from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center, insertRows
+from ..sql import loadDatabase, executeSQL, transaction, upsertRow, removeRow
+from ..export import exportMenu, exportReport
+from ..ids import nextID
+from ..search import searchTable
 from ..validation import validateFloat
-from ..report import expenditureReport
+from ..report import expenditureReport, expenditureRows, reportSaved, reportFailed
+from ..executor import submit
+from ..totals import expenditureTotal
 
 
 class expenditureWindow:
@@ -35,7 +39,7 @@ class expenditureWindow:
         # Creates a dropdown menu, with all the fields listed, set to expenditureID by default
         self.searchFieldVar = tk.StringVar()
         self.searchField = ttk.OptionMenu(self.frame, self.searchFieldVar, 'ExpenditureID', 'ExpenditureID', 'Amount',
-                                          'Details', 'Date', 'StaffID')
+                                          'Details', 'Date', 'StaffID', 'All Fields')
         # Creates a 'Search' button, which calls the search function when pressed
         self.searchButton = ttk.Button(
             self.frame, text='Search', command=lambda: self.search())
@@ -60,6 +64,8 @@ class expenditureWindow:
             self.tree.column(col, width=100, minwidth=100)
             self.tree.heading(col, text=col, command=lambda _col=col: treeview_sort_column(
                 self.tree, _col, False))
+        # Sorts amounts in search results as numbers
+        self.tree.columnTypes = {'Amount': float}
         self.tree.grid(row=2, column=0, sticky='nesw', rowspan=3,
                        columnspan=3, padx=(10, 0), pady=(10, 0))
         self.frame.columnconfigure(1, weight=1)  # column with treeview
@@ -74,6 +80,9 @@ class expenditureWindow:
             self.frame, orient='horizontal', command=self.tree.xview)
         self.xscrollbar.grid(row=5, column=0, sticky='ew',
                              columnspan=4, pady=(0, 10))
+        # Creates an 'Export' button, to save the whole table to a file without loading it here
+        self.exportButton = exportMenu(self.frame, [('Expenditure', 'expenditureTbl')])
+        self.exportButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.tree.configure(
             xscrollcommand=self.xscrollbar.set, selectmode='browse')
         # Creates the add, edit and delete expenditure buttons, which calls their respective functions when clicked
@@ -106,9 +115,7 @@ class expenditureWindow:
         config.app.enableMenu()
 
     def search(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol, %, to the end of the search value
-        search = '%' + str(self.searchVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFieldVar.get()
         if searchFieldVar == 'ExpenditureID':
             searchField = 'expenditureID'
@@ -120,14 +127,20 @@ class expenditureWindow:
             searchField = 'date'
         elif searchFieldVar == 'StaffID':
             searchField = 'staffID'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchVar.get().strip():
+            loadDatabase(self.tree, 'expenditureTbl', False)
+            return
         # Clears the treeview of all other records
         self.tree.delete(*self.tree.get_children())
-        # Selects records from expenditureTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM expenditureTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from expenditureTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('expenditureTbl', self.searchVar.get(), searchField)
         for i in records:
             # Inserts all the records found into the treeview
-            self.tree.insert('', 0, values=(i[0], i[1], i[2], i[3], i[4]))
+            self.tree.insert('', 'end', values=(i[0], i[1], i[2], i[3], i[4]))
 
     def addExpenditure(self):
         disableWindow(self.returnButton, self.addExpenditureButton, self.editExpenditureButton,
@@ -159,7 +172,7 @@ class expenditureWindow:
         self.dateVar = tk.StringVar()
         # Creates a calendar widget to pick the date from
         self.calendar = DateEntry(self.addExpenditureFrame, state='readonly',
-                                  date_pattern='DD/MM/YYYY', textvariable=self.dateVar,
+                                  date_pattern=config.datePattern, textvariable=self.dateVar,
                                   showweeknumbers=False, maxdate=datetime.today())
         # Creates text variable and error label to output any error messages
         self.errorVar = tk.StringVar()
@@ -197,20 +210,21 @@ class expenditureWindow:
             # Checks that all fields have been filled
             if amount and details and date:
                 if len(details) < 36:
-                    # Generates a random expenditureID, using the random module
-                    expenditureID = 'EX' + \
-                        str(''.join(['%s' % random.randint(0, 9)
-                            for num in range(0, 5)]))
                     # Asks for user confimation of the input details
-                    if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nExpenditureID:\t'
-                                              + expenditureID + '\nAmount:\t\t£{:.2f}'.format(amount) +
+                    if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                              'ExpenditureID:\tAssigned on save' +
+                                              '\nAmount:\t\t£{:.2f}'.format(amount) +
                                               '\nDetails:\t\t' + details + '\nDate:\t\t' + date):
                         try:
-                            # Inserts record into expenditureTbl
-                            executeSQL('INSERT INTO expenditureTbl VALUES (?,?,?,?,?)',
-                                       (expenditureID, amount, details, date, config.userID), False)
-                            # Reloads records into treeview
-                            loadDatabase(self.tree, 'expenditureTbl', False)
+                            # Allocates a new, unique expenditureID in the same transaction as the insert, so that
+                            # cancelling or a failed insert does not use one up
+                            with transaction():
+                                expenditureID = nextID('EX')
+                                # Inserts record into expenditureTbl
+                                executeSQL('INSERT INTO expenditureTbl VALUES (?,?,?,?,?)',
+                                           (expenditureID, amount, details, date, config.userID), False)
+                            # Shows the new record in the treeview
+                            upsertRow(self.tree, 'expenditureTbl', expenditureID)
                             # Destroys add expenditure toplevel and returns to view expenditures window
                             enableWindow(self.expenditureWin, self.returnButton, self.addExpenditureButton,
                                          self.editExpenditureButton, self.delExpenditureButton)
@@ -273,7 +287,7 @@ class expenditureWindow:
             self.dateVar = tk.StringVar()
             # Creates a calendar widget to pick the date from
             self.calendar = DateEntry(self.editExpenditureFrame, state='readonly',
-                                      date_pattern='DD/MM/YYYY', textvariable=self.dateVar,
+                                      date_pattern=config.datePattern, textvariable=self.dateVar,
                                       showweeknumbers=False, maxdate=datetime.today())
             # Creates text variable and error label to output any error messages
             self.errorVar = tk.StringVar()
@@ -327,8 +341,8 @@ class expenditureWindow:
                         # Updates record where the expenditureID matches the record selected
                         executeSQL('''UPDATE expenditureTbl SET amount=?, details=?, date=?
                                        WHERE expenditureID=?''', (newAmount, newDetails, newDate, expenditureID), False)
-                        # Reloads the records into the treeview, with the updated details
-                        loadDatabase(self.tree, 'expenditureTbl', False)
+                        # Shows the updated record in the treeview
+                        upsertRow(self.tree, 'expenditureTbl', expenditureID)
                         # Destroys edit expenditure window and returns to view expenditures window
                         enableWindow(self.expenditureWin, self.returnButton, self.addExpenditureButton,
                                      self.editExpenditureButton, self.delExpenditureButton)
@@ -355,7 +369,7 @@ class expenditureWindow:
                     executeSQL(
                         'DELETE FROM expenditureTbl WHERE expenditureID=?', (expenditureID,), False)
                     # Removes the record from the treeview
-                    self.tree.delete(selected_item)
+                    removeRow(self.tree, expenditureID)
         else:  # Outputs error message if no record has been selected
             tk.messagebox.showerror('Error', 'No Record Selected')
 
@@ -381,13 +395,13 @@ class expenditureWindow:
             self.expenditureReportFrame, text='Start Date:', font='none 11')
         self.startDateVar = tk.StringVar()
         self.startCalendar = DateEntry(self.expenditureReportFrame, state='readonly',
-                                       date_pattern='DD/MM/YYYY', textvariable=self.startDateVar,
+                                       date_pattern=config.datePattern, textvariable=self.startDateVar,
                                        showweeknumbers=False, maxdate=datetime.today())
         self.endDateLabel = tk.Label(
             self.expenditureReportFrame, text='End Date:', font='none 11')
         self.endDateVar = tk.StringVar()
         self.endCalendar = DateEntry(self.expenditureReportFrame, state='readonly',
-                                     date_pattern='DD/MM/YYYY', textvariable=self.endDateVar,
+                                     date_pattern=config.datePattern, textvariable=self.endDateVar,
                                      showweeknumbers=False, maxdate=datetime.today())
         # Creates a text variable and error label to output any errors to
         self.errorVar = tk.StringVar()
@@ -414,9 +428,9 @@ class expenditureWindow:
         try:
             # Retrieves the start and end dates entered from the form
             self.startDate = datetime.strptime(
-                self.startDateVar.get().strip(), '%d/%m/%Y')
+                self.startDateVar.get().strip(), config.dateFormat)
             self.endDate = datetime.strptime(
-                self.endDateVar.get().strip(), '%d/%m/%Y')
+                self.endDateVar.get().strip(), config.dateFormat)
             # Clears any error messages
             self.errorVar.set('')
             disableWindow(self.enterButton)
@@ -426,8 +440,6 @@ class expenditureWindow:
             self.expenditureReportWin.iconbitmap(config.icon)
             self.expenditureReportFrame = tk.Frame(self.expenditureReportWin)
             self.expenditureReportFrame.pack(fill='both', expand=True)
-            self.expenditureReportWin.protocol('WM_DELETE_WINDOW',
-                                               lambda: enableWindow(self.expenditureReportWin, self.enterButton))
             self.titleLabel = tk.Label(self.expenditureReportFrame, text='Kingfisher Trust', font='algerian 14 bold',
                                        fg='#2380b7')
             self.detailLabel = tk.Label(
@@ -440,14 +452,17 @@ class expenditureWindow:
                                        + ' to ' + str(datetime.isoformat(self.endDate)[:10]) + ':')
             # Creates a button allowing the user to save the report as a PDF file
             self.pdfButton = ttk.Button(self.expenditureReportFrame, text='Save to PDF',
-                                        command=lambda: (disableWindow(self.pdfButton),
-                                                         expenditureReport(self.startDate, self.endDate,
-                                                                           records, self.totalSpend)))
+                                        command=lambda: self.savePDF())
+            # Creates a button allowing the user to save the report's records as a CSV or columnar file
+            self.exportReportButton = ttk.Button(self.expenditureReportFrame, text='Export Data',
+                                                 command=lambda: exportReport(self.expenditureReportWin, 'expenditure',
+                                                                              self.startDate, self.endDate))
             # Grids the above labels and buttons
             self.titleLabel.grid(row=0, column=0, columnspan=3, pady=10)
             self.detailLabel.grid(row=1, column=0, columnspan=3)
             self.datesLabel.grid(row=2, column=0, padx=10, sticky='w')
             self.pdfButton.grid(row=2, column=2, padx=10, sticky='E')
+            self.exportReportButton.grid(row=2, column=1, padx=10, sticky='E')
             # Creates a treeview to insert all the relevant order records
             columns = ('ExpenditureID', 'Amount', 'Details', 'Date', 'StaffID')
             self.reporttree = ttk.Treeview(self.expenditureReportFrame, columns=columns, show='headings',
@@ -462,23 +477,8 @@ class expenditureWindow:
             self.expenditureReportFrame.rowconfigure(
                 6, weight=1)  # row with treeview
 
-            # Connects to database and selects all records from expenditureTbl
-            self.records = executeSQL('SELECT * FROM expenditureTbl', (), True)
-            self.totalSpend = 0
-            records = []
-            # Finds records which fall within the given dates
-            for i in self.records:
-                date = datetime.strptime(i[3], '%d/%m/%Y')
-                if self.startDate <= date <= self.endDate:
-                    # Cumulates the total amount spent within the time period
-                    self.totalSpend += float(i[1])
-                    # Inserts the record into the treeview
-                    record = i
-                    records.append(record)
-                    self.reporttree.insert('', 0, values=record)
-            # Creates a label with the total amount donated
-            self.spentLabel = tk.Label(self.expenditureReportFrame,
-                                       text=str('Total Cost = £{:.2f}'.format(self.totalSpend)))
+            # Creates a label for the total amount spent, shown once the report has loaded
+            self.spentLabel = tk.Label(self.expenditureReportFrame, text='Loading...')
             self.spentLabel.grid(row=3, column=0, padx=10, sticky='w')
 
             self.scrollbar = ttk.Scrollbar(self.expenditureReportFrame, orient='vertical',
@@ -488,8 +488,40 @@ class expenditureWindow:
             self.reporttree.configure(
                 yscrollcommand=self.scrollbar.set, selectmode='browse')
 
+            # The report is read from the database in the background. Closing the window stops it.
+            disableWindow(self.pdfButton)
+            task = submit(self.expenditureReportWin, self.readReport, self.startDate, self.endDate,
+                          done=lambda result: self.showReport(*result))
+            self.expenditureReportWin.protocol('WM_DELETE_WINDOW',
+                                               lambda: (task.cancel(),
+                                                        enableWindow(self.expenditureReportWin, self.enterButton)))
+
             center(self.expenditureReportWin)
 
         except ValueError:
             # Outputs an error if the dates input are invalid
-            self.errorVar.set('Error: Invalid Input\nDD/MM/YYYY')
+            self.errorVar.set('Error: Invalid Input\nYYYY-MM-DD')
+
+    # Reads the expenditure report for the given dates. Runs in the background.
+    def readReport(self, task, startDate, endDate):
+        # Selects only the expenditures within the given dates, newest first
+        records = list(expenditureRows(startDate, endDate, newestFirst=True))
+        # The total amount spent within the time period is summed from the daily totals
+        return expenditureTotal(startDate, endDate), records
+
+    # Shows the report once it has been read
+    def showReport(self, totalSpend, records):
+        self.totalSpend = totalSpend
+        # Inserts the records into the treeview, newest first
+        insertRows(self.reporttree, records)
+        self.spentLabel.config(text=str('Total Cost = £{:.2f}'.format(self.totalSpend)))
+        self.pdfButton['state'] = 'normal'
+
+    # Saves the report as a PDF in the background, newest records first. The rows are read from
+    # the database as they are written, rather than kept in memory.
+    def savePDF(self):
+        disableWindow(self.pdfButton)
+        pdf = expenditureReport(self.startDate, self.endDate, self.totalSpend)
+        rows = expenditureRows(self.startDate, self.endDate, newestFirst=True)
+        submit(self.expenditureReportWin, lambda task: pdf.save(rows), done=reportSaved,
+               error=lambda error: reportFailed(pdf.fileName, error))
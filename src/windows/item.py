@@ -1,11 +1,13 @@
 import tkinter as tk
 from tkinter import ttk
-import random
 import sqlite3
 
 from .. import config
-from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center
-from ..sql import loadDatabase, executeSQL
+from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center, recordID
+from ..sql import loadDatabase, executeSQL, transaction, isReferenced, upsertRow, removeRow
+from ..export import exportMenu
+from ..ids import nextID
+from ..search import searchTable
 from ..validation import validateFloat, validateInt
 
 
@@ -32,7 +34,7 @@ class itemWindow:
         # Creates a dropdown menu, with all the fields listed to search, set to itemID by default
         self.searchFieldVar = tk.StringVar()
         self.searchField = ttk.OptionMenu(self.frame, self.searchFieldVar, 'ItemID', 'ItemID', 'ItemName',
-                                          'SalePrice', 'Quantity', 'SupplierCost', 'SupplierID')
+                                          'SalePrice', 'Quantity', 'SupplierCost', 'SupplierID', 'All Fields')
         # Creates a 'search' button, which calls the search function when pressed
         self.searchButton = ttk.Button(
             self.frame, text='Search', command=lambda: self.search())
@@ -53,6 +55,8 @@ class itemWindow:
             self.tree.column(col, width=100, minwidth=100)
             self.tree.heading(col, text=col, command=lambda _col=col: treeview_sort_column(
                 self.tree, _col, False))
+        # Prices and quantities are sorted as numbers when search results are sorted
+        self.tree.columnTypes = {'SalePrice': float, 'Quantity': int, 'SupplierCost': float}
         self.tree.grid(row=2, column=0, sticky='ewns', rowspan=3,
                        columnspan=3, padx=(10, 0), pady=(10, 0))
         self.frame.columnconfigure(1, weight=1)  # column with treeview
@@ -67,6 +71,9 @@ class itemWindow:
             self.frame, orient='horizontal', command=self.tree.xview)
         self.xscrollbar.grid(row=5, column=0, sticky='ew',
                              columnspan=4, pady=(0, 10))
+        # Creates an 'Export' button, to save the whole table to a file without loading it here
+        self.exportButton = exportMenu(self.frame, [('Items', 'itemTbl')])
+        self.exportButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.tree.configure(
             xscrollcommand=self.xscrollbar.set, selectmode='browse')
         # Creates the add, edit and delete item buttons, which call their respective functions when clicked
@@ -99,9 +106,7 @@ class itemWindow:
         config.app.enableMenu()
 
     def search(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol, %, to the end of the search value
-        search = '%' + str(self.searchVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFieldVar.get()
         if searchFieldVar == 'ItemID':
             searchField = 'itemID'
@@ -115,14 +120,20 @@ class itemWindow:
             searchField = 'supplierCost'
         elif searchFieldVar == 'SupplierID':
             searchField = 'supplierID'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchVar.get().strip():
+            loadDatabase(self.tree, 'itemTbl', False)
+            return
         # Clears the treeview of all other records
         self.tree.delete(*self.tree.get_children())
-        # Selects records from itemsTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM itemTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from itemsTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('itemTbl', self.searchVar.get(), searchField)
         for i in records:
             # Inserts all the records found into the treeview
-            self.tree.insert('', 0, values=(
+            self.tree.insert('', 'end', values=(
                 i[0], i[1], i[2], i[3], i[4], i[5]))
 
     def addItem(self):
@@ -173,7 +184,7 @@ class itemWindow:
             self.supplierIDVar = tk.StringVar()
             self.supplierIDDropdown = ttk.OptionMenu(self.addItemFrame, self.supplierIDVar, 'Select...', *supplierIDs,
                                                      command=lambda x: (
-                                                         self.supplierIDVar.set(self.supplierIDVar.get()[2:9])))
+                                                         self.supplierIDVar.set(recordID(self.supplierIDVar.get()))))
             # self.supplierIDVar.set('Select...')
             # Creates text variable and error label to output any errors
             self.errorVar = tk.StringVar()
@@ -226,23 +237,24 @@ class itemWindow:
             if salePriceValid and supplierCostValid and quantityValid:
                 # Checks that all fields have been entered
                 if itemName and supplierID != 'Select...':
-                    # Generates a random itemID, using the random module
-                    itemID = 'IT' + \
-                        str(''.join(['%s' % random.randint(0, 9)
-                            for num in range(0, 5)]))
                     # Comfirmation box asks user to confirm that inputs are all correct
-                    if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nItemID:\t\t' + itemID +
+                    if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                              'ItemID:\t\tAssigned on save' +
                                               '\nItem Name:\t' + itemName +
                                               '\nSale Price:\t£{:.2f}'.format(salePrice) +
                                               '\nQuantity:\t\t' + str(quantity) +
                                               '\nSupplier Cost:\t£{:.2f}'.format(supplierCost) +
                                               '\nSupplierID:\t' + supplierID):
                         try:
-                            # Insert record into itemsTbl
-                            executeSQL('INSERT INTO itemTbl VALUES (?,?,?,?,?,?)',
-                                       (itemID, itemName, salePrice, quantity, supplierCost, supplierID), False)
-                            # Reloads records into treeview
-                            loadDatabase(self.tree, 'itemTbl', False)
+                            # Allocates a new, unique itemID in the same transaction as the insert, so that
+                            # cancelling or a failed insert does not use one up
+                            with transaction():
+                                itemID = nextID('IT')
+                                # Insert record into itemsTbl
+                                executeSQL('INSERT INTO itemTbl VALUES (?,?,?,?,?,?)',
+                                           (itemID, itemName, salePrice, quantity, supplierCost, supplierID), False)
+                            # Shows the new record in the treeview
+                            upsertRow(self.tree, 'itemTbl', itemID)
                             # Destroys add item window and returns to view items window
                             enableWindow(self.itemWin, self.returnButton, self.addItemButton, self.editItemButton,
                                          self.delItemButton)
@@ -329,7 +341,7 @@ class itemWindow:
                 self.supplierIDDropdown = ttk.OptionMenu(self.editItemFrame, self.supplierIDVar, 'Select...',
                                                          *supplierIDs,
                                                          command=lambda x: (
-                                                             self.supplierIDVar.set(self.supplierIDVar.get()[2:9])))
+                                                             self.supplierIDVar.set(recordID(self.supplierIDVar.get()))))
                 self.supplierIDVar.set('Select...')
                 # Creates text variable and error label to output any errors
                 self.errorVar = tk.StringVar()
@@ -413,8 +425,8 @@ class itemWindow:
                         executeSQL('''UPDATE itemTbl SET itemName=?, salePrice=?, quantity=?, 
                                     supplierCost=?, supplierID=? WHERE itemID=?''',
                                    (itemName, salePrice, quantity, supplierCost, supplierID, itemID), False)
-                        # Reloads records into treeview, with updated values
-                        loadDatabase(self.tree, 'itemTbl', False)
+                        # Shows the updated record in the treeview
+                        upsertRow(self.tree, 'itemTbl', itemID)
                         # Destroys edit item window and returns to view items window
                         enableWindow(self.itemWin, self.returnButton, self.addItemButton, self.editItemButton,
                                      self.delItemButton)
@@ -436,14 +448,24 @@ class itemWindow:
             # Retreives the itemID from the record selected in the treeview
             for selected_item in self.tree.selection():
                 itemID = self.tree.set(selected_item, '#1')
-            # Asks the user for confimation that they want to permanently delete this record
-            if tk.messagebox.askokcancel('Delete', 'Are you sure you want to permanently delete this record?'):
-                for selected_item in self.tree.selection():
-                    # Removes the record from itemsTbl
-                    executeSQL('DELETE FROM itemTbl WHERE itemID=?',
-                               (itemID,), False)
-                    # Removes the record from the treeview
-                    self.tree.delete(selected_item)
+            # Items that have been sold are kept, as their orders refer to them
+            existsForeign = isReferenced('itemTbl', itemID)
+            if not existsForeign:
+                # Asks the user for confimation that they want to permanently delete this record
+                if tk.messagebox.askokcancel('Delete', 'Are you sure you want to permanently delete this record?'):
+                    try:
+                        # Removes the record from itemsTbl
+                        executeSQL('DELETE FROM itemTbl WHERE itemID=?',
+                                   (itemID,), False)
+                        # Removes the record from the treeview
+                        removeRow(self.tree, itemID)
+                    except sqlite3.IntegrityError:  # Sold on another till since it was checked
+                        tk.messagebox.showerror(
+                            'Error', 'Error: Record in use by other tables')
+            else:
+                # If itemID is a foreign key in other tables, output error as the record cannot be deleted
+                tk.messagebox.showerror(
+                    'Error', 'Error: Record in use by other tables')
         else:
             # Outputs error message is no record has been selected
             tk.messagebox.showerror('Error', 'No Record Selected')
@@ -1,16 +1,17 @@
-import bcrypt
 import tkinter as tk
 from tkinter import ttk
 
 from .. import config
-from ..sql import executeSQL
+from ..passwords import checkStaff, setPassword
 from ..utils import center
+from ..executor import submit
 
 
 class loginWin:
     # Creates login window
     def __init__(self, root):
         self.authenticated = False
+        self.checking = False
         self.root = root
         self.root.title('Login')
         self.root.iconbitmap(config.icon)
@@ -69,36 +70,40 @@ class loginWin:
         username = self.usernameVar.get()
         password = self.passwordVar.get()
 
+        # Ignores the login button/enter key while the last attempt is still being checked
+        if self.checking:
+            return
         # Checks that username and password aren't blank
         if username and password:
-            user = executeSQL(
-                'SELECT * FROM staffTbl WHERE staffID = ?', (username,), False)
-            # If a matching records is found, it drops into the following code
-            if user:
-                config.userID = username
+            # Hashing the password is deliberately slow, so it is checked in the background
+            self.checking = True
+            self.errorVar.set('')
+            submit(self.root, lambda task: checkStaff(username, password),
+                   done=lambda result: self.loggedIn(*result),
+                   error=lambda error: (setattr(self, 'checking', False), self.errorVar.set('Error: ' + str(error))))
+        else:
+            self.errorVar.set('Error: Please Fill all Fields')
+
+    def loggedIn(self, user, matched):
+        self.checking = False
+        # If a matching records is found, it drops into the following code
+        if user:
+            # If access level ‘x’ i.e. no longer have access to system, a suitable error message is output
+            if user[4] == 'x':
+                self.errorVar.set('Error: User has no access rights')
+            elif matched:
+                config.userID = user[0]
                 config.accessLevel = user[4]
                 config.fullName = user[2] + ' ' + user[1]
-                salt = user[6]
-                storedPass = user[5]
-                # If access level ‘x’ i.e. no longer have access to system, a suitable error message is output
-                if config.accessLevel == 'x':
-                    self.errorVar.set('Error: User has no access rights')
-                else:
-                    # Hashes the input password with the same salt as originally used
-                    hashedPass = bcrypt.hashpw(password.encode('utf-8'), salt)
-                    # Checks that hashed input password matches hashed stored password
-                    if hashedPass == storedPass:
-                        # Closes the window, sets Boolean var ‘authenticated’ to true, proceeding to the main menu
-                        self.closeWindow()
-                        self.authenticated = True
-                    else:
-                        self.errorVar.set(
-                            'Error: Incorrect\nUsername or Password')
-            # If no records matched, the errorVar text variable is set to a suitable error message
+                # Closes the window, sets Boolean var ‘authenticated’ to true, proceeding to the main menu
+                self.closeWindow()
+                self.authenticated = True
             else:
-                self.errorVar.set('Error: Incorrect\nUsername or Password')
+                self.errorVar.set(
+                    'Error: Incorrect\nUsername or Password')
+        # If no records matched, the errorVar text variable is set to a suitable error message
         else:
-            self.errorVar.set('Error: Please Fill all Fields')
+            self.errorVar.set('Error: Incorrect\nUsername or Password')
 
     # Creates password reset window
     def forgotPassword(self):
@@ -110,6 +115,8 @@ class loginWin:
                                                                                 lambda x: self.forgotPassword())))
         self.forgotPass.bind('<Button-1>', lambda x: self.passWin.lift())
         self.passWin.title('Password Reset')
+        # Set while a password is being checked or hashed in the background
+        self.adminChecking = False
         self.adminFrame = tk.Frame(self.passWin)
         # packs frame to window
         self.adminFrame.pack(side=tk.LEFT, expand=True)
@@ -176,36 +183,36 @@ class loginWin:
         # Retrieves admin username/password from form
         username = self.adminUsernameVar.get()
         password = self.adminPasswordVar.get()
-        # Fetches record with the same username as inputted
-        user = executeSQL(
-            'SELECT * FROM staffTbl WHERE staffID = ?', (username,), False)
-        if user:
+        if self.adminChecking:
+            return
+        # Fetches the record with the same username as inputted and checks the password in the background
+        self.adminChecking = True
+        self.adminErrorVar.set('')
+        submit(self.passWin, lambda task: checkStaff(username, password),
+               done=lambda result: self.adminLoggedIn(*result),
+               error=lambda error: (setattr(self, 'adminChecking', False),
+                                    self.adminErrorVar.set('Error: ' + str(error))))
+
+    def adminLoggedIn(self, user, matched):
+        self.adminChecking = False
+        if user and matched:
             adminAccessLevel = user[4]
             adminFullName = user[2] + ' ' + user[1]
-            storedPass = user[5]
-            salt = user[6]
-            # Hashes the password input with the salt saved in the record
-            password = bcrypt.hashpw(password.encode('utf-8'), salt)
-            # Compares the input hashed password with the stored hashed password
-            if password == storedPass:
-                # Checks if user has admin status i.e. access lvl. 3
-                if adminAccessLevel == 3:
-                    # Disables admin login frame
-                    self.loginButton['state'] = 'disabled'
-                    self.adminErrorLabel.config(fg='green')
-
-                    self.adminUsernameBox.config(state='readonly')
-                    self.adminPasswordBox.config(state='readonly')
-                    self.adminErrorVar.set('Logged in as ' + adminFullName)
-                    # Enables password change frame
-                    self.usernameBox.config(state='normal')
-                    self.passwordBox.config(state='normal')
-                    self.confirmButton['state'] = 'normal'
-                else:
-                    self.adminErrorVar.set('Error: Insufficient Access Level')
+            # Checks if user has admin status i.e. access lvl. 3
+            if adminAccessLevel == 3:
+                # Disables admin login frame
+                self.loginButton['state'] = 'disabled'
+                self.adminErrorLabel.config(fg='green')
+
+                self.adminUsernameBox.config(state='readonly')
+                self.adminPasswordBox.config(state='readonly')
+                self.adminErrorVar.set('Logged in as ' + adminFullName)
+                # Enables password change frame
+                self.usernameBox.config(state='normal')
+                self.passwordBox.config(state='normal')
+                self.confirmButton['state'] = 'normal'
             else:
-                self.adminErrorVar.set(
-                    'Error: Incorrect\nUsername or Password')
+                self.adminErrorVar.set('Error: Insufficient Access Level')
         else:
             self.adminErrorVar.set('Error: Incorrect\nUsername or Password')
 
@@ -213,23 +220,28 @@ class loginWin:
     def changePass(self):
         username = self.staffUsernameVar.get()
         password = self.newPasswordVar.get()
+        if self.adminChecking:
+            return
         if username and password:
-            user = executeSQL(
-                'SELECT * FROM staffTbl WHERE staffID = ?', (username,), False)
-            if user:
-                salt = user[6]
-                password = bcrypt.hashpw(password.encode('utf-8'), salt)
-                executeSQL(
-                    'UPDATE staffTbl SET password = ? WHERE staffID = ?', (password, username), False)
-                self.newPassErrorLabel.config(fg='green')
-                self.newPassErrorVar.set('Password Reset Successfully')
-            else:
-                self.newPassErrorLabel.config(fg='red')
-                self.newPassErrorVar.set('Error: User Not Found')
+            # The new password is hashed in the background
+            self.adminChecking = True
+            submit(self.passWin, lambda task: setPassword(username, password),
+                   done=self.passChanged,
+                   error=lambda error: (setattr(self, 'adminChecking', False), self.newPassErrorLabel.config(fg='red'),
+                                        self.newPassErrorVar.set('Error: ' + str(error))))
         else:
             self.newPassErrorLabel.config(fg='red')
             self.newPassErrorVar.set('Error: Enter Username\nand Password')
 
+    def passChanged(self, found):
+        self.adminChecking = False
+        if found:
+            self.newPassErrorLabel.config(fg='green')
+            self.newPassErrorVar.set('Password Reset Successfully')
+        else:
+            self.newPassErrorLabel.config(fg='red')
+            self.newPassErrorVar.set('Error: User Not Found')
+
     def closeWindow(self):
         # destroys the login window
         self.root.destroy()
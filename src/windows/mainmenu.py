@@ -3,15 +3,12 @@ from tkinter import ttk
 
 from .. import config
 from ..utils import accesslevel, center
+from ..sql import checkpoint
+from ..changes import poll, prune
+from ..executor import submit
 
-from .donation import donationWindow
-from .donor import donorWindow
-from .expenditure import expenditureWindow
-from .item import itemWindow
-from .order import orderWindow
-from .recipient import recipientWindow
-from .staff import staffWindow
-from .supplier import supplierWindow
+# Each window's module is imported when the window is first opened, rather than when the
+# program starts, as between them they load tkcalendar (with Babel's locale data) and fpdf
 
 
 class mainMenu:
@@ -53,6 +50,8 @@ class mainMenu:
                                                command=lambda: self.viewRecipients())
         self.viewExpendituresButton = ttk.Button(self.frame, text='View Expenditures',
                                                  command=lambda: self.viewExpenditures())
+        self.diagnosticsButton = ttk.Button(self.frame, text='Diagnostics',
+                                            command=lambda: self.viewDiagnostics())
         self.logoutButton = ttk.Button(
             self.frame, text='Logout', command=lambda: self.logout())
 
@@ -78,15 +77,34 @@ class mainMenu:
         self.viewRecipientsButton.grid(row=6, column=1, padx=(
             0, 10), ipadx=10, ipady=2, sticky='news')
         self.viewStaffButton.grid(row=7, column=0, padx=(
-            10, 0), pady=(0, 10), ipadx=10, ipady=2, sticky='news')
+            10, 0), ipadx=10, ipady=2, sticky='news')
         self.viewExpendituresButton.grid(row=7, column=1, padx=(
-            0, 10), pady=(0, 10), ipadx=10, ipady=2, sticky='news')
+            0, 10), ipadx=10, ipady=2, sticky='news')
+        self.diagnosticsButton.grid(row=8, column=0, columnspan=2, padx=10, pady=(
+            0, 10), ipadx=10, ipady=2, sticky='news')
 
         # Checks access level and disables relevant buttons
         accesslevel(2, self.donatButton, self.orderButton)
+        accesslevel(3, self.diagnosticsButton)
+        # Checkpoints the database every few minutes while the program is open,
+        # and checks every second or so for changes made by other tills
+        self.root.after(config.checkpointInterval, self.checkpoint)
+        self.root.after(config.changePoll, self.pollChanges)
 
         center(self.root)
 
+    def checkpoint(self):
+        # Copies the write-ahead log back into the database on a worker thread, so tills are not slowed
+        # down by it. If it fails (e.g. the database is busy), it is simply tried again next time.
+        # Old changes are deleted from the change log first, so their pages can be reused.
+        submit(self.root, lambda task: (prune(), checkpoint()), error=lambda error: None)
+        self.root.after(config.checkpointInterval, self.checkpoint)
+
+    def pollChanges(self):
+        # Shows any changes other tills have made in the windows that are open
+        poll()
+        self.root.after(config.changePoll, self.pollChanges)
+
     def logout(self):
         # Creates dialogue box to confirm whether the user wants to logout of the system
         if tk.messagebox.askyesno('Logout', 'Are you sure you want to logout?', icon='warning'):
@@ -106,18 +124,21 @@ class mainMenu:
 
     def viewStaff(self):
         # Hides the main menu and creates the view staff window as a toplevel window
+        from .staff import staffWindow
         self.disableMenu()
         self.staffRoot = tk.Toplevel(self.root)
         self.createstaffWindow = staffWindow(self.staffRoot)
 
     def viewDonors(self):
         # Hides the main menu and creates the view donor window as a toplevel window
+        from .donor import donorWindow
         self.disableMenu()
         self.donorRoot = tk.Toplevel(self.root)
         self.createDonorWindow = donorWindow(self.donorRoot)
 
     def newDonat(self):
         # Hides the main menu and opens the view donation window, as well as the add new donation form
+        from .donation import donationWindow
         self.disableMenu()
         self.donationRoot = tk.Toplevel(self.root)
         self.createDonationWindow = donationWindow(self.donationRoot)
@@ -125,24 +146,28 @@ class mainMenu:
 
     def viewDonations(self):
         # Hides the main menu and creates the view donation window as a toplevel window
+        from .donation import donationWindow
         self.disableMenu()
         self.donationRoot = tk.Toplevel(self.root)
         self.createDonationWindow = donationWindow(self.donationRoot)
 
     def viewSuppliers(self):
         # Hides the main menu and creates the view supplier window as a toplevel window
+        from .supplier import supplierWindow
         self.disableMenu()
         self.supplierRoot = tk.Toplevel(self.root)
         self.createSupplierWindow = supplierWindow(self.supplierRoot)
 
     def viewItems(self):
         # Hides the main menu and creates the view items window as a toplevel window
+        from .item import itemWindow
         self.disableMenu()
         self.itemRoot = tk.Toplevel(self.root)
         self.createItemWindow = itemWindow(self.itemRoot)
 
     def newOrder(self):
         # Hides the main menu and opens the view order window, as well as the add new order form
+        from .order import orderWindow
         self.disableMenu()
         self.orderRoot = tk.Toplevel(self.root)
         self.createOrderWindow = orderWindow(self.orderRoot)
@@ -150,18 +175,28 @@ class mainMenu:
 
     def viewOrders(self):
         # Hides the main menu and creates the view orders window as a toplevel window
+        from .order import orderWindow
         self.disableMenu()
         self.orderRoot = tk.Toplevel(self.root)
         self.createOrderWindow = orderWindow(self.orderRoot)
 
     def viewRecipients(self):
         # Hides the main menu and creates the view recipients window as a toplevel window
+        from .recipient import recipientWindow
         self.disableMenu()
         self.recipientRoot = tk.Toplevel(self.root)
         self.createRecipientWindow = recipientWindow(self.recipientRoot)
 
     def viewExpenditures(self):
         # Hides the main menu and creates the view expenditures window as a toplevel window
+        from .expenditure import expenditureWindow
         self.disableMenu()
         self.expenditureRoot = tk.Toplevel(self.root)
         self.createExpenditureWindow = expenditureWindow(self.expenditureRoot)
+
+    def viewDiagnostics(self):
+        # Hides the main menu and creates the diagnostics window as a toplevel window
+        from .diagnostics import diagnosticsWindow
+        self.disableMenu()
+        self.diagnosticsRoot = tk.Toplevel(self.root)
+        self.createDiagnosticsWindow = diagnosticsWindow(self.diagnosticsRoot)
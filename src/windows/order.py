@@ -2,13 +2,19 @@ import tkinter as tk
 from tkinter import ttk
 from tkcalendar import DateEntry
 from datetime import datetime
-import random
 import sqlite3
+from collections import Counter
 
 from .. import config
-from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center
-from ..sql import loadDatabase, executeSQL
-from ..report import orderReport
+from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center, insertRows, recordID
+from ..sql import loadDatabase, executeSQL, transaction, upsertRow, removeRow
+from ..export import exportMenu, exportReport
+from ..ids import nextID
+from ..search import searchTable
+from ..report import orderReport, revenueRows, reportSaved, reportFailed
+from ..orders import cart, saveOrder, updateOrder, deleteOrders, OutOfStock
+from ..totals import revenueTotals
+from ..executor import submit
 
 from .customer import customerWindow
 
@@ -36,7 +42,7 @@ class orderWindow:
         # Creates a dropdown menu, with all the fields listed to search, set to orderID by default
         self.searchFieldVar = tk.StringVar()
         self.searchField = ttk.OptionMenu(self.frame, self.searchFieldVar, 'OrderNo', 'OrderNo', 'CustomerID',
-                                          'OrderTotal', 'Date', 'StaffID')
+                                          'OrderTotal', 'Date', 'StaffID', 'All Fields')
         # Creates a 'search' button, which calls the search function when pressed
         self.searchButton = ttk.Button(
             self.frame, text='Search', command=lambda: self.search())
@@ -65,6 +71,8 @@ class orderWindow:
             self.tree.column(col, width=100, minwidth=100)
             self.tree.heading(col, text=col, command=lambda _col=col: treeview_sort_column(
                 self.tree, _col, False))
+        # Search results are sorted by order total as a number, not as text
+        self.tree.columnTypes = {'OrderTotal': float}
         self.tree.grid(row=2, column=0, sticky='nesw', rowspan=3,
                        columnspan=3, padx=(10, 0), pady=(10, 0))
         self.frame.columnconfigure(1, weight=1)  # column with treeview
@@ -73,14 +81,18 @@ class orderWindow:
         self.scrollbar = ttk.Scrollbar(
             self.frame, orient='vertical', command=self.tree.yview)
         self.scrollbar.grid(row=2, column=3, sticky='ns', rowspan=3, pady=10)
+        # Several orders can be selected (with shift/ctrl) to delete them together
         self.tree.configure(
-            yscrollcommand=self.scrollbar.set, selectmode='browse')
+            yscrollcommand=self.scrollbar.set, selectmode='extended')
         self.xscrollbar = ttk.Scrollbar(
             self.frame, orient='horizontal', command=self.tree.xview)
         self.xscrollbar.grid(row=5, column=0, sticky='ew',
                              columnspan=4, pady=(0, 10))
+        # Creates an 'Export' button, to save the whole table to a file without loading it here
+        self.exportButton = exportMenu(self.frame, [('Orders', 'orderTbl'), ('Order Items', 'orderItemTbl')])
+        self.exportButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.tree.configure(
-            xscrollcommand=self.xscrollbar.set, selectmode='browse')
+            xscrollcommand=self.xscrollbar.set, selectmode='extended')
         # Creates the add, edit and delete order buttons, which call their respective functions when clicked
         self.addOrderButton = ttk.Button(
             self.frame, text='Add Order', command=lambda: self.addOrder())
@@ -115,9 +127,7 @@ class orderWindow:
         config.app.enableMenu()
 
     def search(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol, %, to the end of the search value
-        search = '%' + str(self.searchVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFieldVar.get()
         if searchFieldVar == 'OrderNo':
             searchField = 'orderNo'
@@ -129,25 +139,34 @@ class orderWindow:
             searchField = 'date'
         elif searchFieldVar == 'StaffID':
             searchField = 'staffID'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchVar.get().strip():
+            loadDatabase(self.tree, 'orderTbl', False)
+            return
         # Clears the treeview of all other records
         self.tree.delete(*self.tree.get_children())
-        # Selects records from orderTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM orderTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from orderTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('orderTbl', self.searchVar.get(), searchField)
         for i in records:
             # Inserts all the records found into the treeview
-            self.tree.insert('', 0, values=(i[0], i[1], i[2], i[3], i[4]))
+            self.tree.insert('', 'end', values=(i[0], i[1], i[2], i[3], i[4]))
 
     def addOrder(self):
-        # count used for how many items are added to order
-        self.itemIDs = []
+        # The items in the order, and the widgets showing each of them.
+        # count is used to grid each item's widgets on a new row
+        self.cart = cart()
+        self.cartRows = {}
         self.count = 0
-        self.total = 0
+        self.originalItems = Counter()
         disableWindow(self.reportButton, self.returnButton, self.addOrderButton, self.editOrderButton,
                       self.delOrderButton)
         # Selects all customerIDs, forenames and surnames, and saves them to a list
         customers = executeSQL(
-            'SELECT customerID,customerForename,customerSurname FROM customerTbl', (), True)
+            'SELECT customerID,customerForename,customerSurname FROM customerTbl WHERE customerID != ?',
+            ('Anonymous',), True)
         customerIDs = [(item[0:3]) for item in customers]
         self.orderWin = tk.Toplevel(self.root)
         self.orderWin.lift(self.root)
@@ -171,7 +190,7 @@ class orderWindow:
         if customerIDs:
             self.customerIDDropdown = ttk.OptionMenu(self.addOrderFrame, self.customerIDVar, 'Anonymous', *customerIDs,
                                                      command=lambda x: (
-                                                         self.customerIDVar.set(self.customerIDVar.get()[2:9])))
+                                                         self.customerIDVar.set(recordID(self.customerIDVar.get()))))
         else:
             self.customerIDDropdown = tk.Label(
                 self.addOrderFrame, textvariable=self.customerIDVar, font='none 11')
@@ -181,7 +200,7 @@ class orderWindow:
         self.dateVar = tk.StringVar()
         # Creates a calendar widget to pick the date from
         self.calendar = DateEntry(self.addOrderFrame, state='readonly',
-                                  date_pattern='DD/MM/YYYY', textvariable=self.dateVar,
+                                  date_pattern=config.datePattern, textvariable=self.dateVar,
                                   showweeknumbers=False, maxdate=datetime.today())
 
         # Creates canvas to put all items on
@@ -191,7 +210,7 @@ class orderWindow:
         self.canvasScroll = ttk.Scrollbar(
             self.addOrderFrame, orient='vertical', command=self.canvas.yview)
         self.canvas.configure(
-            yscrollcommand=self.canvasScroll.set, width=200, height=150)
+            yscrollcommand=self.canvasScroll.set, width=250, height=150)
         self.canvas.grid(row=3, column=0, columnspan=2, sticky='ns')
         self.canvasScroll.grid(row=3, column=3, sticky='ns')
         self.canvas.create_window(
@@ -265,14 +284,14 @@ class orderWindow:
         self.addedLabel.grid(row=3, column=0, sticky='s', pady=(0, 10))
         self.label.grid(row=0, column=0, sticky='n', pady=(10, 0))
 
-        loadDatabase(self.itemTree, 'itemTbl', False)
+        loadDatabase(self.itemTree, 'itemTbl', False, values=self.stockLeft)
 
         center(self.orderWin)
 
     def addItemToOrder(self):
         if self.itemTree.selection():
             # Retrieves all item details from the treeview
-            item = self.itemTree.selection()
+            item = self.itemTree.selection()[0]
             itemID = self.itemTree.set(item, '#1')
             itemName = self.itemTree.set(item, '#2')
             salePrice = float(self.itemTree.set(item, '#3'))
@@ -282,96 +301,110 @@ class orderWindow:
                 self.addedLabel.config(fg='red')
                 self.addedVar.set(itemName + ' Not In Stock')
                 return
-            # Count is used to grid labels without any overlapping
-            self.count += 1
-            # Adds item to list of all items in order
-            self.itemIDs.append([itemID, itemName])
-            # Decrements quantity in treeview
-            newQuantity = quantity - 1
-            self.itemTree.set(item, column=3, value=newQuantity)
-            # Creates labels/buttons (to remove the item) and grids them to the frame with all other items in order
-            itemNameLabel = tk.Label(self.allItemsFrame, text=(
-                itemID + ' ' + itemName), font='none 11', wraplength=125)
-            priceLabel = tk.Label(self.allItemsFrame, text=(
-                str('£{:.2f}'.format(salePrice))), font='none 11')
-            removeItemLabel = tk.Label(
-                self.allItemsFrame, text='x', fg='red', cursor='hand2')
-            removeItemLabel.bind('<Button-1>',
-                                 lambda x: self.removeItem(item, itemID, itemName, itemNameLabel, priceLabel,
-                                                           removeItemLabel, salePrice))
-            itemNameLabel.grid(row=self.count, column=0,
-                               sticky='W', padx=(10, 0))
-            priceLabel.grid(row=self.count, column=1, sticky='E')
-            removeItemLabel.grid(row=self.count, column=2,
-                                 sticky='E', padx=(0, 10))
-            # Alters the total price to reflect the added item
-            self.total += salePrice
-            self.totalVar.set(str('Total: £{:.2f}'.format(self.total)))
+            if itemID in self.cart:
+                # Adds one more of an item already in the order
+                self.setQuantity(itemID, self.cart.quantity(itemID) + 1)
+            else:
+                # The treeview shows the stock left after this order, so all of it is available
+                self.addCartRow(itemID, itemName, salePrice, 1, quantity)
             # Outputs message confirming addition of item
             self.addedLabel.config(fg='green')
             self.addedVar.set(itemName + ' Added to Order')
 
-    def removeItem(self, item, itemID, itemName, itemNameLabel, priceLabel, removeItemLabel, salePrice):
-        # Ungrids all labels/buttons related to that item from the frame
-        itemNameLabel.grid_remove()
-        priceLabel.grid_remove()
-        removeItemLabel.grid_remove()
-        quantity = int(self.itemTree.set(item, '#4'))
-        # Alters the total price to reflect the removed item
-        self.total -= salePrice
-        self.totalVar.set(str('Total: £{:.2f}'.format(self.total)))
-        # Increments the item quantity in the item treeview
-        self.itemTree.set(item, column=3, value=(quantity + 1))
-        # Removes the item from the list of items
-        self.itemIDs.remove([itemID, itemName])
+    # Adds an item to the order, with a row of widgets showing its name, price and quantity,
+    # and a button to remove it. available is the most of the item that can be ordered.
+    def addCartRow(self, itemID, itemName, salePrice, quantity, available):
+        self.count += 1
+        quantityVar = tk.StringVar()
+        itemNameLabel = tk.Label(self.allItemsFrame, text=(
+            itemID + ' ' + itemName), font='none 11', wraplength=125)
+        priceLabel = tk.Label(self.allItemsFrame, font='none 11')
+        # Spinner to change the quantity. Enter sets the quantity typed, rather than saving the order.
+        quantityBox = ttk.Spinbox(self.allItemsFrame, from_=1, to=available, width=4, textvariable=quantityVar,
+                                  command=lambda: self.changeQuantity(itemID))
+        quantityBox.bind('<Return>', lambda x: (self.changeQuantity(itemID), 'break')[1])
+        quantityBox.bind('<FocusOut>', lambda x: self.changeQuantity(itemID))
+        removeItemLabel = tk.Label(
+            self.allItemsFrame, text='x', fg='red', cursor='hand2')
+        removeItemLabel.bind('<Button-1>', lambda x: self.removeItem(itemID))
+        itemNameLabel.grid(row=self.count, column=0, sticky='W', padx=(10, 0))
+        priceLabel.grid(row=self.count, column=1, sticky='E')
+        quantityBox.grid(row=self.count, column=2, padx=5)
+        removeItemLabel.grid(row=self.count, column=3,
+                             sticky='E', padx=(0, 10))
+        self.cartRows[itemID] = (itemName, salePrice, available, quantityVar,
+                                 (itemNameLabel, priceLabel, quantityBox, removeItemLabel))
+        self.setQuantity(itemID, quantity)
+
+    # Reads the quantity typed into an item's spinner, keeping it within the stock available
+    def changeQuantity(self, itemID):
+        if itemID not in self.cartRows:
+            return
+        itemName, salePrice, available, quantityVar, widgets = self.cartRows[itemID]
+        try:
+            quantity = int(quantityVar.get())
+        except ValueError:
+            quantity = self.cart.quantity(itemID)
+        self.setQuantity(itemID, max(1, min(quantity, available)))
+
+    # Sets the quantity of an item in the order, updating its row, the total and the stock shown
+    def setQuantity(self, itemID, quantity):
+        itemName, salePrice, available, quantityVar, widgets = self.cartRows[itemID]
+        quantity = min(quantity, available)
+        self.cart.set(itemID, itemName, salePrice, quantity)
+        quantityVar.set(quantity)
+        widgets[1].config(text=str('£{:.2f}'.format(salePrice * quantity)))
+        self.totalVar.set(str('Total: £{:.2f}'.format(self.cart.total)))
+        # Shows the stock left once this order is saved in the item treeview
+        if self.itemTree.exists(itemID):
+            self.itemTree.set(itemID, column=3, value=available - quantity)
+
+    def removeItem(self, itemID):
+        itemName, salePrice, available, quantityVar, widgets = self.cartRows.pop(itemID)
+        # Removes all labels/buttons related to that item from the frame
+        for widget in widgets:
+            widget.destroy()
+        self.cart.remove(itemID)
+        self.totalVar.set(str('Total: £{:.2f}'.format(self.cart.total)))
+        # Puts the item's stock back in the item treeview
+        if self.itemTree.exists(itemID):
+            self.itemTree.set(itemID, column=3, value=available)
         # Outputs message confirming removal of item
         self.addedLabel.config(fg='red')
         self.addedVar.set(itemName + ' Removed from Order')
 
     def saveOrder(self):
-        if self.itemIDs:
+        if self.cart:
             customerID = self.customerIDVar.get()
             date = self.dateVar.get()
 
-            itemNames = [self.itemIDs[x][1] for x in range(len(self.itemIDs))]
-            # Generates a random orderID, using the random module
-            orderNo = 'ON' + \
-                str(''.join(['%s' % random.randint(0, 9)
-                    for num in range(0, 5)]))
+            itemNames = self.cart.lines()
             # Comfirmation box asks user to confirm that inputs are all correct
-            if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nOrderNo:\t' +
-                                      orderNo + '\nCustomerID:\t' + customerID + '\nDate:\t\t' +
+            if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                      'OrderNo:\tAssigned on save' +
+                                      '\nCustomerID:\t' + customerID + '\nDate:\t\t' +
                                       date + '\nStaffID\t\t' + config.userID + '\nItems:\t\t' +
                                       '\n\t\t'.join(itemNames) +
-                                      '\nTotal:\t\t£' + str('{:.2f}'.format(self.total))):
+                                      '\nTotal:\t\t£' + str('{:.2f}'.format(self.cart.total))):
                 try:
-                    itemSaved = []
-                    # Insert record into orderTbl
-                    executeSQL('INSERT INTO orderTbl VALUES (?,?,?,?,?)',
-                               (orderNo, customerID, '{:.2f}'.format(self.total), date, config.userID), False)
-                    for item in self.itemIDs:
-                        oldQuantity = executeSQL(
-                            'SELECT quantity FROM itemTbl WHERE itemID = ?', (item[0],), False)[0]
-                        executeSQL('UPDATE itemTbl SET quantity = ? WHERE itemID = ?', (oldQuantity - 1, item[0]),
-                                   False)
-                        if item[0] not in itemSaved:
-                            executeSQL(
-                                'INSERT INTO orderItemTbl VALUES (?,?,?)', (orderNo, item[0], 1), False)
-                            itemSaved.append(item[0])
-                        else:
-                            lastQuantity = \
-                                executeSQL('SELECT quantity FROM orderItemTbl WHERE itemID = ? AND orderNo = ?',
-                                           (item[0], orderNo), False)[0]
-                            executeSQL('UPDATE orderItemTbl SET quantity = ? WHERE itemID = ? AND orderNo = ?',
-                                       (lastQuantity + 1, item[0], orderNo), False)
-                    # Reloads records into treeview
-                    loadDatabase(self.tree, 'orderTbl', False)
+                    # Allocates a new, unique orderNo in the same transaction as the order is saved in, so
+                    # that cancelling or an order refused for lack of stock does not use one up
+                    with transaction():
+                        orderNo = nextID('ON')
+                        # Saves the order and takes its items out of stock
+                        saveOrder(orderNo, customerID, self.cart.total, date, config.userID, self.cart.quantities())
+                    # Shows the new record in the treeview
+                    upsertRow(self.tree, 'orderTbl', orderNo)
                     # Destroys add order window and returns to view orders window
                     enableWindow(self.orderWin, self.reportButton, self.returnButton, self.addOrderButton,
                                  self.editOrderButton, self.delOrderButton)
                     accesslevel(2, self.addOrderButton, self.editOrderButton)
                     accesslevel(3, self.delOrderButton)
                     tk.messagebox.showinfo('Success!', 'New Order Saved')
+                except OutOfStock as error:
+                    # Outputs error if another till has sold the stock since it was shown
+                    itemNames = [self.cart.items[itemID][0] for itemID in error.items]
+                    self.errorVar.set('Error: Not Enough Stock of\n' + ', '.join(itemNames))
                 except sqlite3.IntegrityError:
                     # Outputs error if orderID is not unique
                     self.errorVar.set(
@@ -390,11 +423,11 @@ class orderWindow:
                                     False)
                 orderNo = orders[0]
                 customerID = orders[1]
-                self.total = orders[2]
                 date = orders[3]
             # Selects all customerIDs, forenames and surnames, and saves them to a list
             customers = executeSQL(
-                'SELECT customerID,customerForename,customerSurname FROM customerTbl', (), True)
+                'SELECT customerID,customerForename,customerSurname FROM customerTbl WHERE customerID != ?',
+                ('Anonymous',), True)
             customerIDs = [(item[0:3]) for item in customers]
             self.orderWin = tk.Toplevel(self.root)
             self.orderWin.title('Edit Order')
@@ -419,7 +452,8 @@ class orderWindow:
                 self.customerIDDropdown = ttk.OptionMenu(self.editOrderFrame, self.customerIDVar, customerID,
                                                          *customerIDs,
                                                          command=lambda x: (
-                                                             self.customerIDVar.set(self.customerIDVar.get()[2:9])))
+                                                             self.customerIDVar.set(recordID(
+                                                                 self.customerIDVar.get()))))
             else:
                 self.customerIDDropdown = tk.Label(
                     self.editOrderFrame, textvariable=self.customerIDVar, font='none 11')
@@ -429,7 +463,7 @@ class orderWindow:
             self.dateVar = tk.StringVar()
             # Creates a calendar widget to pick the date from
             self.calendar = DateEntry(self.editOrderFrame, state='readonly',
-                                      date_pattern='DD/MM/YYYY', textvariable=self.dateVar,
+                                      date_pattern=config.datePattern, textvariable=self.dateVar,
                                       showweeknumbers=False, maxdate=datetime.today())
             self.dateVar.set(date)
 
@@ -438,7 +472,7 @@ class orderWindow:
             self.canvasScrolly = ttk.Scrollbar(
                 self.editOrderFrame, orient='vertical', command=self.canvas.yview)
             self.canvas.configure(
-                yscrollcommand=self.canvasScrolly.set, width=200, height=150)
+                yscrollcommand=self.canvasScrolly.set, width=250, height=150)
             self.canvas.grid(row=3, column=0, columnspan=2, sticky='ns')
             self.canvasScrolly.grid(row=3, column=3, sticky='ns')
             self.canvas.create_window(
@@ -451,7 +485,7 @@ class orderWindow:
             self.editOrderFrame.rowconfigure(3, weight=1)  # row with canvas
 
             self.totalVar = tk.StringVar()
-            self.totalVar.set(str('Total: £{:.2f}'.format(self.total)))
+            self.totalVar.set(str('Total: £{:.2f}'.format(0)))
             self.totalLabel = tk.Label(
                 self.editOrderFrame, textvariable=self.totalVar, font='none 11 bold')
             # Creates text variable and error label to output any errors
@@ -516,118 +550,66 @@ class orderWindow:
             self.addedLabel.grid(row=3, column=0, sticky='s', pady=(0, 10))
             self.label.grid(row=0, column=0, sticky='n', pady=(10, 0))
 
-            loadDatabase(self.itemTree, 'itemTbl', False)
+            self.cart = cart()
+            self.cartRows = {}
+            self.count = 0
+            self.originalItems = Counter()
+            # The order's items are added once the item treeview has loaded
+            loadDatabase(self.itemTree, 'itemTbl', False, lambda: self.addOrderItems(orderNo), self.stockLeft)
 
             center(self.orderWin)
 
-            itemIDQuantity = executeSQL(
-                'SELECT itemID,quantity FROM orderItemTbl WHERE orderNo = ?', (orderNo,), True)
-            self.count = 0
-            self.itemIDs = []
-            for item in itemIDQuantity:
-                items = executeSQL(
-                    'SELECT * FROM itemTbl WHERE itemID = ?', (item[0],), False)
-                for x in range(item[1]):
-                    listOfEntriesInTreeView = self.itemTree.get_children()
-                    for row in listOfEntriesInTreeView:
-                        if self.itemTree.set(row, '#1') == items[0]:
-                            selected = row
-
-                    self.addOldItemsToOrder(items, selected)
-            self.originalItems = list(self.itemIDs)
-
         else:
             # Outputs error message is no record has been selected
             tk.messagebox.showerror('Error', 'No Record Selected')
 
-    def addOldItemsToOrder(self, items, item):
-        # Goes through all items in original order, adding them to the list of all items and prices in the order,
-        # as well as creating labels and buttons to remove it from the order
-        itemID = items[0]
-        itemName = items[1]
-        salePrice = items[2]
-        self.count += 1
-        self.itemIDs.append([itemID, itemName])
-
-        itemNameLabel = tk.Label(self.allItemsFrame, text=(
-            itemID + ' ' + itemName), font='none 11', wraplength=125)
-        priceLabel = tk.Label(self.allItemsFrame, text=(
-            str('£{:.2f}'.format(salePrice))), font='none 11')
-        removeItemLabel = tk.Label(
-            self.allItemsFrame, text='x', fg='red', cursor='hand2')
-        removeItemLabel.bind('<Button-1>', lambda x: self.removeItem(item, itemID, itemName, itemNameLabel, priceLabel,
-                                                                     removeItemLabel, salePrice))
-        itemNameLabel.grid(row=self.count, column=0, sticky='W', padx=(10, 0))
-        priceLabel.grid(row=self.count, column=1, sticky='E')
-        removeItemLabel.grid(row=self.count, column=2,
-                             sticky='E', padx=(0, 10))
+    def addOrderItems(self, orderNo):
+        # Selects each of the order's items along with the number in the order, in one query
+        orderItems = executeSQL('''SELECT itemTbl.itemID, itemTbl.itemName, itemTbl.salePrice, itemTbl.quantity,
+                                          orderItemTbl.quantity
+                                   FROM orderItemTbl JOIN itemTbl ON itemTbl.itemID = orderItemTbl.itemID
+                                   WHERE orderItemTbl.orderNo = ?''', (orderNo,), True)
+        for itemID, itemName, salePrice, stock, quantity in orderItems:
+            # The items already in the order can be kept, as well as the stock left. Items
+            # on pages not loaded yet show the stock left once they are scrolled to.
+            self.addCartRow(itemID, itemName, salePrice, quantity, stock + quantity)
+        self.originalItems = self.cart.quantities()
+
+    # Returns the values to show for an item in the item treeview, with the stock left once
+    # the order is saved, i.e. less the number in the order (or more, if fewer than before)
+    def stockLeft(self, values):
+        itemID = values[0]
+        left = values[3] - self.cart.quantity(itemID) + self.originalItems[itemID]
+        return values[:3] + (left,) + values[4:]
 
     def saveEditOrder(self, orderNo):
-        # Creates a list of all the new items in the order
-        temp = list(self.originalItems)
-        newItems = []
-        for x in self.itemIDs:
-            if x not in temp:
-                newItems.append(x)
-            else:
-                temp.remove(x)
-
-        # Creates a list of all items removed from the order
-        temp = list(self.itemIDs)
-        removedItems = []
-        for x in self.originalItems:
-            if x not in temp:
-                removedItems.append(x)
-            else:
-                temp.remove(x)
-
-        if self.itemIDs:
+        if self.cart:
             customerID = self.customerIDVar.get()
             date = self.dateVar.get()
 
-            itemNames = [self.itemIDs[x][1] for x in range(len(self.itemIDs))]
+            itemNames = self.cart.lines()
             # Comfirmation box asks user to confirm that inputs are all correct
             if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nOrderNo:\t' +
                                       orderNo + '\nCustomerID:\t' + customerID + '\nDate:\t\t' +
                                       date + '\nStaffID\t\t' + config.userID + '\nItems:\t\t' +
                                       '\n\t\t'.join(itemNames) +
-                                      '\nTotal:\t\t£' + str('{:.2f}'.format(self.total))):
+                                      '\nTotal:\t\t£' + str('{:.2f}'.format(self.cart.total))):
                 try:
-                    # Update record in orderTbl
-                    executeSQL('UPDATE orderTbl SET customerID = ?, orderTotal = ?, date = ? WHERE orderNo = ?',
-                               (customerID, '{:.2f}'.format(self.total), date, orderNo), False)
-                    executeSQL(
-                        'DELETE FROM orderItemTbl WHERE orderNo=?', (orderNo,), False)
-                    for item in removedItems:
-                        oldQuantity = executeSQL(
-                            'SELECT quantity FROM itemTbl WHERE itemID = ?', (item[0],), False)[0]
-                        executeSQL('UPDATE itemTbl SET quantity = ? WHERE itemID = ?', (oldQuantity + 1, item[0]),
-                                   False)
-                    for item in newItems:
-                        oldQuantity = executeSQL(
-                            'SELECT quantity FROM itemTbl WHERE itemID = ?', (item[0],), False)[0]
-                        executeSQL('UPDATE itemTbl SET quantity = ? WHERE itemID = ?', (oldQuantity - 1, item[0]),
-                                   False)
-                    itemSaved = []
-                    for item in self.itemIDs:
-                        if item[0] not in itemSaved:
-                            executeSQL(
-                                'INSERT INTO orderItemTbl VALUES (?,?,?)', (orderNo, item[0], 1), False)
-                            itemSaved.append(item[0])
-                        else:
-                            oldQuantity = \
-                                executeSQL('SELECT quantity FROM orderItemTbl WHERE itemID = ? AND orderNo = ?',
-                                           (item[0], orderNo), False)[0]
-                            executeSQL('UPDATE orderItemTbl SET quantity = ? WHERE itemID = ? AND orderNo = ?',
-                                       (oldQuantity + 1, item[0], orderNo), False)
-                    # Reloads records into treeview
-                    loadDatabase(self.tree, 'orderTbl', False)
+                    # Adjusts stock by the change in each item's quantity, in one transaction
+                    updateOrder(orderNo, customerID, self.cart.total, date, self.originalItems,
+                                self.cart.quantities())
+                    # Shows the updated record in the treeview
+                    upsertRow(self.tree, 'orderTbl', orderNo)
                     # Destroys edit order window and returns to view orders window
                     enableWindow(self.orderWin, self.reportButton, self.returnButton, self.addOrderButton,
                                  self.editOrderButton, self.delOrderButton)
                     accesslevel(2, self.addOrderButton, self.editOrderButton)
                     accesslevel(3, self.delOrderButton)
                     tk.messagebox.showinfo('Success!', 'Order Updated')
+                except OutOfStock as error:
+                    # Outputs error if another till has sold the stock since it was shown
+                    itemNames = [self.cart.items[itemID][0] for itemID in error.items]
+                    self.errorVar.set('Error: Not Enough Stock of\n' + ', '.join(itemNames))
                 except sqlite3.IntegrityError:
                     # Outputs error if orderID is not unique
                     self.errorVar.set(
@@ -638,27 +620,18 @@ class orderWindow:
 
     def delOrder(self):
         if self.tree.selection():
-            # Retrieves the orderID from the record selected in the treeview
-            for selected_item in self.tree.selection():
-                orderNo = self.tree.set(selected_item, '#1')
-            # Asks the user for confimation that they want to permanently delete this record
-            if tk.messagebox.askokcancel('Delete', '''Are you sure you want to permanently delete this record?
-                                        \nNote: This will increase the quantity of items in stock'''):
-                for selected_item in self.tree.selection():
-                    # Removes the record from orderTbl
-                    executeSQL('DELETE FROM orderTbl WHERE orderNo=?',
-                               (orderNo,), False)
-                    items = executeSQL(
-                        'SELECT itemID,quantity FROM orderItemTbl WHERE orderNo = ?', (orderNo,), True)
-                    for item in items:
-                        oldQuantity = executeSQL(
-                            'SELECT quantity FROM itemTbl WHERE itemID = ?', (item[0],), False)[0]
-                        executeSQL('UPDATE itemTbl SET quantity = ? WHERE itemID = ?', (oldQuantity + item[1], item[0]),
-                                   False)
-                    executeSQL(
-                        'DELETE FROM orderItemTbl WHERE orderNo=?', (orderNo,), False)
-                    # Removes the record from the treeview
-                    self.tree.delete(selected_item)
+            # Retrieves the orderIDs of all the records selected in the treeview
+            selected = self.tree.selection()
+            orderNos = [self.tree.set(selected_item, '#1') for selected_item in selected]
+            records = 'this record' if len(orderNos) == 1 else 'these {} records'.format(len(orderNos))
+            # Asks the user for confimation that they want to permanently delete the records
+            if tk.messagebox.askokcancel('Delete', '''Are you sure you want to permanently delete {}?
+                                        \nNote: This will increase the quantity of items in stock'''.format(records)):
+                # Removes the orders and restores their stock as one transaction
+                deleteOrders(orderNos)
+                # Removes the records from the treeview
+                for orderNo in orderNos:
+                    removeRow(self.tree, orderNo)
         else:
             # Outputs error message is no record has been selected
             tk.messagebox.showerror('Error', 'No Record Selected')
@@ -684,13 +657,13 @@ class orderWindow:
             self.orderReportFrame, text='Start Date:', font='none 11')
         self.startDateVar = tk.StringVar()
         self.startCalendar = DateEntry(self.orderReportFrame, state='readonly',
-                                       date_pattern='DD/MM/YYYY', textvariable=self.startDateVar,
+                                       date_pattern=config.datePattern, textvariable=self.startDateVar,
                                        showweeknumbers=False, maxdate=datetime.today())
         self.endDateLabel = tk.Label(
             self.orderReportFrame, text='End Date:', font='none 11')
         self.endDateVar = tk.StringVar()
         self.endCalendar = DateEntry(self.orderReportFrame, state='readonly',
-                                     date_pattern='DD/MM/YYYY', textvariable=self.endDateVar,
+                                     date_pattern=config.datePattern, textvariable=self.endDateVar,
                                      showweeknumbers=False, maxdate=datetime.today())
         # Creates a text variable and error label to output any errors to
         self.errorVar = tk.StringVar()
@@ -716,9 +689,9 @@ class orderWindow:
         try:
             # Retrieves the start and end dates entered from the form
             self.startDate = datetime.strptime(
-                self.startDateVar.get().strip(), '%d/%m/%Y')
+                self.startDateVar.get().strip(), config.dateFormat)
             self.endDate = datetime.strptime(
-                self.endDateVar.get().strip(), '%d/%m/%Y')
+                self.endDateVar.get().strip(), config.dateFormat)
             # Clears any error messages
             self.errorVar.set('')
             disableWindow(self.enterButton)
@@ -728,8 +701,6 @@ class orderWindow:
             self.orderReportWin.iconbitmap(config.icon)
             self.orderReportFrame = tk.Frame(self.orderReportWin)
             self.orderReportFrame.pack(fill='both', expand=True)
-            self.orderReportWin.protocol('WM_DELETE_WINDOW',
-                                         lambda: enableWindow(self.orderReportWin, self.enterButton))
             self.titleLabel = tk.Label(self.orderReportFrame, text='Kingfisher Trust', font='algerian 14 bold',
                                        fg='#2380b7')
             self.detailLabel = tk.Label(
@@ -740,15 +711,17 @@ class orderWindow:
                 datetime.isoformat(self.endDate)[:10]) + ':')
             # Creates a button allowing the user to save the report as a PDF file
             self.pdfButton = ttk.Button(self.orderReportFrame, text='Save to PDF',
-                                        command=lambda: (disableWindow(self.pdfButton),
-                                                         orderReport(self.startDate, self.endDate, records,
-                                                                     self.totalCost, self.totalRevenue,
-                                                                     self.totalProfit)))
+                                        command=lambda: self.savePDF())
+            # Creates a button allowing the user to save the report's records as a CSV or columnar file
+            self.exportReportButton = ttk.Button(self.orderReportFrame, text='Export Data',
+                                                 command=lambda: exportReport(
+                                                     self.orderReportWin, 'revenue', self.startDate, self.endDate))
             # Grids the above labels and buttons
             self.titleLabel.grid(row=0, column=0, columnspan=3, pady=10)
             self.detailLabel.grid(row=1, column=0, columnspan=3)
             self.datesLabel.grid(row=2, column=0, padx=10, sticky='w')
             self.pdfButton.grid(row=2, column=2, padx=10, sticky='E')
+            self.exportReportButton.grid(row=2, column=1, padx=10, sticky='E')
             # Creates a treeview to insert all the relevant order records
             columns = ('OrderID', 'CustomerID', 'Date', 'ItemID', 'ItemName', 'Quantity', 'SalePrice', 'SupplierCost',
                        'SupplierID')
@@ -763,51 +736,6 @@ class orderWindow:
                 [0, 1, 2], weight=1)  # column with treeview
             self.orderReportFrame.rowconfigure(
                 6, weight=1)  # row with treeview
-            # Connects to database and selects all records from orderTbl
-            self.orders = executeSQL('SELECT * FROM orderTbl', (), True)
-            self.totalCost = 0
-            self.totalRevenue = 0
-            records = []
-            # Iterates through all the orders, selecting all relevant fields for orders within the
-            # given time period
-            for order in self.orders:
-                count = 0
-                orderItems = executeSQL(
-                    'SELECT * FROM orderItemTbl WHERE orderNo = ?', (order[0],), True)
-                date = order[3]
-                if self.startDate <= datetime.strptime(date, '%d/%m/%Y') <= self.endDate:
-                    for orderItem in orderItems:
-                        items = executeSQL(
-                            'SELECT * FROM itemTbl WHERE itemID = ?', (orderItem[1],), False)
-
-                        orderNo = order[0]
-                        customerID = order[1]
-                        itemID = items[0]
-                        itemName = items[1]
-                        quantity = int(orderItem[2])
-                        salePrice = float(items[2]) * quantity
-                        supplierCost = float(items[4]) * quantity
-                        supplierID = items[5]
-
-                        self.totalCost += supplierCost
-                        self.totalRevenue += salePrice
-
-                        # Inserts all record items into treeview, grouping such that only the top record shows the
-                        # order number and other repeated values
-                        if count == len(orderItems) - 1:
-                            record = (orderNo, customerID, date, itemID, itemName, quantity,
-                                      str('£{:.2f}'.format(salePrice)), str('£{:.2f}'.format(supplierCost)), supplierID)
-                            records.append(record)
-                            self.reporttree.insert('', 0, values=record)
-                        else:
-                            record = ('', '', '', itemID, itemName, quantity,
-                                      str('£{:.2f}'.format(salePrice)), str('£{:.2f}'.format(supplierCost)), supplierID)
-                            records.append(record)
-                            self.reporttree.insert('', 0, values=record)
-
-                        count += 1
-
-            self.totalProfit = self.totalRevenue - self.totalCost
 
             self.scrollbar = ttk.Scrollbar(
                 self.orderReportFrame, orient='vertical', command=self.reporttree.yview)
@@ -816,18 +744,58 @@ class orderWindow:
             self.reporttree.configure(
                 yscrollcommand=self.scrollbar.set, selectmode='browse')
 
-            self.totalCostLabel = tk.Label(self.orderReportFrame, text=str(
-                'Total Cost = £{:.2f}'.format(self.totalCost)))
-            self.totalRevenueLabel = tk.Label(self.orderReportFrame,
-                                              text=str('Total Revenue = £{:.2f}'.format(self.totalRevenue)))
-            self.totalProfitLabel = tk.Label(self.orderReportFrame,
-                                             text=str('Total Profit = £{:.2f}'.format(self.totalProfit)))
+            self.totalCostLabel = tk.Label(self.orderReportFrame, text='Loading...')
+            self.totalRevenueLabel = tk.Label(self.orderReportFrame)
+            self.totalProfitLabel = tk.Label(self.orderReportFrame)
             self.totalCostLabel.grid(row=3, column=0, padx=10, sticky='w')
             self.totalRevenueLabel.grid(row=4, column=0, padx=10, sticky='w')
             self.totalProfitLabel.grid(row=5, column=0, padx=10, sticky='w')
 
+            # The report is read from the database in the background. Closing the window stops it.
+            disableWindow(self.pdfButton)
+            task = submit(self.orderReportWin, self.readReport, self.startDate, self.endDate,
+                          done=lambda result: self.showReport(*result),
+                          progress=lambda count: self.totalCostLabel.config(
+                              text='Loading... {:,} items'.format(count)))
+            self.orderReportWin.protocol('WM_DELETE_WINDOW',
+                                         lambda: (task.cancel(), enableWindow(self.orderReportWin, self.enterButton)))
+
             center(self.orderReportWin)
 
         except ValueError:
             # Outputs an error if the dates input are invalid
-            self.errorVar.set('Error: Invalid Input\nDD/MM/YYYY')
+            self.errorVar.set('Error: Invalid Input\nYYYY-MM-DD')
+
+    # Reads the revenue report for the given dates. Runs in the background.
+    def readReport(self, task, startDate, endDate):
+        # Totals are summed from the daily totals, then each item sold in the period
+        # is read from a single joined query
+        totals = revenueTotals(startDate, endDate)
+        records = []
+        # Record items are grouped such that only the top record shows the
+        # order number and other repeated values. Newest first, as they are shown.
+        for row in revenueRows(startDate, endDate, newestFirst=True):
+            record = row[:6] + (str('£{:.2f}'.format(row[6])), str('£{:.2f}'.format(row[7])), row[8])
+            records.append(record)
+            if len(records) % 1000 == 0:
+                task.report(len(records))
+        return totals, records
+
+    # Shows the report once it has been read
+    def showReport(self, totals, records):
+        self.totalCost, self.totalRevenue, self.totalProfit = totals
+        # Inserts all record items into treeview, newest first
+        insertRows(self.reporttree, records)
+        self.totalCostLabel.config(text=str('Total Cost = £{:.2f}'.format(self.totalCost)))
+        self.totalRevenueLabel.config(text=str('Total Revenue = £{:.2f}'.format(self.totalRevenue)))
+        self.totalProfitLabel.config(text=str('Total Profit = £{:.2f}'.format(self.totalProfit)))
+        self.pdfButton['state'] = 'normal'
+
+    # Saves the report as a PDF in the background, newest records first. The rows are read from
+    # the database as they are written, rather than kept in memory.
+    def savePDF(self):
+        disableWindow(self.pdfButton)
+        pdf = orderReport(self.startDate, self.endDate, self.totalCost, self.totalRevenue, self.totalProfit)
+        rows = revenueRows(self.startDate, self.endDate, newestFirst=True)
+        submit(self.orderReportWin, lambda task: pdf.save(rows), done=reportSaved,
+               error=lambda error: reportFailed(pdf.fileName, error))
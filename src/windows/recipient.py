@@ -1,11 +1,13 @@
 import tkinter as tk
 from tkinter import ttk
-import random
 import sqlite3
 
 from .. import config
 from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center
-from ..sql import loadDatabase, executeSQL
+from ..sql import loadDatabase, executeSQL, transaction, isReferenced, upsertRow, removeRow
+from ..export import exportMenu
+from ..ids import nextID
+from ..search import searchTable
 
 
 class recipientWindow:
@@ -31,7 +33,7 @@ class recipientWindow:
         # Creates a dropdown menu, with all the fields listed, set to recipientID by default
         self.searchFieldVar = tk.StringVar()
         self.searchField = ttk.OptionMenu(self.frame, self.searchFieldVar, 'RecipientID', 'RecipientID', 'Surname',
-                                          'Forename', 'Contact')
+                                          'Forename', 'Contact', 'All Fields')
         # Creates a 'Search' button, which calls the search function when pressed
         self.searchButton = ttk.Button(
             self.frame, text='Search', command=lambda: self.search())
@@ -65,6 +67,9 @@ class recipientWindow:
             self.frame, orient='horizontal', command=self.tree.xview)
         self.xscrollbar.grid(row=5, column=0, sticky='ew',
                              columnspan=4, pady=(0, 10))
+        # Creates an 'Export' button, to save the whole table to a file without loading it here
+        self.exportButton = exportMenu(self.frame, [('Recipients', 'recipientTbl')])
+        self.exportButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.tree.configure(
             xscrollcommand=self.xscrollbar.set, selectmode='browse')
         # Creates the add, edit and delete recipient buttons, which calls their respective functions when clicked
@@ -97,9 +102,7 @@ class recipientWindow:
         config.app.enableMenu()
 
     def search(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol, %, to the end of the search value
-        search = '%' + str(self.searchVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFieldVar.get()
         if searchFieldVar == 'RecipientID':
             searchField = 'recipientID'
@@ -109,14 +112,20 @@ class recipientWindow:
             searchField = 'recipientForename'
         elif searchFieldVar == 'Contact':
             searchField = 'recipientContact'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchVar.get().strip():
+            loadDatabase(self.tree, 'recipientTbl', False)
+            return
         # Clears the treeview of all other records
         self.tree.delete(*self.tree.get_children())
-        # Selects records from recipientTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM recipientTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from recipientTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('recipientTbl', self.searchVar.get(), searchField)
         for i in records:
             # Inserts all the records found into the treeview
-            self.tree.insert('', 0, values=(i[0], i[1], i[2], i[3]))
+            self.tree.insert('', 'end', values=(i[0], i[1], i[2], i[3]))
 
     def addRecipient(self):
         disableWindow(self.returnButton, self.addRecipientButton,
@@ -179,20 +188,21 @@ class recipientWindow:
         contact = self.contactVar.get().strip()
         # Checks that all fields have been filled
         if forename:
-            # Generates a random recipientID, using the random module
-            recipientID = 'RE' + \
-                str(''.join(['%s' % random.randint(0, 9)
-                    for num in range(0, 5)]))
             # Asks for user confimation of the input details
-            if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nRecipientID:\t' + recipientID +
+            if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                      'RecipientID:\tAssigned on save' +
                                       '\nName:\t\t' + forename + ' ' + surname +
                                       '\nContact:\t\t' + contact):
                 try:
-                    # Inserts record into recipientTbl
-                    executeSQL('INSERT INTO recipientTbl VALUES (?,?,?,?)', (recipientID, surname, forename, contact),
-                               False)
-                    # Reloads records into treeview
-                    loadDatabase(self.tree, 'recipientTbl', False)
+                    # Allocates a new, unique recipientID in the same transaction as the insert, so that
+                    # cancelling or a failed insert does not use one up
+                    with transaction():
+                        recipientID = nextID('RE')
+                        # Inserts record into recipientTbl
+                        executeSQL('INSERT INTO recipientTbl VALUES (?,?,?,?)',
+                                   (recipientID, surname, forename, contact), False)
+                    # Shows the new record in the treeview
+                    upsertRow(self.tree, 'recipientTbl', recipientID)
                     # Destroys add recipient toplevel and returns to view recipients window
                     enableWindow(self.recipientWin, self.returnButton, self.addRecipientButton,
                                  self.editRecipientButton, self.delRecipientButton)
@@ -298,8 +308,8 @@ class recipientWindow:
                 # Updates record where the recipientID matches the record selected
                 executeSQL('''UPDATE recipientTbl SET recipientSurname=?, recipientForename=?, recipientContact=?
                                WHERE recipientID=?''', (newSurname, newForename, newContact, recipientID), False)
-                # Reloads the records into the treeview, with the updated details
-                loadDatabase(self.tree, 'recipientTbl', False)
+                # Shows the updated record in the treeview
+                upsertRow(self.tree, 'recipientTbl', recipientID)
                 # Destroys edit recipient window and returns to view recipients window
                 enableWindow(self.recipientWin, self.returnButton, self.addRecipientButton, self.editRecipientButton,
                              self.delRecipientButton)
@@ -316,18 +326,22 @@ class recipientWindow:
                 recipientID = self.tree.set(selected_item, '#1')
             # Searches through the table where the
             # recipientID might be stored as a foreign key
-            existsForeign = executeSQL(
-                'SELECT * FROM giveFoodTbl WHERE recipientID = ?', (recipientID,), False)
+            # The Anonymous record is always kept, for records saved without a recipient
+            existsForeign = recipientID == 'Anonymous' or isReferenced('recipientTbl', recipientID)
             # If recipientID is not stored in any other tables
             if not existsForeign:
                 # Confirms that the user wants to permanently delete the record
                 if tk.messagebox.askokcancel('Delete', 'Are you sure you want to permanently delete this record?'):
                     for selected_item in self.tree.selection():
-                        # Deletes the record from recipientTbl
-                        executeSQL(
-                            'DELETE FROM recipientTbl WHERE recipientID=?', (recipientID,), False)
-                        # Removes the record from the treeview
-                        self.tree.delete(selected_item)
+                        try:
+                            # Deletes the record from recipientTbl
+                            executeSQL(
+                                'DELETE FROM recipientTbl WHERE recipientID=?', (recipientID,), False)
+                            # Removes the record from the treeview
+                            removeRow(self.tree, recipientID)
+                        except sqlite3.IntegrityError:  # Used on another till since it was checked
+                            tk.messagebox.showerror(
+                                'Error', 'Error: Record in use by other tables')
             else:
                 # If recipientID is a foreign key in other tables, output error as the record cannot be deleted
                 tk.messagebox.showerror(
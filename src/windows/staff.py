@@ -1,12 +1,15 @@
 import tkinter as tk
 from tkinter import ttk
-import random
 import sqlite3
-import bcrypt
 
 from .. import config
 from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center
-from ..sql import loadDatabase, executeSQL
+from ..sql import loadDatabase, executeSQL, transaction, isReferenced, upsertRow, removeRow
+from ..executor import submit
+from ..export import exportMenu
+from ..ids import nextID
+from ..passwords import hashPassword, checkNewPassword
+from ..search import searchTable
 from ..validation import validatePhone
 
 
@@ -34,7 +37,7 @@ class staffWindow:
         # Creates a dropdown menu, with all the fields listed, set to staffID by default
         self.searchFieldVar = tk.StringVar()
         self.searchField = ttk.OptionMenu(self.frame, self.searchFieldVar, 'StaffID', 'StaffID',
-                                          'Surname', 'Forename', 'Contact', 'AccessLevel')
+                                          'Surname', 'Forename', 'Contact', 'AccessLevel', 'All Fields')
         # Creates a 'Search' button, which calls the search function when pressed
         self.searchButton = ttk.Button(
             self.frame, text='Search', command=lambda: self.search())
@@ -54,6 +57,8 @@ class staffWindow:
             self.tree.column(col, width=100, minwidth=100)
             self.tree.heading(col, text=col, command=lambda _col=col: treeview_sort_column(
                 self.tree, _col, False))
+        # Access levels sort as numbers ('x', for removed logins, sorts last)
+        self.tree.columnTypes = {'AccessLevel': int}
         self.tree.grid(row=2, column=0, sticky='ewns', rowspan=3,
                        columnspan=3, padx=(10, 0), pady=(10, 0))
         self.frame.columnconfigure(1, weight=1)  # column with treeview
@@ -68,6 +73,9 @@ class staffWindow:
             self.frame, orient='horizontal', command=self.tree.xview)
         self.xscrollbar.grid(row=5, column=0, sticky='ew',
                              columnspan=4, pady=(0, 10))
+        # Creates an 'Export' button, to save the whole table to a file without loading it here
+        self.exportButton = exportMenu(self.frame, [('Staff', 'staffTbl')])
+        self.exportButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.tree.configure(
             xscrollcommand=self.xscrollbar.set, selectmode='browse')
         # Creates the add, edit and delete staff buttons, which call their respective functions when clicked
@@ -110,9 +118,7 @@ class staffWindow:
         config.app.enableMenu()
 
     def search(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol to the end of the search value
-        search = '%' + str(self.searchVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFieldVar.get()
         if searchFieldVar == 'StaffID':
             searchField = 'staffID'
@@ -124,14 +130,20 @@ class staffWindow:
             searchField = 'staffContact'
         elif searchFieldVar == 'AccessLevel':
             searchField = 'accessLevel'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchVar.get().strip():
+            loadDatabase(self.tree, 'staffTbl', False)
+            return
         # Clears treeview of all other records
         self.tree.delete(*self.tree.get_children())
-        # Selects records from staffTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM staffTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from staffTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('staffTbl', self.searchVar.get(), searchField)
         for i in records:
             # Inserts all the records fetched into the treeview
-            self.tree.insert('', 0, values=(i[0], i[1], i[2], i[3], i[4]))
+            self.tree.insert('', 'end', values=(i[0], i[1], i[2], i[3], i[4]))
 
     # Creates add staff window
     def addStaff(self):
@@ -139,6 +151,8 @@ class staffWindow:
                       self.editStaffButton, self.delStaffButton)
         self.staffWin = tk.Toplevel(self.root)
         self.staffWin.title('Add Staff')
+        # Whether a password is being hashed or checked in the background
+        self.saving = False
         self.staffWin.iconbitmap(config.icon)
         self.staffWin.protocol('WM_DELETE_WINDOW',
                                lambda: (enableWindow(self.staffWin, self.returnButton, self.addStaffButton,
@@ -223,38 +237,28 @@ class staffWindow:
         staffAccessLevel = self.accessLevelVar.get()
         password = self.passwordVar.get()
         passConfirm = self.passConfirmVar.get()
+        # Ignores the save button/enter key while the password is still being hashed
+        if self.saving:
+            return
         # Checks that all fields have been filled
         if forename and surname and contact and password and staffAccessLevel != 'Select...':
             # Checks that contact is of correct format for a phone
             if validatePhone(contact):
                 # Checks that password and confimation are the same
                 if password == passConfirm:
-                    # Generates random salt and hashes password
-                    salt = bcrypt.gensalt()
-                    hashedPass = bcrypt.hashpw(password.encode('utf-8'), salt)
-                    # Generates a random staffID, using the random module
-                    staffID = 'ST' + \
-                        str(''.join(['%s' % random.randint(0, 9)
-                            for num in range(0, 5)]))
-                    if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nStaffID:\t\t' + staffID +
+                    if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                              'StaffID:\t\tAssigned on save' +
                                               '\nName:\t\t' + forename + ' ' + surname +
                                               '\nContact:\t\t' + contact +
                                               '\nAccess Level:\t' + staffAccessLevel):
-                        try:
-                            executeSQL('INSERT INTO staffTbl VALUES (?,?,?,?,?,?,?)',
-                                       (staffID, surname, forename, contact, staffAccessLevel, hashedPass, salt), False)
-                            # Reloads records into treeview
-                            loadDatabase(self.tree, 'staffTbl', False)
-                            # Destroys add staff window and returns to view staff window
-                            enableWindow(self.staffWin, self.returnButton, self.addStaffButton, self.editStaffButton,
-                                         self.delStaffButton)
-                            accesslevel(3, self.addStaffButton,
-                                        self.editStaffButton, self.delStaffButton)
-                            tk.messagebox.showinfo(
-                                'Success!', 'Staff Details Saved')
-                        except sqlite3.IntegrityError:  # Outputs error if staffID is not unique
-                            self.errorVar.set(
-                                'Error: Failed To Update Database.\nPlease Try Again')
+                        # Hashing the password is deliberately slow, so it is hashed in the background
+                        self.saving = True
+                        self.errorVar.set('')
+                        submit(self.staffWin, lambda task: hashPassword(password),
+                               done=lambda result: self.insertStaff(surname, forename, contact, staffAccessLevel,
+                                                                    *result),
+                               error=lambda error: (setattr(self, 'saving', False),
+                                                    self.errorVar.set('Error: ' + str(error))))
                 else:  # Outputs error if passwords don't match
                     self.errorVar.set("Error: Passwords Don't Match")
             else:  # Outputs error if contact is invalid
@@ -262,6 +266,29 @@ class staffWindow:
         else:  # Outputs error if not all fields are filled
             self.errorVar.set('Error: Please Fill All Fields')
 
+    # Saves a new member of staff once their password has been hashed
+    def insertStaff(self, surname, forename, contact, staffAccessLevel, hashedPass, salt):
+        self.saving = False
+        try:
+            # Allocates a new, unique staffID in the same transaction as the insert, so that
+            # cancelling or a failed insert does not use one up
+            with transaction():
+                staffID = nextID('ST')
+                executeSQL('INSERT INTO staffTbl VALUES (?,?,?,?,?,?,?)',
+                           (staffID, surname, forename, contact, staffAccessLevel, hashedPass, salt), False)
+            # Shows the new record in the treeview
+            upsertRow(self.tree, 'staffTbl', staffID)
+            # Destroys add staff window and returns to view staff window
+            enableWindow(self.staffWin, self.returnButton, self.addStaffButton, self.editStaffButton,
+                         self.delStaffButton)
+            accesslevel(3, self.addStaffButton,
+                        self.editStaffButton, self.delStaffButton)
+            tk.messagebox.showinfo(
+                'Success!', 'Staff Details Saved')
+        except sqlite3.IntegrityError:  # Outputs error if staffID is not unique
+            self.errorVar.set(
+                'Error: Failed To Update Database.\nPlease Try Again')
+
     # Creates edit staff window
     def editStaff(self):
         if self.tree.selection():  # Runs IF a record is selected from treeview
@@ -280,6 +307,8 @@ class staffWindow:
                 salt = record[6]
             self.staffWin = tk.Toplevel(self.root)
             self.staffWin.title('Edit Staff')
+            # Whether a password is being hashed or checked in the background
+            self.saving = False
             self.staffWin.iconbitmap(config.icon)
             self.staffWin.protocol('WM_DELETE_WINDOW',
                                    lambda: (enableWindow(self.staffWin, self.returnButton, self.addStaffButton,
@@ -397,37 +426,23 @@ class staffWindow:
             newPassword = oldPassword
         else:
             newPassword = self.newPasswordVar.get()
-        newPassword = bcrypt.hashpw(newPassword.encode('utf-8'), salt)
+        changePass = self.changePassVar
+        # Ignores the save button/enter key while the password is still being checked
+        if self.saving:
+            return
         # Checks that all fields have been filled
         if newForename and newSurname and newContact and newAccessLevel and (
-                (self.changePassVar and newPassword) or (not self.changePassVar)):
+                (changePass and newPassword) or (not changePass)):
             # Checks that contact is of the correct format
             if validatePhone(newContact):
-                # Checks that password entered is the same as the password on record
-                oldPassword = bcrypt.hashpw(oldPassword.encode('utf-8'), salt)
-                if oldPassword == password:
-                    # Creates confirmation dialogue to confirm details are correct
-                    if tk.messagebox.askyesno('Confirm Changes', 'Are these details correct?\n\nStaffID:\t\t' + staffID +
-                                              '\nName:\t\t' + newForename + ' ' + newSurname +
-                                              '\nContact:\t\t' + newContact +
-                                              '\nAccess Level:\t' + newAccessLevel):
-                        # Updates record where the staffID matches the staffID selected
-                        executeSQL('''UPDATE staffTbl SET staffSurname=?, staffForename=?, staffContact=?,
-                                       accessLevel=?, password=? WHERE staffID=?''',
-                                   (newSurname, newForename, newContact, newAccessLevel, newPassword, staffID), False)
-                        # Reloads the records into the treeview, with the updated details
-                        loadDatabase(self.tree, 'staffTbl', False)
-                        # Destroys edit staff window and returns to view staff window
-                        enableWindow(self.staffWin, self.returnButton, self.addStaffButton, self.editStaffButton,
-                                     self.delStaffButton)
-                        accesslevel(3, self.addStaffButton,
-                                    self.editStaffButton, self.delStaffButton)
-                        # Outputs success dialogue box
-                        tk.messagebox.showinfo(
-                            'Success!', 'Staff Details Updated')
-                else:
-                    # Outputs error if input password doesn't match password on record
-                    self.errorVar.set('Error: Password Incorrect')
+                # Checking (and hashing) passwords is deliberately slow, so it is done in the background
+                self.saving = True
+                self.errorVar.set('')
+                submit(self.staffWin, lambda task: checkNewPassword(oldPassword, password, salt,
+                                                                    newPassword if changePass else None),
+                       done=lambda result: self.updateStaff(staffID, newSurname, newForename, newContact,
+                                                            newAccessLevel, result),
+                       error=lambda error: (setattr(self, 'saving', False), self.errorVar.set('Error: ' + str(error))))
             else:
                 # Outputs error if contact is invalid
                 self.errorVar.set('Error: Invalid Phone Number')
@@ -435,6 +450,35 @@ class staffWindow:
             # Outputs error if not all fields are filled
             self.errorVar.set('Error: Please Fill All Fields')
 
+    # Updates a member of staff's record once the password entered has been checked. hashed is
+    # the (hash, salt) to store, or None if the password entered doesn't match the one on record.
+    def updateStaff(self, staffID, newSurname, newForename, newContact, newAccessLevel, hashed):
+        self.saving = False
+        if hashed is None:
+            # Outputs error if input password doesn't match password on record
+            self.errorVar.set('Error: Password Incorrect')
+            return
+        newPassword, salt = hashed
+        # Creates confirmation dialogue to confirm details are correct
+        if tk.messagebox.askyesno('Confirm Changes', 'Are these details correct?\n\nStaffID:\t\t' + staffID +
+                                  '\nName:\t\t' + newForename + ' ' + newSurname +
+                                  '\nContact:\t\t' + newContact +
+                                  '\nAccess Level:\t' + newAccessLevel):
+            # Updates record where the staffID matches the staffID selected
+            executeSQL('''UPDATE staffTbl SET staffSurname=?, staffForename=?, staffContact=?,
+                           accessLevel=?, password=?, salt=? WHERE staffID=?''',
+                       (newSurname, newForename, newContact, newAccessLevel, newPassword, salt, staffID), False)
+            # Shows the updated record in the treeview
+            upsertRow(self.tree, 'staffTbl', staffID)
+            # Destroys edit staff window and returns to view staff window
+            enableWindow(self.staffWin, self.returnButton, self.addStaffButton, self.editStaffButton,
+                         self.delStaffButton)
+            accesslevel(3, self.addStaffButton,
+                        self.editStaffButton, self.delStaffButton)
+            # Outputs success dialogue box
+            tk.messagebox.showinfo(
+                'Success!', 'Staff Details Updated')
+
     # Removes the selected record from the database
     # Only if it is not used in other records
     def delStaff(self):
@@ -443,35 +487,30 @@ class staffWindow:
                 staffID = self.tree.set(selected_item, '#1')
                 staffAccessLevel = self.tree.set(selected_item, '#5')
             if not staffAccessLevel == 'x':
-                # Searches tables where staffID might be used as a foreign key
-                existsForeign = executeSQL(
-                    'SELECT * FROM donationsTbl WHERE staffID = ?', (staffID,), True)
-                existsForeign += executeSQL(
-                    'SELECT * FROM orderTbl WHERE staffID = ?', (staffID,), True)
-                existsForeign += executeSQL(
-                    'SELECT * FROM foodDonatTbl WHERE staffID = ?', (staffID,), True)
-                existsForeign += executeSQL(
-                    'SELECT * FROM giveFoodTbl WHERE staffID = ?', (staffID,), True)
-                existsForeign += executeSQL(
-                    'SELECT * FROM expenditureTbl WHERE staffID = ?', (staffID,), True)
+                # Checks the tables where staffID might be used as a foreign key
+                existsForeign = isReferenced('staffTbl', staffID)
                 # If staffID is NOT stored in any other tables
                 if not existsForeign:
                     # Confirms that user wants to delete the record
                     if tk.messagebox.askokcancel('Delete', 'Are you sure you want to permanantly delete this record?'):
                         for selected_item in self.tree.selection():
-                            # Delete the record from the database
-                            executeSQL(
-                                'DELETE FROM staffTbl WHERE staffID=?', (staffID,), False)
-                            # Remove the item from the treeview
-                            self.tree.delete(selected_item)
+                            try:
+                                # Delete the record from the database
+                                executeSQL(
+                                    'DELETE FROM staffTbl WHERE staffID=?', (staffID,), False)
+                                # Remove the item from the treeview
+                                removeRow(self.tree, staffID)
+                            except sqlite3.IntegrityError:  # Used on another till since it was checked
+                                tk.messagebox.showerror(
+                                    'Error', 'Error: Record in use by other tables')
                 else:  # If staffID is stored in other tables
                     if tk.messagebox.askokcancel('Delete',
                                                  'Error: Record is in use in other tables.\nRemove Login from System?'):
                         # Change access level to 'x'
                         executeSQL('UPDATE staffTbl SET accessLevel=?, password=? WHERE staffID=?', ('x', '', staffID),
                                    False)
-                        # Reload records from database into treeview
-                        loadDatabase(self.tree, 'staffTbl', False)
+                        # Shows the updated record in the treeview
+                        upsertRow(self.tree, 'staffTbl', staffID)
             else:
                 tk.messagebox.showerror(
                     'Error', 'Record Already Removed From System')
@@ -1,11 +1,13 @@
 import tkinter as tk
 from tkinter import ttk
-import random
 import sqlite3
 
 from .. import config
 from ..utils import treeview_sort_column, enableWindow, disableWindow, accesslevel, center
-from ..sql import loadDatabase, executeSQL
+from ..sql import loadDatabase, executeSQL, transaction, isReferenced, upsertRow, removeRow
+from ..export import exportMenu
+from ..ids import nextID
+from ..search import searchTable
 from ..validation import validatePhone, validateEmail
 
 
@@ -32,7 +34,7 @@ class supplierWindow:
         # Creates a dropdown menu, with all the fields listed, set to supplierID by default
         self.searchFieldVar = tk.StringVar()
         self.searchField = ttk.OptionMenu(self.frame, self.searchFieldVar, 'SupplierID', 'SupplierID', 'Name',
-                                          'Contact')
+                                          'Contact', 'All Fields')
         # Creates a 'Search' button, which calls the search function when pressed
         self.searchButton = ttk.Button(
             self.frame, text='Search', command=lambda: self.search())
@@ -66,6 +68,9 @@ class supplierWindow:
             self.frame, orient='horizontal', command=self.tree.xview)
         self.xscrollbar.grid(row=5, column=0, sticky='ew',
                              columnspan=4, pady=(0, 10))
+        # Creates an 'Export' button, to save the whole table to a file without loading it here
+        self.exportButton = exportMenu(self.frame, [('Suppliers', 'supplierTbl')])
+        self.exportButton.grid(row=5, column=4, padx=10, pady=(0, 10), ipadx=10, sticky='ew')
         self.tree.configure(
             xscrollcommand=self.xscrollbar.set, selectmode='browse')
         # Creates the add, edit and delete supplier buttons, which calls their respective functions when clicked
@@ -98,9 +103,7 @@ class supplierWindow:
         config.app.enableMenu()
 
     def search(self):
-        # Retrieves the search value and search field from the inputs
-        # Adds a wildcard symbol, %, to the end of the search value
-        search = '%' + str(self.searchVar.get().strip().upper()) + '%'
+        # Retrieves the search field from the input
         searchFieldVar = self.searchFieldVar.get()
         if searchFieldVar == 'SupplierID':
             searchField = 'supplierID'
@@ -108,14 +111,20 @@ class supplierWindow:
             searchField = 'supplierName'
         elif searchFieldVar == 'Contact':
             searchField = 'supplierContact'
+        elif searchFieldVar == 'All Fields':
+            searchField = None
+        # A blank search shows every record again, a page at a time, rather than all at once
+        if not self.searchVar.get().strip():
+            loadDatabase(self.tree, 'supplierTbl', False)
+            return
         # Clears the treeview of all other records
         self.tree.delete(*self.tree.get_children())
-        # Selects records from supplierTbl where the search field matches the search value
-        records = executeSQL(
-            'SELECT * FROM supplierTbl WHERE upper(%s) LIKE (?)' % searchField, (search,), True)
+        # Selects records from supplierTbl where the search field matches the search value,
+        # using the full-text index, best matches first
+        records = searchTable('supplierTbl', self.searchVar.get(), searchField)
         for i in records:
             # Inserts all the records found into the treeview
-            self.tree.insert('', 0, values=(i[0], i[1], i[2]))
+            self.tree.insert('', 'end', values=(i[0], i[1], i[2]))
 
     def addSupplier(self):
         disableWindow(self.returnButton, self.addSupplierButton,
@@ -172,19 +181,20 @@ class supplierWindow:
         if name and contact:
             # Checks that contact is valid phoneNo OR email
             if validatePhone(contact) or validateEmail(contact):
-                # Generates a random supplierID, using the random module
-                supplierID = 'SU' + \
-                    str(''.join(['%s' % random.randint(0, 9)
-                        for num in range(0, 5)]))
                 # Asks for user confimation of the input details
-                if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\nSupplierID:\t' + supplierID +
+                if tk.messagebox.askyesno('Confirm Details', 'Are these details correct?\n\n' +
+                                          'SupplierID:\tAssigned on save' +
                                           '\nName:\t\t' + name + '\nContact:\t\t' + contact):
                     try:
-                        # Inserts record into supplierTbl
-                        executeSQL('INSERT INTO supplierTbl VALUES (?,?,?)',
-                                   (supplierID, name, contact), False)
-                        # Reloads records into treeview
-                        loadDatabase(self.tree, 'supplierTbl', False)
+                        # Allocates a new, unique supplierID in the same transaction as the insert, so that
+                        # cancelling or a failed insert does not use one up
+                        with transaction():
+                            supplierID = nextID('SU')
+                            # Inserts record into supplierTbl
+                            executeSQL('INSERT INTO supplierTbl VALUES (?,?,?)',
+                                       (supplierID, name, contact), False)
+                        # Shows the new record in the treeview
+                        upsertRow(self.tree, 'supplierTbl', supplierID)
                         # Destroys add supplier toplevel and returns to view suppliers window
                         enableWindow(self.supplierWin, self.returnButton, self.addSupplierButton,
                                      self.editSupplierButton, self.delSupplierButton)
@@ -286,8 +296,8 @@ class supplierWindow:
                     # Updates record where the supplierID matches the record selected
                     executeSQL('''UPDATE supplierTbl SET supplierName=?, supplierContact=?
                                    WHERE supplierID=?''', (newName, newContact, supplierID), False)
-                    # Reloads the records into the treeview, with the updated details
-                    loadDatabase(self.tree, 'supplierTbl', False)
+                    # Shows the updated record in the treeview
+                    upsertRow(self.tree, 'supplierTbl', supplierID)
                     # Destroys edit supplier window and returns to view suppliers window
                     enableWindow(self.supplierWin, self.returnButton, self.addSupplierButton, self.editSupplierButton,
                                  self.delSupplierButton)
@@ -308,18 +318,21 @@ class supplierWindow:
                 supplierID = self.tree.set(selected_item, '#1')
             # Searches through the table where the
             # supplierID might be stored as a foreign key
-            existsForeign = executeSQL(
-                'SELECT * FROM itemTbl WHERE supplierID = ?', (supplierID,), False)
+            existsForeign = isReferenced('supplierTbl', supplierID)
             # If supplierID is not stored in any other tables
             if not existsForeign:
                 # Confirms that the user wants to permanently delete the record
                 if tk.messagebox.askokcancel('Delete', 'Are you sure you want to permanently delete this record?'):
                     for selected_item in self.tree.selection():
-                        # Deletes the record from supplierTbl
-                        executeSQL(
-                            'DELETE FROM supplierTbl WHERE supplierID=?', (supplierID,), False)
-                        # Removes the record from the treeview
-                        self.tree.delete(selected_item)
+                        try:
+                            # Deletes the record from supplierTbl
+                            executeSQL(
+                                'DELETE FROM supplierTbl WHERE supplierID=?', (supplierID,), False)
+                            # Removes the record from the treeview
+                            removeRow(self.tree, supplierID)
+                        except sqlite3.IntegrityError:  # Used on another till since it was checked
+                            tk.messagebox.showerror(
+                                'Error', 'Error: Record in use by other tables')
             else:
                 # If supplierID is a foreign key in other tables, output error as the record cannot be deleted
                 tk.messagebox.showerror(